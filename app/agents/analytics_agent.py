@@ -12,16 +12,267 @@ on demand, without predefining every possible aggregation.
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
 
 import logging
+import numpy as np
+import os
 import pandas as pd
 
-from app import constants
+from app import (
+    analytics_store,
+    answer_cache,
+    concurrency,
+    constants,
+    registry,
+    sandbox,
+    tracing,
+)
+from app.agents import analytics_templates
 
 
 logger = logging.getLogger(__name__)
 
+# In-memory cache of the merged frame and the agent built on top of it,
+# keyed by a fingerprint of the source CSVs.
+_cache_lock = threading.RLock()
+_cache: Dict[str, Any] = {
+    "fingerprint": None,
+    "df": None,
+    "agent": None,
+    "seller_index": None,
+    "sandbox": None,
+}
+_cache_stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+# LRU of per-seller {"df", "agent"} entries, cleared with `_cache`.
+_seller_cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+
+
+def _data_fingerprint() -> Tuple[Tuple[str, int, int], ...]:
+    """Return an (path, mtime_ns, size) fingerprint of the source CSVs.
+
+    Only `os.stat` is called, so checking freshness never reads the files.
+
+    Returns:
+        Tuple identifying the current on-disk state of the datasets.
+    """
+    fingerprint = []
+    for path in (constants.PRODUCTS_PATH, constants.ORDERS_PATH):
+        stat = os.stat(path)
+        fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprint)
+
+
+def _ensure_fresh_cache() -> None:
+    """Drop cached frame and agent if the source CSVs changed on disk."""
+    fingerprint = _data_fingerprint()
+    if _cache["fingerprint"] != fingerprint:
+        if _cache["fingerprint"] is not None:
+            logger.info("Analytics source data changed, invalidating cache.")
+            answer_cache.invalidate()
+        _reset_cache(fingerprint)
+
+
+def _reset_cache(fingerprint: Any = None) -> None:
+    """Drop the cached frame, seller index, sandbox pool and all agents."""
+    if _cache.get("sandbox") is not None:
+        _cache["sandbox"].close()
+    _cache.update(
+        {
+            "fingerprint": fingerprint,
+            "df": None,
+            "agent": None,
+            "seller_index": None,
+            "sandbox": None,
+        }
+    )
+    _seller_cache.clear()
+
+
+def check_data_freshness() -> bool:
+    """Invalidate cached analytics state if the source CSVs changed.
+
+    Cheap enough (two `os.stat` calls) to run before every answer-cache
+    lookup, so cached analytics answers never outlive their data.
+
+    Returns:
+        bool: True if the datasets exist and were checked, False otherwise.
+    """
+    with _cache_lock:
+        try:
+            _ensure_fresh_cache()
+        except OSError:
+            return False
+    return True
+
+
+def get_data() -> pd.DataFrame:
+    """Return the merged analytical DataFrame, cached between calls.
+
+    The frame is reloaded via `load_data()` only when the CSV fingerprint
+    changes.
+
+    Returns:
+        pd.DataFrame: Shared merged DataFrame. Treat it as read-only.
+    """
+    with _cache_lock:
+        _ensure_fresh_cache()
+        if _cache["df"] is None:
+            with tracing.span("load_data"):
+                _cache["df"] = load_data()
+        return _cache["df"]
+
+
+def get_seller_index() -> Dict[str, np.ndarray]:
+    """Return the seller_id -> row positions index over the merged frame.
+
+    Built once per data fingerprint with a single groupby, so fetching a
+    seller's rows afterwards is a dict lookup plus `DataFrame.take`.
+
+    Returns:
+        dict: Row positions per seller; empty if the data has no
+        `seller_id` column.
+    """
+    with _cache_lock:
+        df = get_data()
+        if _cache["seller_index"] is None:
+            if "seller_id" in df.columns:
+                groups = df.groupby("seller_id", observed=True, sort=False)
+                _cache["seller_index"] = {
+                    str(seller): positions
+                    for seller, positions in groups.indices.items()
+                }
+            else:
+                _cache["seller_index"] = {}
+        return _cache["seller_index"]
+
+
+def _seller_entry(seller_id: str) -> Dict[str, Any]:
+    """Return the LRU entry for a seller, creating its frame slice if needed.
+
+    Must be called with `_cache_lock` held.
+    """
+    _ensure_fresh_cache()
+    entry = _seller_cache.get(seller_id)
+    if entry is not None:
+        _seller_cache.move_to_end(seller_id)
+        return entry
+
+    df = get_data()
+    positions = get_seller_index().get(seller_id, np.empty(0, dtype=np.intp))
+    entry = {"df": df.take(positions).reset_index(drop=True), "agent": None}
+    _seller_cache[seller_id] = entry
+    while len(_seller_cache) > constants.SELLER_AGENT_CACHE_SIZE:
+        _seller_cache.popitem(last=False)
+    return entry
+
+
+def is_seller_scoped() -> bool:
+    """Return True if the analytics data can be partitioned by seller."""
+    return bool(get_seller_index())
+
+
+def get_seller_data(seller_id: str | None = None) -> pd.DataFrame:
+    """Return the analytics frame visible to a seller.
+
+    Without a seller, or when the data has no `seller_id` column, this is
+    the whole merged frame. An unknown seller gets an empty frame rather
+    than other sellers' data.
+
+    Args:
+        seller_id: Optional seller identifier.
+
+    Returns:
+        pd.DataFrame: Shared frame slice. Treat it as read-only.
+    """
+    if seller_id is None or not is_seller_scoped():
+        return get_data()
+    with _cache_lock:
+        return _seller_entry(seller_id)["df"]
+
+
+def get_sandbox_pool() -> sandbox.SandboxPool:
+    """Return the worker pool executing agent code, starting it if needed.
+
+    Workers are started without holding the cache lock (they receive the
+    merged frame and seller index at start), so concurrent requests are
+    not blocked meanwhile. The pool is replaced when the source CSVs change.
+
+    Returns:
+        SandboxPool: Shared pool over the current merged frame.
+    """
+    with _cache_lock:
+        df = get_data()
+        if _cache["sandbox"] is not None:
+            return _cache["sandbox"]
+        fingerprint = _cache["fingerprint"]
+        seller_index = get_seller_index()
+
+    pool = sandbox.SandboxPool(df, seller_index)
+    with _cache_lock:
+        if _cache["sandbox"] is None and _cache["fingerprint"] == fingerprint:
+            _cache["sandbox"] = pool
+            return pool
+        current = _cache["sandbox"]
+    # Another thread won the race, or the cache was reset while starting.
+    pool.close()
+    return current if current is not None else get_sandbox_pool()
+
+
+def sandbox_stats() -> Dict[str, float]:
+    """Return sandbox execution counters (empty before the first execution)."""
+    with _cache_lock:
+        pool = _cache["sandbox"]
+    return pool.stats() if pool is not None else {}
+
+
+def run_sandboxed(code: str, seller_id: str | None = None) -> str:
+    """Execute agent-written pandas code in the sandbox pool.
+
+    Args:
+        code: Python code from the agent; `df` is the analytics frame.
+        seller_id: Optional seller to scope `df` to.
+
+    A pool closed while waiting (the source CSVs changed) is replaced by
+    the current one and the code is run there.
+
+    Returns:
+        str: Tool output, or an error message the agent can react to when
+        the code timed out or exceeded the memory limit.
+    """
+    scope = seller_id if seller_id is not None and is_seller_scoped() else None
+    with tracing.span("sandbox_exec") as span:
+        try:
+            result = get_sandbox_pool().execute(code, scope)
+        except sandbox.SandboxClosedError:
+            result = get_sandbox_pool().execute(code, scope)
+        if span is not None:
+            span.attributes.update(
+                status=result.status, cpu_s=result.cpu_seconds
+            )
+    return result.output
+
+
+def cache_stats() -> Dict[str, int]:
+    """Return agent cache hit/miss counters.
+
+    Returns:
+        dict: {"hits": int, "misses": int}
+    """
+    with _cache_lock:
+        return dict(_cache_stats)
+
+
+def invalidate_cache() -> None:
+    """Drop the cached DataFrame and agent, forcing a reload on next use."""
+    with _cache_lock:
+        _reset_cache()
+
 
 def load_data() -> pd.DataFrame:
     """
@@ -32,10 +283,21 @@ def load_data() -> pd.DataFrame:
     such as `late_rate` (percentage of late deliveries) to provide interpretable
     metrics for reasoning and analytics.
 
+    When the columnar analytics store is available (pyarrow installed and
+    `constants.ANALYTICS_STORE_ENABLED`), the frame comes from its Parquet
+    tables and precomputed KPIs (orders, revenue, rolling windows) instead
+    of the raw CSVs.
+
     Returns:
         pd.DataFrame: Merged DataFrame containing product information and
         delivery performance metrics, including `late_rate`.
     """
+    if constants.ANALYTICS_STORE_ENABLED:
+        try:
+            return analytics_store.get_merged_frame()
+        except ImportError as e:
+            logger.warning(f"Analytics store unavailable, reading CSVs: {e}")
+
     df_products = pd.read_csv(constants.PRODUCTS_PATH)
     df_orders = pd.read_csv(constants.ORDERS_PATH)
 
@@ -49,32 +311,97 @@ def load_data() -> pd.DataFrame:
     return df
 
 
-def get_pandas_agent() -> Any:
+def get_pandas_agent(seller_id: str | None = None) -> Any:
     """
-    Create and configure a Pandas DataFrame agent powered by Mistral (via Ollama).
+    Return the shared Pandas DataFrame agent, rebuilding it only when needed.
 
-    The agent allows natural-language analytical queries over tabular data.
-    It loads the merged dataset from `load_data()`, initializes an Ollama LLM,
-    and wraps it with a Pandas agent for structured reasoning on the data.
+    The agent is cached alongside the merged DataFrame and rebuilt when the
+    source CSVs change (see `_data_fingerprint`). With a `seller_id` (and
+    seller-partitioned data), the agent only sees that seller's rows; the
+    most recently used per-seller agents are kept in an LRU of
+    `constants.SELLER_AGENT_CACHE_SIZE`. Each call is counted as a cache hit
+    or miss in `cache_stats()`.
+
+    Args:
+        seller_id (str | None): Optional seller to scope the agent to.
 
     Returns:
         AgentExecutor: Configured LangChain agent capable of executing
         natural-language analytical queries on the e-commerce dataset.
     """
+    with _cache_lock:
+        _ensure_fresh_cache()
+        entry = (
+            _seller_entry(seller_id)
+            if seller_id is not None and is_seller_scoped()
+            else _cache
+        )
+        if entry["agent"] is not None:
+            _cache_stats["hits"] += 1
+            return entry["agent"]
+
+        _cache_stats["misses"] += 1
+        df = entry["df"] if entry is not _cache else get_data()
+        entry["agent"] = _build_pandas_agent(df, seller_id)
+        return entry["agent"]
+
+
+def _sandboxed_tools(tools: List[Any], seller_id: str | None) -> List[Any]:
+    """Replace the agent's in-process Python REPL with the sandbox pool.
+
+    The replacement keeps the tool's name and description, so the agent
+    prompt is unchanged.
+    """
+    from langchain.tools import Tool
+
+    return [
+        Tool(
+            name=tool.name,
+            description=tool.description,
+            func=functools.partial(run_sandboxed, seller_id=seller_id),
+        )
+        if tool.name == "python_repl_ast"
+        else tool
+        for tool in tools
+    ]
+
+
+def _build_pandas_agent(df: pd.DataFrame, seller_id: str | None = None) -> Any:
+    """
+    Create and configure a Pandas DataFrame agent powered by Mistral (via Ollama).
+
+    The agent allows natural-language analytical queries over tabular data.
+    It initializes an Ollama LLM and wraps it with a Pandas agent for
+    structured reasoning on the data. When `constants.ANALYTICS_SANDBOX_ENABLED`,
+    the code it writes runs in the sandbox pool (see `app.sandbox`) instead
+    of in this process.
+
+    Args:
+        df (pd.DataFrame): Merged dataset from `load_data()` (or a seller's
+            slice of it).
+        seller_id (str | None): Seller the sandboxed code is scoped to.
+
+    Returns:
+        AgentExecutor: Configured LangChain agent.
+    """
     from langchain.agents import AgentExecutor
     from langchain_community.llms import Ollama
     from langchain_experimental.agents import create_pandas_dataframe_agent
 
-    llm = Ollama(
-        model=constants.LLM_MODEL_AGENT, temperature=constants.TEMPERATURE_AGENT
+    llm = registry.get_llm(
+        constants.LLM_MODEL_AGENT,
+        constants.TEMPERATURE_AGENT,
+        llm_cls=Ollama,
     )
 
-    df = load_data()
     base_agent = create_pandas_dataframe_agent(llm, df, verbose=True)
+    tools = base_agent.tools
+    if constants.ANALYTICS_SANDBOX_ENABLED:
+        tools = _sandboxed_tools(tools, seller_id)
 
     agent = AgentExecutor.from_agent_and_tools(
         base_agent.agent,
-        base_agent.tools,
+        tools,
         handle_parsing_errors=lambda e: f"Handled parsing error: {str(e)}",
         verbose=True,
     )
@@ -82,44 +409,130 @@ def get_pandas_agent() -> Any:
     return agent
 
 
-def ask_agent(question: str) -> str:
+def ask_agent(question: str, seller_id: str | None = None) -> str:
     """
     Query the Pandas Agent with a natural language question.
 
     Args:
         question (str): Example - "Which categories have the highest return rate?"
+        seller_id (str | None): Optional seller to scope the data to.
+
+    Returns:
+        str: The LLM-generated answer.
+    """
+    agent = get_pandas_agent(seller_id)
+    with tracing.span("agent_loop"):
+        response = agent.run(question)
+    logger.info(f"\nQuestion: {question}")
+    logger.info(f"Answer: {response}")
+    return response
+
+
+async def aask_agent(question: str, seller_id: str | None = None) -> str:
+    """
+    Async variant of `ask_agent`.
+
+    The agent's LLM calls go through the async Ollama client; the whole
+    reasoning loop holds one slot of the shared LLM limiter.
+
+    Args:
+        question (str): Example - "Which categories have the highest return rate?"
+        seller_id (str | None): Optional seller to scope the data to.
 
     Returns:
         str: The LLM-generated answer.
+
+    Raises:
+        OverloadedError: If the LLM wait queue is full.
     """
-    agent = get_pandas_agent()
-    response = agent.run(question)
+    agent = await asyncio.to_thread(get_pandas_agent, seller_id)
+    async with concurrency.get_limiter().slot():
+        with tracing.span("agent_loop"):
+            response = await agent.arun(question)
     logger.info(f"\nQuestion: {question}")
     logger.info(f"Answer: {response}")
     return response
 
 
+def answer_with_template(
+    question: str, seller_id: str | None = None
+) -> Dict[str, Any] | None:
+    """Answer a common question shape without the LLM agent.
+
+    See `analytics_templates` for the supported shapes. Any failure (e.g.
+    missing data) falls back to the agent rather than erroring.
+
+    Args:
+        question (str): Example - "Top 5 products by return rate"
+        seller_id (str | None): Optional seller to scope the data to.
+
+    Returns:
+        dict | None: {"template", "answer", "table"}, or None if no template
+        applies.
+    """
+    try:
+        with tracing.span("analytics_template"):
+            result = analytics_templates.match(
+                question, get_seller_data(seller_id)
+            )
+    except Exception as e:
+        logger.warning(f"Analytics template failed, using agent: {e}")
+        return None
+    return result.to_dict() if result is not None else None
+
+
+def _response(
+    answer: str, template: Dict[str, Any] | None = None
+) -> Dict[str, Any]:
+    """Build the unified analytics response (tables only for templates)."""
+    response = {
+        "intent": "analytics",
+        "answer": answer,
+        "citations": [],
+        "confidence": 1.0,
+        "sources": [],
+    }
+    if template is not None:
+        response["table"] = template["table"]
+        response["template"] = template["template"]
+    return response
+
+
 class AnalyticsAgent:
-    """Analytics agent powered by the Pandas DataFrame agent."""
+    """Analytics agent: deterministic templates first, then the Pandas agent."""
 
     def run(
-        self, question: str, seller_id: str | None = None
+        self,
+        question: str,
+        seller_id: str | None = None,
+        filters: Dict[str, Any] | None = None,
     ) -> Dict[str, Any]:
         """Execute the analytics query.
 
         Args:
             question: User question.
-            seller_id: Optional seller ID for filtering (future extension).
+            seller_id: Optional seller ID; scopes the data to that seller.
+            filters: Unused (retrieval filters only apply to RAG agents).
 
         Returns:
-            Unified response dict (no citations).
+            Unified response dict (no citations). Template answers also
+            carry a structured "table" ({"columns", "rows"}).
         """
-        result = ask_agent(question)
-
-        return {
-            "intent": "analytics",
-            "answer": result,
-            "citations": [],
-            "confidence": 1.0,
-            "sources": [],
-        }
+        template = answer_with_template(question, seller_id)
+        if template is not None:
+            return _response(template["answer"], template)
+        return _response(ask_agent(question, seller_id))
+
+    async def arun(
+        self,
+        question: str,
+        seller_id: str | None = None,
+        filters: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any]:
+        """Async variant of `run`, used by the async request path."""
+        template = await asyncio.to_thread(
+            answer_with_template, question, seller_id
+        )
+        if template is not None:
+            return _response(template["answer"], template)
+        return _response(await aask_agent(question, seller_id))
@@ -0,0 +1,341 @@
+"""
+Module: analytics_templates.py
+------------------------------
+Deterministic templates for the most common analytics questions.
+
+Most analytics traffic has one of a few shapes:
+- top/bottom N products by a metric ("top 5 products by return rate")
+- a metric per category ("average rating by category", "compare late
+  delivery rates across categories", optionally limited to some categories)
+- a single overall figure ("what is the average return rate?")
+
+Those are answered with vectorized pandas aggregations over the cached
+analytics frame, in milliseconds, instead of a multi-step LLM agent loop.
+Questions that match no template (or need reasoning, e.g. correlations or
+trends) return None and fall through to the pandas agent. So do questions
+with a condition the templates cannot apply: a threshold or comparator
+("return rate above 20%", "over 50 euros"), a negation ("products with no
+returns") or more than one metric ("how many orders were late").
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import logging
+import pandas as pd
+
+from app import constants
+
+
+logger = logging.getLogger(__name__)
+
+# Metric column -> (display name, phrases that refer to it). The longest
+# matching phrase wins, so "late delivery rate" beats "late".
+METRICS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "late_rate": (
+        "late delivery rate",
+        (
+            "late delivery rate",
+            "late deliveries",
+            "late delivery",
+            "late rate",
+            "delayed",
+            "delays",
+            "late",
+        ),
+    ),
+    "return_rate": (
+        "return rate",
+        ("return rate", "returns", "returned"),
+    ),
+    "avg_rating": (
+        "average rating",
+        ("rating", "rated", "reviews", "stars"),
+    ),
+    "revenue": ("revenue", ("revenue", "sales", "turnover")),
+    "orders": ("orders", ("number of orders", "orders", "sold", "popular")),
+    "price": ("price", ("price", "expensive", "cheapest", "cheap")),
+}
+
+# Questions that need reasoning the templates cannot do.
+_UNSUPPORTED_RE = re.compile(
+    r"\b(why|correlat\w*|trend\w*|over time|forecast\w*|predict\w*|"
+    r"month\w*|week\w*|explain|relationship)\b"
+)
+# Thresholds, comparators and negations filter rows; the templates only rank
+# or aggregate, so such questions go to the agent.
+_CONDITION_RE = re.compile(
+    r"\b(above|below|over|under|more than|less than|greater than|"
+    r"fewer than|higher than|lower than|at least|at most|exceed\w*|"
+    r"no|not|none|never|without|zero|except|excluding)\b|n't\b|[<>=≤≥%]"
+)
+_NUMBER_RE = re.compile(r"\d")
+_ASCENDING_RE = re.compile(
+    r"\b(lowest|least|bottom|fewest|smallest|cheapest|worst rated|"
+    r"lowest rated|poorly rated)\b"
+)
+_TOP_N_RE = re.compile(
+    r"\b(?:top|bottom|first)\s+(\d{1,3})\b|\b(\d{1,3})\s+products\b"
+)
+_CATEGORY_GROUP_RE = re.compile(
+    r"\b(by|per|each|every|across|between)\s+categor\w*|"
+    r"\bwhich categor\w*|\bcategories\b|\bcompare\b"
+)
+_PRODUCT_RE = re.compile(r"\bproducts?\b|\bitems?\b|\bskus?\b")
+_OVERALL_RE = re.compile(r"\b(overall|average|mean|total)\b")
+
+DEFAULT_TOP_N = 5
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {"matched": 0, "fallthrough": 0}
+
+
+@dataclass
+class TemplateResult:
+    """Structured answer produced by a template."""
+
+    template: str
+    answer: str
+    columns: List[str]
+    rows: List[List[Any]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the result as a JSON-serializable dict."""
+        return {
+            "template": self.template,
+            "answer": self.answer,
+            "table": {"columns": self.columns, "rows": self.rows},
+        }
+
+
+def _find_metrics(text: str) -> List[str]:
+    """Return the metric columns a question refers to, in order of mention.
+
+    Longer phrases win over the phrases they contain, so "late delivery
+    rate" counts once, as `late_rate`.
+    """
+    found = sorted(
+        (
+            (m.start(), m.end(), column)
+            for column, (_, phrases) in METRICS.items()
+            for phrase in phrases
+            for m in re.finditer(rf"\b{re.escape(phrase)}\b", text)
+        ),
+        key=lambda f: f[0] - f[1],
+    )
+    spans: List[Tuple[int, int, str]] = []
+    for start, end, column in found:
+        if all(end <= s or start >= e for s, e, _ in spans):
+            spans.append((start, end, column))
+
+    metrics: List[str] = []
+    for _, _, column in sorted(spans):
+        if column not in metrics:
+            metrics.append(column)
+    return metrics
+
+
+def _find_categories(text: str) -> List[str]:
+    """Return catalog categories mentioned in a question."""
+    return [
+        c
+        for c in constants.PRODUCT_CATEGORIES
+        if re.search(rf"\b{re.escape(c.lower())}\b", text)
+    ]
+
+
+def _to_rows(df: pd.DataFrame) -> List[List[Any]]:
+    """Convert a frame into JSON-friendly rows (floats rounded)."""
+    rows = []
+    for record in df.itertuples(index=False):
+        row = []
+        for value in record:
+            if hasattr(value, "item"):
+                value = value.item()
+            if isinstance(value, float):
+                value = None if math.isnan(value) else round(value, 4)
+            row.append(value)
+        rows.append(row)
+    return rows
+
+
+def _format_value(value: Any) -> str:
+    """Format a metric value for the text answer."""
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def _category_table(df: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """Aggregate a metric per category with vectorized groupby.
+
+    Late rates are order-weighted when order counts are available; counts
+    and revenue are summed; other metrics are averaged over products.
+    """
+    grouped = df.groupby("category", observed=True)
+    if metric == "late_rate" and {"late_orders", "orders"} <= set(df.columns):
+        values = grouped["late_orders"].sum() / grouped["orders"].sum()
+    elif metric in ("orders", "revenue"):
+        values = grouped[metric].sum()
+    else:
+        values = grouped[metric].mean()
+    table = pd.DataFrame(
+        {"category": values.index.astype(str), metric: values.to_numpy()}
+    )
+    table["products"] = grouped.size().to_numpy()
+    return table
+
+
+def _top_products(
+    df: pd.DataFrame, metric: str, n: int, ascending: bool
+) -> TemplateResult:
+    """Top/bottom N products by a metric.
+
+    Products are named by the first available id column ("product_id",
+    then "name"), falling back to the row index.
+    """
+    columns = [
+        c for c in ("product_id", "name", "category") if c in df.columns
+    ] + [metric]
+    id_column = next((c for c in ("product_id", "name") if c in columns), None)
+    ranked = df.dropna(subset=[metric])
+    ranked = (
+        ranked.nsmallest(n, metric) if ascending else ranked.nlargest(n, metric)
+    )
+
+    label = METRICS[metric][0]
+    direction = "Lowest" if ascending else "Highest"
+    listed = ", ".join(
+        f"{row[id_column] if id_column else index} "
+        f"({_format_value(row[metric])})"
+        for index, row in ranked.iterrows()
+    )
+    ranked = ranked[columns]
+    return TemplateResult(
+        template="top_products",
+        answer=f"{direction} {label}: {listed}.",
+        columns=columns,
+        rows=_to_rows(ranked),
+    )
+
+
+def _by_category(
+    df: pd.DataFrame,
+    metric: str,
+    ascending: bool,
+    categories: List[str],
+) -> TemplateResult:
+    """A metric per category, optionally limited to some categories."""
+    table = _category_table(df, metric)
+    if categories:
+        table = table[table["category"].isin(categories)]
+    table = table.sort_values(metric, ascending=ascending)
+
+    label = METRICS[metric][0]
+    listed = ", ".join(
+        f"{row['category']} ({_format_value(row[metric])})"
+        for _, row in table.iterrows()
+    )
+    return TemplateResult(
+        template="by_category",
+        answer=f"{label.capitalize()} by category: {listed}.",
+        columns=list(table.columns),
+        rows=_to_rows(table),
+    )
+
+
+def _overall(df: pd.DataFrame, metric: str) -> TemplateResult:
+    """A single overall figure for the whole catalog."""
+    if metric == "late_rate" and {"late_orders", "orders"} <= set(df.columns):
+        value = float(df["late_orders"].sum() / df["orders"].sum())
+        label = "Overall late delivery rate"
+    elif metric in ("orders", "revenue"):
+        value = float(df[metric].sum())
+        label = f"Total {METRICS[metric][0]}"
+    else:
+        value = float(df[metric].mean())
+        label = f"Average {METRICS[metric][0]}"
+    return TemplateResult(
+        template="overall",
+        answer=f"{label}: {_format_value(value)}.",
+        columns=["metric", "value"],
+        rows=[[metric, round(value, 4)]],
+    )
+
+
+def stats() -> Dict[str, int]:
+    """Return template matched/fallthrough counters.
+
+    Returns:
+        dict: {"matched": int, "fallthrough": int}
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(outcome: str) -> None:
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def match(question: str, df: pd.DataFrame) -> Optional[TemplateResult]:
+    """Answer a question with a template, or return None to use the agent.
+
+    Args:
+        question: User question.
+        df: Analytics frame, one row per product (see
+            `analytics_agent.get_data`).
+
+    Returns:
+        The structured result, or None if no template applies.
+    """
+    result = _match(question.lower(), df)
+    _count("fallthrough" if result is None else "matched")
+    if result is not None:
+        logger.info(f"Answered with analytics template={result.template}")
+    return result
+
+
+def _match(text: str, df: pd.DataFrame) -> Optional[TemplateResult]:
+    """Pick and run the template for a lower-cased question."""
+    if _UNSUPPORTED_RE.search(text) or _CONDITION_RE.search(text):
+        return None
+
+    # The only number a template understands is the top-N count.
+    top_n = _TOP_N_RE.search(text)
+    rest = text[: top_n.start()] + text[top_n.end() :] if top_n else text
+    if _NUMBER_RE.search(rest):
+        return None
+
+    metrics = _find_metrics(text)
+    if len(metrics) != 1 or metrics[0] not in df.columns:
+        return None
+    metric = metrics[0]
+
+    ascending = bool(_ASCENDING_RE.search(text))
+    categories = _find_categories(text)
+    by_category = bool(_CATEGORY_GROUP_RE.search(text)) or (len(categories) > 1)
+
+    about_products = bool(_PRODUCT_RE.search(text))
+
+    if by_category or (categories and not about_products):
+        if "category" not in df.columns:
+            return None
+        return _by_category(df, metric, ascending, categories)
+    if about_products:
+        n = (
+            int(next(g for g in top_n.groups() if g))
+            if top_n
+            else DEFAULT_TOP_N
+        )
+        if categories:
+            df = df[df["category"].isin(categories)]
+        return _top_products(df, metric, n, ascending)
+    if _OVERALL_RE.search(text):
+        return _overall(df, metric)
+    return None
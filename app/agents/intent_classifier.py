@@ -0,0 +1,210 @@
+"""
+Module: intent_classifier.py
+----------------------------
+Local, CPU-only intent classifier used as the router's fast path.
+
+A TF-IDF (word + character n-grams) and logistic regression model is trained
+in-process on a small set of labelled exemplar questions. It answers in well
+under a millisecond, so the router only falls back to the Ollama classifier
+when this model is not confident enough.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Tuple
+
+import logging
+
+from app import constants, registry
+
+
+logger = logging.getLogger(__name__)
+
+CLASSIFIER_KEY = "classifier:intent"
+
+INTENT_EXEMPLARS: Dict[str, List[str]] = {
+    "policy": [
+        "Is selling knives allowed?",
+        "Can I sell weapons on Marketplace X?",
+        "Which items are prohibited?",
+        "Are counterfeit products banned?",
+        "What happens if I list a restricted item?",
+        "What are the penalties for late shipments?",
+        "Will my account be suspended for policy violations?",
+        "What are the rules for selling cosmetics?",
+        "Am I allowed to sell used electronics?",
+        "What is the return policy I must follow as a seller?",
+        "What compliance requirements apply to food products?",
+        "How many strikes before my account gets deactivated?",
+        "Is it forbidden to sell alcohol?",
+        "What documents are required to sell in the toys category?",
+        "What is the maximum handling time allowed by the rules?",
+    ],
+    "recommendation": [
+        "How can I improve my conversion?",
+        "How do I write a better product title?",
+        "Tips to improve my listing quality",
+        "How can I get more sales on my listings?",
+        "What should I include in product descriptions?",
+        "How do I optimize my listing for search?",
+        "How can I improve my product photos?",
+        "How can I increase my visibility on Marketplace X?",
+        "What can I do to reduce returns on my products?",
+        "How should I price my products to be more competitive?",
+        "Any advice to grow my shop?",
+        "How do I improve my seller rating?",
+        "What are best practices for listing SEO?",
+        "How can I boost my click-through rate?",
+        "How to make my listings more attractive to buyers?",
+    ],
+    "analytics": [
+        "Which product has the highest return rate?",
+        "What is the average return rate by category?",
+        "Which categories perform best?",
+        "Show the top 5 products by revenue",
+        "Compare late delivery rates across categories",
+        "What is my average rating per category?",
+        "How many orders were delivered late last month?",
+        "What is the trend of my sales over time?",
+        "Which products have a high return rate and low rating?",
+        "List products with the lowest average rating",
+        "What is the correlation between price and return rate?",
+        "What percentage of my orders arrive late?",
+        "Which category has the most orders?",
+        "What is the total revenue per category?",
+        "Rank my products by number of returns",
+    ],
+    "refusal": [
+        "What is the GDP of France?",
+        "Write me a poem about the sea",
+        "Who won the football world cup?",
+        "What is the weather tomorrow in Paris?",
+        "Give me a recipe for chocolate cake",
+        "Tell me a joke",
+        "Who is the president of the United States?",
+        "How do I hack my neighbour's wifi?",
+        "Translate this sentence into Spanish",
+        "What is the capital of Japan?",
+        "Help me with my math homework",
+        "Recommend a good movie to watch tonight",
+        "What is the meaning of life?",
+        "Explain quantum physics",
+        "What stocks should I buy?",
+    ],
+}
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {"fast_path": 0, "llm_fallback": 0}
+
+
+def _train() -> Any:
+    """Fit the TF-IDF + logistic regression pipeline on the exemplars.
+
+    Returns:
+        Pipeline: Fitted scikit-learn pipeline exposing `predict_proba`.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import FeatureUnion, Pipeline
+
+    texts: List[str] = []
+    labels: List[str] = []
+    for label, examples in INTENT_EXEMPLARS.items():
+        texts.extend(examples)
+        labels.extend([label] * len(examples))
+
+    model = Pipeline(
+        [
+            (
+                "features",
+                FeatureUnion(
+                    [
+                        (
+                            "word",
+                            TfidfVectorizer(
+                                lowercase=True,
+                                ngram_range=(1, 2),
+                                sublinear_tf=True,
+                            ),
+                        ),
+                        (
+                            "char",
+                            TfidfVectorizer(
+                                lowercase=True,
+                                analyzer="char_wb",
+                                ngram_range=(3, 5),
+                                sublinear_tf=True,
+                            ),
+                        ),
+                    ]
+                ),
+            ),
+            ("clf", LogisticRegression(C=20.0, max_iter=1000)),
+        ]
+    )
+    model.fit(texts, labels)
+    logger.info(
+        f"Fast-path intent classifier trained on {len(texts)} exemplars"
+    )
+    return model
+
+
+def get_classifier() -> Any:
+    """Return the shared fitted classifier, training it on first use."""
+    return registry.get_or_create(CLASSIFIER_KEY, _train)
+
+
+def predict(question: str) -> Tuple[str, float]:
+    """Predict an intent label with its probability.
+
+    Args:
+        question: User question.
+
+    Returns:
+        Tuple of (label, confidence in [0, 1]).
+    """
+    model = get_classifier()
+    probs = model.predict_proba([question])[0]
+    best = int(probs.argmax())
+    return str(model.classes_[best]), float(probs[best])
+
+
+def predict_many(questions: List[str]) -> List[Tuple[str, float]]:
+    """Batch variant of `predict` (one vectorized classifier call).
+
+    Args:
+        questions: User questions.
+
+    Returns:
+        One (label, confidence) tuple per question.
+    """
+    if not questions:
+        return []
+    model = get_classifier()
+    probs = model.predict_proba(questions)
+    best = probs.argmax(axis=1)
+    return [(str(model.classes_[b]), float(p[b])) for b, p in zip(best, probs)]
+
+
+def is_confident(confidence: float) -> bool:
+    """Return True if a fast-path prediction can skip the LLM."""
+    return confidence >= constants.ROUTER_FAST_PATH_THRESHOLD
+
+
+def record(fallback: bool) -> None:
+    """Count one routing decision as fast-path or LLM fallback."""
+    with _stats_lock:
+        _stats["llm_fallback" if fallback else "fast_path"] += 1
+
+
+def routing_stats() -> Dict[str, float]:
+    """Return fast-path vs LLM fallback counters and the fallback rate.
+
+    Returns:
+        dict: {"fast_path": int, "llm_fallback": int, "fallback_rate": float}
+    """
+    with _stats_lock:
+        total = _stats["fast_path"] + _stats["llm_fallback"]
+        rate = _stats["llm_fallback"] / total if total else 0.0
+        return {**_stats, "fallback_rate": rate}
@@ -9,24 +9,42 @@ from __future__ import annotations
 from typing import Any, Dict
 
 from app.rag import chains
+from app.rag.filters import Filters
 
 
 class PolicyAgent:
     """Strict policy/compliance agent."""
 
     def run(
-        self, question: str, seller_id: str | None = None
+        self,
+        question: str,
+        seller_id: str | None = None,
+        filters: Filters | None = None,
     ) -> Dict[str, Any]:
         """Execute the policy RAG pipeline.
 
         Args:
             question: User question.
             seller_id: Unused for policy questions.
+            filters: Optional metadata filter for retrieval
+                (e.g. {"doc_id": "penalties"}).
 
         Returns:
             RAG result as a dict.
         """
         return {
             "intent": "policy",
-            **chains.run_policy_rag(question),
+            **chains.run_policy_rag(question, filters),
+        }
+
+    async def arun(
+        self,
+        question: str,
+        seller_id: str | None = None,
+        filters: Filters | None = None,
+    ) -> Dict[str, Any]:
+        """Async variant of `run`, used by the async request path."""
+        return {
+            "intent": "policy",
+            **(await chains.arun_policy_rag(question, filters)),
         }
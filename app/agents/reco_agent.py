@@ -9,24 +9,42 @@ from __future__ import annotations
 from typing import Any, Dict
 
 from app.rag import chains
+from app.rag.filters import Filters
 
 
 class RecommendationAgent:
     """Growth and listing optimization agent."""
 
     def run(
-        self, question: str, seller_id: str | None = None
+        self,
+        question: str,
+        seller_id: str | None = None,
+        filters: Filters | None = None,
     ) -> Dict[str, Any]:
         """Execute the recommendation RAG pipeline.
 
         Args:
             question: Seller question.
             seller_id: Unused for now. Will support hybrid RAG + analytics later.
+            filters: Optional metadata filter for retrieval
+                (e.g. {"doc_id": "penalties"}).
 
         Returns:
             RAG result as a dict.
         """
         return {
             "intent": "recommendation",
-            **chains.run_recommendation_rag(question),
+            **chains.run_recommendation_rag(question, filters),
+        }
+
+    async def arun(
+        self,
+        question: str,
+        seller_id: str | None = None,
+        filters: Filters | None = None,
+    ) -> Dict[str, Any]:
+        """Async variant of `run`, used by the async request path."""
+        return {
+            "intent": "recommendation",
+            **(await chains.arun_recommendation_rag(question, filters)),
         }
@@ -13,13 +13,17 @@ class RefusalAgent:
     """Simple fallback agent that always refuses."""
 
     def run(
-        self, question: str, seller_id: str | None = None
+        self,
+        question: str,
+        seller_id: str | None = None,
+        filters: Dict[str, Any] | None = None,
     ) -> Dict[str, Any]:
         """Return a polite refusal message.
 
         Args:
             question: User question.
             seller_id: Unused.
+            filters: Unused.
 
         Returns:
             A unified refusal response.
@@ -34,3 +38,12 @@ class RefusalAgent:
             "confidence": 0.0,
             "sources": [],
         }
+
+    async def arun(
+        self,
+        question: str,
+        seller_id: str | None = None,
+        filters: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any]:
+        """Async variant of `run` (no I/O involved)."""
+        return self.run(question=question, seller_id=seller_id)
@@ -6,39 +6,99 @@ Intent classifier and routing logic for Marketplace X agents.
 Responsible for:
 - Classifying a user question into one of:
   {policy, recommendation, analytics, refusal}
+  using a local fast-path classifier, falling back to the LLM
+- Serving repeated questions from the semantic answer cache
 - Dispatching the question to the correct agent
+- Streaming answers (citations, tokens, final metadata) for the SSE endpoint
+- Answering batches of questions with shared classification, embedding
+  and retrieval work, and bounded LLM parallelism
 - Returning a unified response schema
 """
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+import copy
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
 
 import logging
+from langchain.schema import Document
 from langchain_community.llms import Ollama
 
-from app import constants
-from app.agents.analytics_agent import AnalyticsAgent
+from app import answer_cache, concurrency, constants, registry, tracing
+from app.agents import intent_classifier
+from app.agents.analytics_agent import AnalyticsAgent, check_data_freshness
 from app.agents.policy_agent import PolicyAgent
 from app.agents.reco_agent import RecommendationAgent
 from app.agents.refusal_agent import RefusalAgent
+from app.rag import chains, filters as metadata_filters
+from app.rag.filters import Filters
 
 
 logger = logging.getLogger(__name__)
 
 
+@tracing.traced("classify")
 def classify_intent(question: str) -> str:
     """Classify a question into a routing intent.
 
+    The local TF-IDF classifier answers first; the Ollama classifier is only
+    called when its confidence is below `constants.ROUTER_FAST_PATH_THRESHOLD`.
+    Fallback frequency is tracked in `intent_classifier.routing_stats()`.
+
     Args:
         question: User question.
 
     Returns:
         One of: "policy", "recommendation", "analytics", "refusal".
     """
-    llm = Ollama(model=constants.LLM_MODEL_ROUTER, temperature=0.0)
+    label = _classify_fast_path(question)
+    if label is not None:
+        return label
+
+    return classify_intent_llm(question)
+
+
+def _classify_fast_path(question: str) -> str | None:
+    """Return the local classifier's label, or None to fall back to the LLM.
+
+    Args:
+        question: User question.
+
+    Returns:
+        The predicted intent if confident enough, else None.
+    """
+    if not constants.ROUTER_FAST_PATH_ENABLED:
+        return None
+
+    label, confidence = intent_classifier.predict(question)
+    if intent_classifier.is_confident(confidence):
+        intent_classifier.record(fallback=False)
+        logger.info(f"Fast-path intent={label} confidence={confidence:.2f}")
+        return label
+
+    intent_classifier.record(fallback=True)
+    return None
+
+
+def classify_intent_llm(question: str) -> str:
+    """Classify a question into a routing intent with the Ollama LLM.
+
+    Args:
+        question: User question.
 
-    prompt = (
+    Returns:
+        One of: "policy", "recommendation", "analytics", "refusal".
+    """
+    llm = registry.get_llm(constants.LLM_MODEL_ROUTER, 0.0, llm_cls=Ollama)
+
+    with tracing.span("classify_llm"):
+        return _parse_intent(llm(_router_prompt(question)))
+
+
+def _router_prompt(question: str) -> str:
+    """Build the intent classification prompt for the router LLM."""
+    return (
         "Classify the following user query into exactly one category:\n"
         "- policy: rules, compliance, prohibited items, penalties.\n"
         "- recommendation: growth, conversion, SEO, listing improvements.\n"
@@ -48,7 +108,10 @@ def classify_intent(question: str) -> str:
         f"Query: {question}"
     )
 
-    result = llm(prompt).strip().lower()
+
+def _parse_intent(raw: str) -> str:
+    """Normalize the router LLM output, mapping unknown labels to refusal."""
+    result = raw.strip().lower()
 
     if result not in {"policy", "recommendation", "analytics", "refusal"}:
         logger.warning(f"Router LLM returned unexpected label: {result}")
@@ -57,6 +120,30 @@ def classify_intent(question: str) -> str:
     return result
 
 
+@tracing.traced("classify")
+async def aclassify_intent(question: str) -> str:
+    """Async variant of `classify_intent`.
+
+    The fast path runs inline (sub-millisecond); the LLM fallback uses the
+    async Ollama client under the shared LLM limiter.
+
+    Args:
+        question: User question.
+
+    Returns:
+        One of: "policy", "recommendation", "analytics", "refusal".
+    """
+    label = _classify_fast_path(question)
+    if label is not None:
+        return label
+
+    llm = registry.get_llm(constants.LLM_MODEL_ROUTER, 0.0, llm_cls=Ollama)
+    async with concurrency.get_limiter().slot():
+        with tracing.span("classify_llm"):
+            result = await llm.ainvoke(_router_prompt(question))
+    return _parse_intent(result)
+
+
 # Agent registry --------------------------------------------------------------
 
 AGENTS = {
@@ -70,7 +157,19 @@ AGENTS = {
 # Router ----------------------------------------------------------------------
 
 
-def route(question: str, seller_id: str | None = None) -> Dict[str, Any]:
+def _cache_namespace(seller_id: str | None, filters: Filters | None) -> str:
+    """Answer-cache namespace: answers differ per seller and per filter."""
+    namespace = f"route:{seller_id or '*'}"
+    if filters:
+        namespace += f":{metadata_filters.cache_key(filters)}"
+    return namespace
+
+
+def route(
+    question: str,
+    seller_id: str | None = None,
+    filters: Filters | None = None,
+) -> Dict[str, Any]:
     """Route a question to the appropriate Marketplace X agent.
 
     Args:
@@ -78,6 +177,9 @@ def route(question: str, seller_id: str | None = None) -> Dict[str, Any]:
             The user question in natural language.
         seller_id:
             Optional seller identifier for analytics/personalization.
+        filters:
+            Optional metadata filter passed down to retrieval, e.g.
+            {"doc_id": "penalties"} (see `app.rag.filters`).
 
     Returns:
         Unified agent response dict:
@@ -89,9 +191,419 @@ def route(question: str, seller_id: str | None = None) -> Dict[str, Any]:
             "sources": list[dict]
         }
     """
+    # Cached analytics answers must not outlive the CSVs they were computed on.
+    check_data_freshness()
+
+    namespace = _cache_namespace(seller_id, filters)
+    with tracing.span("cache_lookup"):
+        cached = answer_cache.lookup(question, namespace=namespace)
+    if cached is not None:
+        tracing.set_intent(cached.get("intent", tracing.NO_INTENT))
+        return cached
+
     intent = classify_intent(question)
+    tracing.set_intent(intent)
+    agent = AGENTS.get(intent, RefusalAgent())
+
+    logger.info(f"Routing intent={intent} for question={question}")
+
+    with tracing.span("agent", intent=intent):
+        result = agent.run(
+            question=question, seller_id=seller_id, filters=filters
+        )
+    answer_cache.store(question, result, namespace=namespace)
+    return result
+
+
+async def aroute(
+    question: str,
+    seller_id: str | None = None,
+    filters: Filters | None = None,
+) -> Dict[str, Any]:
+    """Async variant of `route`.
+
+    Blocking work (cache embedding, CSV freshness checks) runs in worker
+    threads; LLM calls go through the shared limiter and may raise
+    `OverloadedError` when the backend queue is full.
+
+    Args:
+        question: The user question in natural language.
+        seller_id: Optional seller identifier for analytics/personalization.
+        filters: Optional retrieval metadata filter (see `route`).
+
+    Returns:
+        Unified agent response dict (see `route`).
+    """
+    await asyncio.to_thread(check_data_freshness)
+
+    namespace = _cache_namespace(seller_id, filters)
+    with tracing.span("cache_lookup"):
+        cached = await asyncio.to_thread(
+            answer_cache.lookup, question, namespace=namespace
+        )
+    if cached is not None:
+        tracing.set_intent(cached.get("intent", tracing.NO_INTENT))
+        return cached
+
+    intent = await aclassify_intent(question)
+    tracing.set_intent(intent)
     agent = AGENTS.get(intent, RefusalAgent())
 
     logger.info(f"Routing intent={intent} for question={question}")
 
-    return agent.run(question=question, seller_id=seller_id)
+    with tracing.span("agent", intent=intent):
+        result = await agent.arun(
+            question=question, seller_id=seller_id, filters=filters
+        )
+    await asyncio.to_thread(
+        answer_cache.store, question, result, namespace=namespace
+    )
+    return result
+
+
+# Streaming -------------------------------------------------------------------
+
+STREAMERS = {
+    "policy": chains.stream_policy_rag,
+    "recommendation": chains.stream_recommendation_rag,
+}
+
+
+def _result_events(result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Replay a complete agent response as stream events."""
+    yield {"event": "citations", "data": result.get("citations", [])}
+    yield {"event": "token", "data": str(result.get("answer", ""))}
+    yield {
+        "event": "done",
+        "data": {
+            "intent": result.get("intent"),
+            "confidence": result.get("confidence"),
+            "sources": result.get("sources", []),
+        },
+    }
+
+
+def stream_route(
+    question: str,
+    seller_id: str | None = None,
+    filters: Filters | None = None,
+) -> Iterator[Dict[str, Any]]:
+    """Route a question and stream the answer as it is generated.
+
+    Policy and recommendation answers stream LLM tokens; analytics and
+    refusal answers (and cache hits) are sent as a single token event.
+
+    Args:
+        question: The user question in natural language.
+        seller_id: Optional seller identifier for analytics/personalization.
+        filters: Optional retrieval metadata filter (see `route`).
+
+    Yields:
+        Event dicts, in order:
+        - {"event": "citations", "data": list[str]}
+        - {"event": "token", "data": str} (one or more)
+        - {"event": "done", "data": {"intent", "confidence", "sources"}}
+    """
+    check_data_freshness()
+
+    namespace = _cache_namespace(seller_id, filters)
+    cached = answer_cache.lookup(question, namespace=namespace)
+    if cached is not None:
+        yield from _result_events(cached)
+        return
+
+    intent = classify_intent(question)
+    logger.info(f"Streaming intent={intent} for question={question}")
+
+    streamer = STREAMERS.get(intent)
+    if streamer is None:
+        agent = AGENTS.get(intent, RefusalAgent())
+        result = agent.run(
+            question=question, seller_id=seller_id, filters=filters
+        )
+        answer_cache.store(question, result, namespace=namespace)
+        yield from _result_events(result)
+        return
+
+    result: Dict[str, Any] = {"intent": intent, "citations": []}
+    tokens = []
+    for event in streamer(question, filters):
+        if event["event"] == "citations":
+            result["citations"] = event["data"]
+        elif event["event"] == "token":
+            tokens.append(event["data"])
+        elif event["event"] == "done":
+            result.update(event["data"])
+            event = {
+                "event": "done",
+                "data": {"intent": intent, **event["data"]},
+            }
+        yield event
+
+    result["answer"] = "".join(tokens)
+    answer_cache.store(question, result, namespace=namespace)
+
+
+# Batch -----------------------------------------------------------------------
+
+
+async def _aclassify_batch(
+    questions: List[str], semaphore: asyncio.Semaphore
+) -> List[str | Exception]:
+    """Bulk variant of `aclassify_intent`.
+
+    The local classifier scores every question in one call; only the
+    low-confidence ones go to the LLM, `semaphore` bounding how many run at
+    once. A failed LLM call is returned in place of its label.
+
+    Args:
+        questions: User questions.
+        semaphore: Bounds the concurrent LLM fallback calls.
+
+    Returns:
+        One intent (or the exception raised classifying it) per question.
+    """
+    labels: List[str | Exception | None] = [None] * len(questions)
+    if constants.ROUTER_FAST_PATH_ENABLED:
+        predictions = intent_classifier.predict_many(questions)
+        for i, (label, confidence) in enumerate(predictions):
+            confident = intent_classifier.is_confident(confidence)
+            intent_classifier.record(fallback=not confident)
+            if confident:
+                labels[i] = label
+
+    fallback = [i for i, label in enumerate(labels) if label is None]
+    if fallback:
+        llm = registry.get_llm(constants.LLM_MODEL_ROUTER, 0.0, llm_cls=Ollama)
+
+        async def _classify(question: str) -> str:
+            async with semaphore, concurrency.get_limiter().slot():
+                with tracing.span("classify_llm"):
+                    return _parse_intent(
+                        await llm.ainvoke(_router_prompt(question))
+                    )
+
+        results = await asyncio.gather(
+            *(_classify(questions[i]) for i in fallback),
+            return_exceptions=True,
+        )
+        for i, result in zip(fallback, results):
+            labels[i] = result
+
+    return labels
+
+
+def _batch_error(intent: str | None, error: Exception) -> Dict[str, Any]:
+    """Per-question failure entry of a batch (the batch itself goes on)."""
+    logger.warning(f"Batch question failed (intent={intent}): {error}")
+    return {"intent": intent, "error": str(error)}
+
+
+async def aiter_route_batch(
+    questions: List[str],
+    seller_id: str | None = None,
+    filters: Filters | None = None,
+    max_concurrency: int | None = None,
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Route many questions, amortizing the per-question overhead.
+
+    - Identical (normalized) questions are answered once
+    - Cache lookups embed all questions in one call
+    - Intents are classified in bulk (see `_aclassify_batch`)
+    - Policy/recommendation questions are embedded in one encoder call and
+      searched with one vector query per pipeline (`chains.retrieve_many`)
+    - Generations and agent runs execute concurrently, at most
+      `max_concurrency` at a time, under the shared LLM limiter
+
+    A question that fails yields {"intent", "error"} instead of an answer.
+
+    Args:
+        questions: User questions.
+        seller_id: Optional seller identifier for analytics/personalization.
+        filters: Optional retrieval metadata filter (see `route`).
+        max_concurrency: Concurrent LLM calls for this batch
+            (default `constants.BATCH_MAX_CONCURRENCY`).
+
+    Yields:
+        (input index, unified agent response) pairs as answers complete.
+    """
+    await asyncio.to_thread(check_data_freshness)
+
+    # Duplicates share one answer: normalized question -> input indices.
+    groups: Dict[str, List[int]] = {}
+    for i, question in enumerate(questions):
+        normalized = answer_cache.normalize_question(question)
+        groups.setdefault(normalized, []).append(i)
+    positions = list(groups.values())
+    unique = [questions[indices[0]] for indices in positions]
+
+    def _fan_out(u: int, result: Dict[str, Any]) -> Iterator[Tuple[int, Dict]]:
+        yield positions[u][0], result
+        for i in positions[u][1:]:
+            yield i, copy.deepcopy(result)
+
+    namespace = _cache_namespace(seller_id, filters)
+    with tracing.span("cache_lookup", questions=len(unique)):
+        cached = await asyncio.to_thread(
+            answer_cache.lookup_many, unique, namespace=namespace
+        )
+    pending = [u for u, hit in enumerate(cached) if hit is None]
+    for u, hit in enumerate(cached):
+        if hit is not None:
+            for item in _fan_out(u, hit):
+                yield item
+    if not pending:
+        return
+
+    semaphore = asyncio.Semaphore(
+        max_concurrency or constants.BATCH_MAX_CONCURRENCY
+    )
+    with tracing.span("classify", questions=len(pending)):
+        intents = await _aclassify_batch(
+            [unique[u] for u in pending], semaphore
+        )
+
+    async def _run_agent(u: int, intent: str) -> Tuple[int, Dict[str, Any]]:
+        try:
+            async with semaphore:
+                with tracing.span("agent", intent=intent):
+                    result = await AGENTS.get(intent, RefusalAgent()).arun(
+                        question=unique[u], seller_id=seller_id, filters=filters
+                    )
+            return u, result
+        except Exception as e:
+            return u, _batch_error(intent, e)
+
+    async def _generate(
+        u: int, intent: str, docs: List[Document], confidence: float
+    ) -> Tuple[int, Dict[str, Any]]:
+        try:
+            async with semaphore:
+                answer = await chains.agenerate_rag(
+                    unique[u], intent, docs, confidence
+                )
+            return u, {"intent": intent, **answer}
+        except Exception as e:
+            return u, _batch_error(intent, e)
+
+    tasks: List[asyncio.Future] = []
+    rag: Dict[str, List[int]] = {}
+    for u, intent in zip(pending, intents):
+        if isinstance(intent, Exception):
+            for item in _fan_out(u, _batch_error(None, intent)):
+                yield item
+        elif intent in chains.PIPELINES:
+            rag.setdefault(intent, []).append(u)
+        else:
+            tasks.append(asyncio.ensure_future(_run_agent(u, intent)))
+
+    try:
+        if rag:
+            rag_questions = [unique[u] for group in rag.values() for u in group]
+            try:
+                retrievals = await asyncio.to_thread(
+                    _retrieve_batch, rag, rag_questions, filters
+                )
+            except Exception as e:
+                for intent, group in rag.items():
+                    for u in group:
+                        for item in _fan_out(u, _batch_error(intent, e)):
+                            yield item
+            else:
+                for intent, group in rag.items():
+                    for u, (docs, confidence) in zip(group, retrievals[intent]):
+                        tasks.append(
+                            asyncio.ensure_future(
+                                _generate(u, intent, docs, confidence)
+                            )
+                        )
+
+        answered: List[Tuple[str, Any]] = []
+        for future in asyncio.as_completed(tasks):
+            u, result = await future
+            if "error" not in result:
+                answered.append((unique[u], result))
+            for item in _fan_out(u, result):
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    await asyncio.to_thread(
+        answer_cache.store_many, answered, namespace=namespace
+    )
+
+
+def _retrieve_batch(
+    groups: Dict[str, List[int]],
+    questions: List[str],
+    filters: Filters | None,
+) -> Dict[str, List[Tuple[List[Document], float]]]:
+    """Embed all RAG questions at once, then search once per pipeline.
+
+    Questions go through the query path (and its cache), so they get the
+    same vectors as when answered one at a time.
+
+    Args:
+        groups: Pipeline -> question ids; `questions` lists them in the
+            same (flattened) order.
+        questions: Question texts.
+        filters: Optional retrieval metadata filter.
+
+    Returns:
+        Pipeline -> one (docs, confidence) retrieval per question id.
+    """
+    embeddings = registry.get_embeddings().embed_queries(questions)
+    retrievals = {}
+    offset = 0
+    for pipeline, group in groups.items():
+        batch = slice(offset, offset + len(group))
+        retrievals[pipeline] = chains.retrieve_many(
+            questions[batch], pipeline, embeddings[batch], filters
+        )
+        offset += len(group)
+    return retrievals
+
+
+async def aroute_batch(
+    questions: List[str],
+    seller_id: str | None = None,
+    filters: Filters | None = None,
+    max_concurrency: int | None = None,
+) -> List[Dict[str, Any]]:
+    """Route many questions and return the answers in input order.
+
+    See `aiter_route_batch` for how work is shared across questions.
+
+    Returns:
+        One unified agent response (or {"intent", "error"}) per question.
+    """
+    results: List[Dict[str, Any] | None] = [None] * len(questions)
+    async for i, result in aiter_route_batch(
+        questions,
+        seller_id=seller_id,
+        filters=filters,
+        max_concurrency=max_concurrency,
+    ):
+        results[i] = result
+    return results
+
+
+def route_batch(
+    questions: List[str],
+    seller_id: str | None = None,
+    filters: Filters | None = None,
+    max_concurrency: int | None = None,
+) -> List[Dict[str, Any]]:
+    """Synchronous entry point of `aroute_batch` for scripts and jobs.
+
+    Must not be called from a running event loop.
+    """
+    return asyncio.run(
+        aroute_batch(
+            questions,
+            seller_id=seller_id,
+            filters=filters,
+            max_concurrency=max_concurrency,
+        )
+    )
@@ -0,0 +1,397 @@
+"""
+Module: analytics_store.py
+--------------------------
+Columnar analytics store with precomputed seller KPIs.
+
+`products.csv` and `orders.csv` are converted once into Parquet files with
+explicit dtypes (categoricals for ids and categories, compact numerics,
+Arrow-backed strings). A KPI layer is precomputed at the same time:
+- per product: orders, late rate, return rate, revenue, rolling windows
+- per category: the same KPIs aggregated over its products
+- per category and day: orders, late orders, revenue and 7/30-day rolling sums
+
+Tables are read lazily, on first use, with memory-mapped Parquet reads and
+cached in-process. The store is rebuilt automatically when the source CSVs
+change (same mtime/size fingerprint as `analytics_agent`). Common analytics
+questions become lookups in the small KPI tables instead of full scans.
+
+Requires `pyarrow`; callers fall back to plain CSV reads when it is missing.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Dict, List
+
+import logging
+import os
+import pandas as pd
+
+from app import constants
+
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+PRODUCT_DTYPES = {
+    "product_id": "category",
+    "seller_id": "category",
+    "name": "string[pyarrow]",
+    "category": "category",
+    "price": "float32",
+    "stock_qty": "int32",
+    "avg_rating": "float32",
+    "return_rate": "float32",
+    "delivery_estimate_days": "int16",
+    "description": "string[pyarrow]",
+}
+
+ORDER_DTYPES = {
+    "order_id": "string[pyarrow]",
+    "product_id": "category",
+    "estimated_delivery_days": "int16",
+    "delivered_late": "bool",
+    "customer_feedback": "string[pyarrow]",
+}
+ORDER_DATE_COLUMNS = ["order_date", "actual_delivery_date"]
+
+TABLES = ("products", "orders", "product_kpis", "category_kpis", "daily_kpis")
+
+_lock = threading.RLock()
+_tables: Dict[str, pd.DataFrame] = {}
+_loaded_fingerprint: List[Any] | None = None
+
+
+def _get_store_dir() -> str:
+    """Return the store directory, next to the products CSV."""
+    return os.path.join(
+        os.path.dirname(constants.PRODUCTS_PATH) or ".",
+        constants.ANALYTICS_STORE_SUBDIR,
+    )
+
+
+def _table_path(name: str) -> str:
+    """Return the Parquet path of a store table."""
+    return os.path.join(_get_store_dir(), f"{name}.parquet")
+
+
+def _manifest_path() -> str:
+    """Return the path of the store manifest."""
+    return os.path.join(_get_store_dir(), "manifest.json")
+
+
+def _source_fingerprint() -> List[Any]:
+    """Return [path, mtime_ns, size] for each source CSV."""
+    fingerprint = []
+    for path in (constants.PRODUCTS_PATH, constants.ORDERS_PATH):
+        stat = os.stat(path)
+        fingerprint.append([path, stat.st_mtime_ns, stat.st_size])
+    return fingerprint
+
+
+def _read_manifest() -> Dict[str, Any] | None:
+    """Load the store manifest, if any."""
+    path = _manifest_path()
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _cast(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """Apply explicit dtypes to the columns that exist in `df`.
+
+    Integer and boolean columns with missing values fall back to float32.
+    """
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            continue
+        if dtype.startswith(("int", "bool")) and df[column].isna().any():
+            dtype = "float32"
+        df[column] = df[column].astype(dtype)
+    return df
+
+
+def read_products_csv() -> pd.DataFrame:
+    """Read `products.csv` with explicit, compact dtypes."""
+    return _cast(pd.read_csv(constants.PRODUCTS_PATH), PRODUCT_DTYPES)
+
+
+def read_orders_csv() -> pd.DataFrame:
+    """Read `orders.csv` with explicit, compact dtypes and parsed dates."""
+    df = pd.read_csv(constants.ORDERS_PATH)
+    for column in ORDER_DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+    return _cast(df, ORDER_DTYPES)
+
+
+def _order_facts(products: pd.DataFrame, orders: pd.DataFrame) -> pd.DataFrame:
+    """Join orders with the product attributes KPIs are computed from."""
+    columns = [
+        c for c in ("product_id", "category", "price") if c in products.columns
+    ]
+    facts = orders.merge(
+        products[columns], on="product_id", how="left", suffixes=("", "_p")
+    )
+    facts["late"] = facts["delivered_late"].astype("float32")
+    if "price" in facts.columns:
+        facts["revenue"] = facts["price"].astype("float64")
+    return facts
+
+
+def _window_kpis(facts: pd.DataFrame, key: str, days: int) -> pd.DataFrame:
+    """Orders, late rate and revenue over the last `days` days of data.
+
+    Windows end at the latest order date in the dataset, so historical
+    extracts get meaningful values.
+    """
+    if "order_date" not in facts.columns or facts["order_date"].isna().all():
+        return pd.DataFrame(columns=[key]).set_index(key)
+
+    end = facts["order_date"].max()
+    recent = facts[facts["order_date"] > end - pd.Timedelta(days=days)]
+    grouped = recent.groupby(key, observed=True)
+    out = pd.DataFrame(
+        {
+            f"orders_{days}d": grouped.size(),
+            f"late_rate_{days}d": grouped["late"].mean(),
+        }
+    )
+    if "revenue" in recent.columns:
+        out[f"revenue_{days}d"] = grouped["revenue"].sum()
+    return out
+
+
+def _grouped_kpis(facts: pd.DataFrame, key: str) -> pd.DataFrame:
+    """Lifetime and rolling-window KPIs for one grouping key."""
+    grouped = facts.groupby(key, observed=True)
+    kpis = pd.DataFrame(
+        {
+            "orders": grouped.size(),
+            "late_orders": grouped["late"].sum(),
+            "late_rate": grouped["late"].mean(),
+        }
+    )
+    if "revenue" in facts.columns:
+        kpis["revenue"] = grouped["revenue"].sum()
+    for days in constants.ANALYTICS_KPI_WINDOWS:
+        kpis = kpis.join(_window_kpis(facts, key, days), how="left")
+    return kpis
+
+
+def _fill_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """Store order counts as int32, with zero for groups without orders."""
+    count_columns = [
+        c for c in df.columns if c.startswith(("orders", "late_orders"))
+    ]
+    df[count_columns] = df[count_columns].fillna(0).astype("int32")
+    return df
+
+
+def compute_product_kpis(
+    products: pd.DataFrame, orders: pd.DataFrame
+) -> pd.DataFrame:
+    """Compute per-product KPIs.
+
+    Returns:
+        pd.DataFrame: One row per product with `orders`, `late_orders`,
+        `late_rate`, `revenue` (orders x price), `return_rate`, `avg_rating`
+        and `orders_/late_rate_/revenue_{N}d` rolling windows. Products
+        without orders have zero orders and a missing late rate.
+    """
+    kpis = _grouped_kpis(_order_facts(products, orders), "product_id")
+    attributes = [
+        c
+        for c in ("product_id", "category", "return_rate", "avg_rating")
+        if c in products.columns
+    ]
+    out = products[attributes].merge(
+        kpis.reset_index(), on="product_id", how="left"
+    )
+    return _fill_counts(out)
+
+
+def compute_category_kpis(
+    products: pd.DataFrame, orders: pd.DataFrame
+) -> pd.DataFrame:
+    """Compute per-category KPIs (empty if products have no category).
+
+    Returns:
+        pd.DataFrame: One row per category with `products`, order KPIs
+        (see `compute_product_kpis`), mean `return_rate` and `avg_rating`.
+    """
+    if "category" not in products.columns:
+        return pd.DataFrame()
+
+    kpis = _grouped_kpis(_order_facts(products, orders), "category")
+    grouped = products.groupby("category", observed=True)
+    attributes = pd.DataFrame({"products": grouped.size()})
+    for column in ("return_rate", "avg_rating"):
+        if column in products.columns:
+            attributes[column] = grouped[column].mean()
+    return _fill_counts(attributes.join(kpis, how="left").reset_index())
+
+
+def compute_daily_kpis(
+    products: pd.DataFrame, orders: pd.DataFrame
+) -> pd.DataFrame:
+    """Compute per-category daily KPIs with trailing rolling sums.
+
+    Returns:
+        pd.DataFrame: One row per (category, day) with `orders`,
+        `late_orders`, `revenue` and `*_{N}d` trailing sums. Empty when
+        orders have no date or products no category.
+    """
+    if "order_date" not in orders.columns or "category" not in products.columns:
+        return pd.DataFrame()
+
+    facts = _order_facts(products, orders)
+    facts["day"] = facts["order_date"].dt.normalize()
+    aggregations = {"orders": ("late", "size"), "late_orders": ("late", "sum")}
+    if "revenue" in facts.columns:
+        aggregations["revenue"] = ("revenue", "sum")
+    daily = facts.groupby(["category", "day"], observed=True).agg(
+        **aggregations
+    )
+
+    frames = []
+    for category, group in daily.groupby(level="category", observed=True):
+        group = group.droplevel("category").asfreq("D", fill_value=0)
+        for days in constants.ANALYTICS_KPI_WINDOWS:
+            rolling = group[list(aggregations)].rolling(days, min_periods=1)
+            sums = rolling.sum().add_suffix(f"_{days}d")
+            group = group.join(sums)
+        group["category"] = category
+        frames.append(group.reset_index())
+
+    out = pd.concat(frames, ignore_index=True)
+    out["category"] = out["category"].astype("category")
+    return out
+
+
+def build_store(force: bool = False) -> Dict[str, str]:
+    """Build the Parquet store and KPI tables from the source CSVs.
+
+    Args:
+        force (bool): Rebuild even if the store matches the CSVs.
+
+    Returns:
+        dict: Table name -> Parquet path.
+    """
+    fingerprint = _source_fingerprint()
+    manifest = _read_manifest()
+    if (
+        not force
+        and manifest is not None
+        and manifest.get("version") == STORE_VERSION
+        and manifest.get("source") == fingerprint
+    ):
+        return {name: _table_path(name) for name in TABLES}
+
+    logger.info("Building columnar analytics store...")
+    products = read_products_csv()
+    orders = read_orders_csv()
+    tables = {
+        "products": products,
+        "orders": orders,
+        "product_kpis": compute_product_kpis(products, orders),
+        "category_kpis": compute_category_kpis(products, orders),
+        "daily_kpis": compute_daily_kpis(products, orders),
+    }
+
+    os.makedirs(_get_store_dir(), exist_ok=True)
+    for name, df in tables.items():
+        df.to_parquet(_table_path(name), engine="pyarrow", index=False)
+
+    manifest = {"version": STORE_VERSION, "source": fingerprint}
+    tmp_path = f"{_manifest_path()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, _manifest_path())
+
+    logger.info(f"Analytics store built in {_get_store_dir()}")
+    return {name: _table_path(name) for name in TABLES}
+
+
+def _read_table(name: str) -> pd.DataFrame:
+    """Read one Parquet table with a memory-mapped reader."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(_table_path(name), memory_map=True)
+    return table.to_pandas()
+
+
+def get_table(name: str) -> pd.DataFrame:
+    """Return a store table, building the store or reloading if stale.
+
+    Tables are read on first access only and shared in-process. Treat the
+    returned frames as read-only.
+
+    Args:
+        name (str): One of `TABLES`.
+
+    Returns:
+        pd.DataFrame: The requested table.
+
+    Raises:
+        KeyError: If `name` is not a store table.
+        ImportError: If pyarrow is not installed.
+    """
+    global _loaded_fingerprint
+
+    if name not in TABLES:
+        raise KeyError(f"Unknown analytics table: {name}")
+
+    with _lock:
+        fingerprint = _source_fingerprint()
+        if _loaded_fingerprint != fingerprint:
+            build_store()
+            _tables.clear()
+            _loaded_fingerprint = fingerprint
+        if name not in _tables:
+            _tables[name] = _read_table(name)
+        return _tables[name]
+
+
+def invalidate() -> None:
+    """Drop tables loaded in this process (files on disk are kept)."""
+    global _loaded_fingerprint
+
+    with _lock:
+        _tables.clear()
+        _loaded_fingerprint = None
+
+
+def get_merged_frame() -> pd.DataFrame:
+    """Return products joined with their order KPIs, for the pandas agent.
+
+    Returns:
+        pd.DataFrame: One row per product with its attributes plus
+        `late_rate`, `orders`, `revenue` and rolling-window KPIs.
+    """
+    products = get_table("products")
+    kpis = get_table("product_kpis")
+    extra = [c for c in kpis.columns if c not in products.columns]
+    return products.merge(
+        kpis[["product_id", *extra]], on="product_id", how="left"
+    )
+
+
+def memory_footprint() -> Dict[str, int]:
+    """Compare the store's in-memory size with plain object-dtype CSV frames.
+
+    Returns:
+        dict: {"csv_bytes", "store_bytes"} (deep memory usage).
+    """
+
+    def _deep(df: pd.DataFrame) -> int:
+        return int(df.memory_usage(deep=True).sum())
+
+    csv_bytes = _deep(pd.read_csv(constants.PRODUCTS_PATH)) + _deep(
+        pd.read_csv(constants.ORDERS_PATH)
+    )
+    store_bytes = _deep(get_table("products")) + _deep(get_table("orders"))
+    return {"csv_bytes": csv_bytes, "store_bytes": store_bytes}
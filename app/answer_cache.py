@@ -0,0 +1,380 @@
+"""
+Module: answer_cache.py
+-----------------------
+Semantic answer cache for the query path.
+
+Sellers ask the same questions in slightly different words. Answers are cached
+under the normalized question text and its embedding, so an exact or
+near-duplicate question (cosine similarity above a threshold) returns the
+stored answer and citations without retrieval or generation.
+
+This module:
+- Normalizes questions (case, punctuation, whitespace)
+- Matches new questions by cosine similarity within a namespace (intent/mode)
+- Only serves exact matches for questions containing numbers, since
+  "under 40 euros" and "under 400 euros" embed almost identically
+- Evicts entries by TTL and LRU size bound
+- Is cleared whenever the docs index, product index or CSV data is rebuilt
+"""
+
+from __future__ import annotations
+
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import logging
+import numpy as np
+
+from app import constants, embeddings, registry
+
+
+logger = logging.getLogger(__name__)
+
+# Punctuation, except comparison operators, percent signs and decimal
+# separators, which change the meaning of a question ("> 20%", "3.5 stars").
+_PUNCT_RE = re.compile(r"(?!(?<=\d)[.,](?=\d))[^\w\s<>=≤≥%]")
+_SPACE_RE = re.compile(r"\s+")
+_NUMBER_RE = re.compile(r"\d")
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question for cache keys.
+
+    Args:
+        question: Raw user question.
+
+    Returns:
+        Lower-cased question with collapsed spaces and without punctuation
+        (comparison operators, "%" and decimal points are kept).
+    """
+    text = _PUNCT_RE.sub(" ", question.lower())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+@dataclass
+class _Entry:
+    """A cached answer with its unit-normalized question embedding."""
+
+    namespace: str
+    embedding: Optional[np.ndarray]
+    answer: Any
+    created_at: float
+
+
+class SemanticCache:
+    """Thread-safe, size- and TTL-bounded semantic answer cache."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        similarity_threshold: float,
+        embed_fn: Callable[[str], List[float]] | None = None,
+    ) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_entries: Maximum number of cached answers (LRU eviction).
+            ttl_seconds: Time-to-live of an entry in seconds.
+            similarity_threshold: Minimum cosine similarity for a match.
+            embed_fn: Function embedding a query. Defaults to the shared
+                embedding model from `app.registry`.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._embed_fn = embed_fn
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0}
+
+    @staticmethod
+    def _exact_only(normalized: str) -> bool:
+        """Questions with numbers are only matched exactly (no embedding)."""
+        return _NUMBER_RE.search(normalized) is not None
+
+    def _embed(self, text: str) -> np.ndarray:
+        """Embed text into a unit-norm float32 vector."""
+        embed_fn = self._embed_fn or registry.get_embeddings().embed_query
+        vector = np.asarray(embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in one batch into unit-norm float32 rows.
+
+        Uses the query path (and its cache), like `_embed`, so a question
+        gets the same vector whether it is looked up alone or in a batch.
+        """
+        if self._embed_fn is not None:
+            vectors = [self._embed_fn(t) for t in texts]
+        else:
+            vectors = embeddings.embed_queries(registry.get_embeddings(), texts)
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    @staticmethod
+    def _key(namespace: str, normalized: str) -> str:
+        return f"{namespace}::{normalized}"
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if now - entry.created_at > self.ttl_seconds
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, question: str, namespace: str = "default") -> Any | None:
+        """Return a cached answer for the question, or None on a miss.
+
+        Exact normalized matches are served without embedding the question.
+        Questions containing numbers are only served exact matches.
+
+        Args:
+            question: User question.
+            namespace: Cache partition, e.g. the intent or query mode.
+
+        Returns:
+            A deep copy of the cached answer, or None.
+        """
+        normalized = normalize_question(question)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_expired(now)
+
+            key = self._key(namespace, normalized)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return copy.deepcopy(entry.answer)
+
+            candidates = [
+                (k, e)
+                for k, e in self._entries.items()
+                if e.namespace == namespace and e.embedding is not None
+            ]
+
+        if candidates and not self._exact_only(normalized):
+            probe = self._embed(normalized)
+            matrix = np.stack([e.embedding for _, e in candidates])
+            scores = matrix @ probe
+            best = int(scores.argmax())
+
+            if scores[best] >= self.similarity_threshold:
+                best_key, best_entry = candidates[best]
+                with self._lock:
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                    self._stats["hits"] += 1
+                    self._stats["semantic_hits"] += 1
+                logger.info(
+                    f"Semantic cache hit (cos={scores[best]:.3f}) for {question}"
+                )
+                return copy.deepcopy(best_entry.answer)
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def lookup_many(
+        self, questions: List[str], namespace: str = "default"
+    ) -> List[Any | None]:
+        """Batch variant of `lookup`.
+
+        Questions without an exact match are embedded in a single call and
+        compared against the namespace's entries in one matrix product.
+
+        Args:
+            questions: User questions.
+            namespace: Cache partition shared by all questions.
+
+        Returns:
+            One cached answer (deep copy) or None per question.
+        """
+        normalized = [normalize_question(q) for q in questions]
+        answers: List[Any | None] = [None] * len(questions)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_expired(now)
+
+            misses = []
+            for i, text in enumerate(normalized):
+                key = self._key(namespace, text)
+                entry = self._entries.get(key)
+                if entry is None:
+                    if not self._exact_only(text):
+                        misses.append(i)
+                    continue
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                answers[i] = copy.deepcopy(entry.answer)
+
+            candidates = [
+                (k, e)
+                for k, e in self._entries.items()
+                if e.namespace == namespace and e.embedding is not None
+            ]
+
+        if misses and candidates:
+            probes = self._embed_many([normalized[i] for i in misses])
+            matrix = np.stack([e.embedding for _, e in candidates])
+            scores = probes @ matrix.T
+            best = scores.argmax(axis=1)
+
+            with self._lock:
+                for row, i in enumerate(misses):
+                    if scores[row, best[row]] < self.similarity_threshold:
+                        continue
+                    best_key, best_entry = candidates[best[row]]
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                    self._stats["hits"] += 1
+                    self._stats["semantic_hits"] += 1
+                    answers[i] = copy.deepcopy(best_entry.answer)
+
+        with self._lock:
+            self._stats["misses"] += sum(a is None for a in answers)
+        return answers
+
+    def store(
+        self, question: str, answer: Any, namespace: str = "default"
+    ) -> None:
+        """Cache an answer for a question.
+
+        Args:
+            question: User question.
+            answer: JSON-serializable answer (including citations).
+            namespace: Cache partition, e.g. the intent or query mode.
+        """
+        normalized = normalize_question(question)
+        embedding = None
+        if not self._exact_only(normalized):
+            try:
+                embedding = self._embed(normalized)
+            except Exception as e:
+                logger.warning(
+                    f"Caching without embedding (exact match only): {e}"
+                )
+
+        with self._lock:
+            self._insert(namespace, normalized, answer, embedding)
+
+    def store_many(
+        self, items: List[Tuple[str, Any]], namespace: str = "default"
+    ) -> None:
+        """Batch variant of `store`, embedding all questions in one call.
+
+        Args:
+            items: (question, answer) pairs.
+            namespace: Cache partition shared by all items.
+        """
+        if not items:
+            return
+        normalized = [normalize_question(q) for q, _ in items]
+        embeddings: List[Optional[np.ndarray]] = [None] * len(items)
+        semantic = [
+            i for i, text in enumerate(normalized) if not self._exact_only(text)
+        ]
+        if semantic:
+            try:
+                vectors = self._embed_many([normalized[i] for i in semantic])
+            except Exception as e:
+                logger.warning(
+                    f"Caching without embedding (exact match only): {e}"
+                )
+            else:
+                for i, vector in zip(semantic, vectors):
+                    embeddings[i] = vector
+
+        with self._lock:
+            for text, (_, answer), embedding in zip(
+                normalized, items, embeddings
+            ):
+                self._insert(namespace, text, answer, embedding)
+
+    def _insert(
+        self,
+        namespace: str,
+        normalized: str,
+        answer: Any,
+        embedding: Optional[np.ndarray],
+    ) -> None:
+        """Add an entry and evict the oldest ones (caller holds the lock)."""
+        key = self._key(namespace, normalized)
+        self._entries[key] = _Entry(
+            namespace=namespace,
+            embedding=embedding,
+            answer=copy.deepcopy(answer),
+            created_at=time.monotonic(),
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries.clear()
+        logger.info("Answer cache cleared.")
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the current size.
+
+        Returns:
+            dict: {"hits", "semantic_hits", "misses", "size"}
+        """
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
+
+
+answer_cache = SemanticCache(
+    max_entries=constants.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=constants.ANSWER_CACHE_TTL_SECONDS,
+    similarity_threshold=constants.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+)
+
+
+def lookup(question: str, namespace: str = "default") -> Any | None:
+    """Look up the shared answer cache (no-op when caching is disabled)."""
+    if not constants.ANSWER_CACHE_ENABLED:
+        return None
+    return answer_cache.lookup(question, namespace)
+
+
+def store(question: str, answer: Any, namespace: str = "default") -> None:
+    """Store into the shared answer cache (no-op when caching is disabled)."""
+    if constants.ANSWER_CACHE_ENABLED:
+        answer_cache.store(question, answer, namespace)
+
+
+def lookup_many(
+    questions: List[str], namespace: str = "default"
+) -> List[Any | None]:
+    """Batch lookup in the shared answer cache (all misses when disabled)."""
+    if not constants.ANSWER_CACHE_ENABLED:
+        return [None] * len(questions)
+    return answer_cache.lookup_many(questions, namespace)
+
+
+def store_many(
+    items: List[Tuple[str, Any]], namespace: str = "default"
+) -> None:
+    """Batch store into the shared answer cache (no-op when disabled)."""
+    if constants.ANSWER_CACHE_ENABLED:
+        answer_cache.store_many(items, namespace)
+
+
+def invalidate() -> None:
+    """Clear the shared answer cache after a data or index rebuild."""
+    answer_cache.clear()
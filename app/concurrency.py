@@ -0,0 +1,137 @@
+"""
+Module: concurrency.py
+----------------------
+Bounded concurrency for calls to LLM backends on the async request path.
+
+Each backend (e.g. "ollama") gets a limiter with a fixed number of in-flight
+slots and a bounded wait queue. Requests beyond the queue bound are rejected
+immediately with `OverloadedError`, which the API turns into a 503, instead of
+piling up behind a slow model.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+import logging
+
+from app import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadedError(RuntimeError):
+    """Raised when an LLM backend's wait queue is full."""
+
+
+class LLMLimiter:
+    """Async semaphore with a bounded wait queue and queue-depth metrics."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int) -> None:
+        """Create a limiter.
+
+        Args:
+            name: Backend name, used in logs and metrics.
+            max_concurrency: Maximum concurrent calls to the backend.
+            max_queue: Maximum number of callers waiting for a slot.
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stats = {
+            "in_flight": 0,
+            "waiting": 0,
+            "max_waiting": 0,
+            "completed": 0,
+            "rejected": 0,
+        }
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Return the semaphore bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one backend slot for the duration of the block.
+
+        Raises:
+            OverloadedError: If the wait queue is already full.
+        """
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self._stats["waiting"] >= self.max_queue:
+            self._stats["rejected"] += 1
+            logger.warning(
+                f"{self.name} overloaded: {self._stats['waiting']} waiting, "
+                "rejecting request"
+            )
+            raise OverloadedError(f"{self.name} backend is overloaded")
+
+        self._stats["waiting"] += 1
+        self._stats["max_waiting"] = max(
+            self._stats["max_waiting"], self._stats["waiting"]
+        )
+        try:
+            await semaphore.acquire()
+        finally:
+            self._stats["waiting"] -= 1
+
+        self._stats["in_flight"] += 1
+        try:
+            yield
+        finally:
+            self._stats["in_flight"] -= 1
+            self._stats["completed"] += 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        """Return queue-depth and throughput counters.
+
+        Returns:
+            dict: {"in_flight", "waiting", "max_waiting", "completed",
+            "rejected", "max_concurrency", "max_queue"}
+        """
+        return {
+            **self._stats,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+_limiters_lock = threading.Lock()
+_limiters: Dict[str, LLMLimiter] = {}
+
+
+def get_limiter(backend: str = "ollama") -> LLMLimiter:
+    """Return the shared limiter for an LLM backend.
+
+    Args:
+        backend: Backend name.
+
+    Returns:
+        LLMLimiter: Limiter configured from `constants.LLM_MAX_CONCURRENCY`
+        and `constants.LLM_MAX_QUEUE`.
+    """
+    with _limiters_lock:
+        if backend not in _limiters:
+            _limiters[backend] = LLMLimiter(
+                backend,
+                max_concurrency=constants.LLM_MAX_CONCURRENCY,
+                max_queue=constants.LLM_MAX_QUEUE,
+            )
+        return _limiters[backend]
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Return limiter stats for every backend seen so far."""
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -9,7 +9,7 @@ APP_ENV = "prod"
 LOG_FORMAT = "[%(asctime)s] %(levelname)s in %(name)s: %(message)s"
 
 
-def setup_logging(level=logging.info):
+def setup_logging(level=logging.INFO):
     """Configure global logging."""
     logging.basicConfig(
         level=level,
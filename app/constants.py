@@ -1,16 +1,150 @@
+import os
+
+
 # Paths
 DATA_DIR = "data"
 PRODUCTS_PATH = f"{DATA_DIR}/products.csv"
 ORDERS_PATH = f"{DATA_DIR}/orders.csv"
 CHROMA_DIR = f"{DATA_DIR}/chroma_index"
+SELLER_DOCS_DIR = f"{DATA_DIR}/docs/marketplace_x_seller_docs"
+CHROMA_DOCS_DIR = f"{DATA_DIR}/chroma_docs_index"
 
 # Model
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Embedding backend: "sentence-transformers" (PyTorch) or "onnx" (ONNX Runtime,
+# no torch import; export first with `python -m app.embeddings export`).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+EMBEDDING_ONNX_DIR = f"{DATA_DIR}/onnx/all-MiniLM-L6-v2"
+EMBEDDING_ONNX_QUANTIZED = True  # int8 weights (dynamic quantization)
+EMBEDDING_MAX_LENGTH = 256  # tokens, as the sentence-transformer truncates
+# TORCH_ENABLED=0 never imports torch: requires the onnx backend and skips
+# cross-encoder reranking.
+TORCH_ENABLED = os.getenv("TORCH_ENABLED", "1") != "0"
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# Ingestion
+EMBED_BATCH_SIZE = 256
+EMBED_NUM_WORKERS = 1
+CHROMA_ADD_BATCH_SIZE = 4096
+PRODUCTS_BATCH_SIZE = 2048
+DOCS_PARSE_WORKERS = None  # None = one process per CPU core
+DOCS_INDEX_BATCH_SIZE = 1024
 
 # RAG
 LLM_MODEL_RAG = "mistral"
 TEMPERATURE_RAG = 0.2
+RAG_MIN_CONFIDENCE = 0.3
+
+# Hybrid retrieval (dense + BM25, fused with reciprocal-rank fusion).
+# Pipelines search every doc except `exclude_doc_ids`, so new or nested docs
+# are retrievable by default; an explicit `doc_ids` allow-list is opt-in.
+RRF_K = 60
+RETRIEVAL_CONFIG = {
+    "policy": {
+        "k": 4,
+        "vector_k": 10,
+        "bm25_k": 10,
+        "vector_weight": 1.0,
+        "bm25_weight": 1.0,
+        "exclude_doc_ids": ["conversion_growth"],
+        "rerank": True,
+        "rerank_candidates": 20,
+    },
+    "recommendation": {
+        "k": 4,
+        "vector_k": 10,
+        "bm25_k": 10,
+        "vector_weight": 1.0,
+        "bm25_weight": 0.5,
+        "exclude_doc_ids": ["overview", "prohibited_items", "penalties"],
+        "rerank": True,
+        "rerank_candidates": 20,
+    },
+}
+
+# Router
+LLM_MODEL_ROUTER = "mistral"
+ROUTER_FAST_PATH_ENABLED = True
+ROUTER_FAST_PATH_THRESHOLD = 0.6
+
+# Analytics store (Parquet + precomputed KPIs, next to products.csv)
+ANALYTICS_STORE_ENABLED = True
+ANALYTICS_STORE_SUBDIR = "analytics_store"
+ANALYTICS_KPI_WINDOWS = (7, 30)
 
 # Agent
 LLM_MODEL_AGENT = "mistral:instruct"
 TEMPERATURE_AGENT = 0
+SELLER_AGENT_CACHE_SIZE = 32  # per-seller agents kept in the LRU
+
+# Sandboxed execution of agent-written pandas code (long-lived workers)
+ANALYTICS_SANDBOX_ENABLED = True
+ANALYTICS_SANDBOX_WORKERS = 2
+ANALYTICS_SANDBOX_TIMEOUT_S = 10.0
+ANALYTICS_SANDBOX_MAX_RSS_MB = 1024  # worker RSS growth over its start size
+ANALYTICS_SANDBOX_POLL_S = 0.05
+
+# Context packing (token budget per LLM model; tokens ~ chars / 4)
+CONTEXT_TOKEN_BUDGETS = {"mistral": 2048}
+DEFAULT_CONTEXT_TOKEN_BUDGET = 1536
+CHARS_PER_TOKEN = 4
+CONTEXT_MIN_OVERLAP = 20
+
+# Product catalog categories (used to extract retrieval filters)
+PRODUCT_CATEGORIES = [
+    "Tools",
+    "Garden",
+    "Electronics",
+    "Furniture",
+    "Sports",
+    "DIY",
+    "Home Decor",
+]
+
+# Reranking (CPU cross-encoder)
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_BATCH_SIZE = 32
+RERANK_BUDGET_MS = 250
+# Initial cost estimate per (question, chunk) pair, refined from measurements
+RERANK_PAIR_MS = 2.0
+
+# LLM concurrency
+LLM_MAX_CONCURRENCY = 4
+LLM_MAX_QUEUE = 256
+
+# Batch queries (/query/batch)
+BATCH_MAX_QUESTIONS = 5000
+BATCH_MAX_CONCURRENCY = 4  # concurrent LLM calls per batch (<= limiter slots)
+
+# Tracing (per-stage spans, /metrics histograms, debug timings)
+TRACING_ENABLED = True
+TRACE_HISTOGRAM_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# Answer cache
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_MAX_ENTRIES = 1024
+ANSWER_CACHE_TTL_SECONDS = 3600
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.92
+
+# Query embedding cache (normalized question -> float32 vector, LRU)
+QUERY_EMBEDDING_CACHE_ENABLED = True
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = 4096
+# .npz file persisting the cache across restarts (None = memory only)
+QUERY_EMBEDDING_CACHE_PATH = os.getenv("QUERY_EMBEDDING_CACHE_PATH")
+
+# Registry
+WARM_UP_ON_STARTUP = True
@@ -0,0 +1,237 @@
+"""
+Module: embedding_cache.py
+--------------------------
+LRU cache of query embeddings in front of the shared embedding model.
+
+Retrievers (`docs_index.get_doc_retriever`, the product store's
+`as_retriever`, the RAG chains) embed the question on every call, even when
+the same question was asked a minute ago and answer caching is off. Query
+vectors are cached here instead:
+- Keys are normalized question text (case, punctuation, whitespace), so
+  near-identical strings share one vector (the first variant's)
+- Vectors are stored as compact float32 arrays, bounded by LRU size
+- The cache can be persisted to disk (`constants.QUERY_EMBEDDING_CACHE_PATH`)
+  and is reloaded on start-up, unless it was built by another model/backend
+- Hit/miss counters and the hit rate are reported in `/status`
+
+Batches of questions (`embed_queries`) are served from the cache too; only
+the misses are embedded, in one call. Document embeddings (index builds)
+are not cached.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import logging
+import numpy as np
+import os
+from langchain_core.embeddings import Embeddings
+
+from app import constants, embeddings
+from app.answer_cache import normalize_question
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU map of normalized question -> float32 vector."""
+
+    def __init__(self, max_entries: int, path: str | None = None) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_entries: Maximum number of cached vectors (LRU eviction).
+            path: Optional `.npz` file the cache is loaded from and saved to.
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self.model_id: Optional[str] = None
+        self._vectors: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def bind(self, model_id: str) -> None:
+        """Attach the cache to an embedding model.
+
+        Vectors cached for another model are dropped. On first bind, entries
+        persisted for the same model are loaded from `path`.
+        """
+        with self._lock:
+            if self.model_id == model_id:
+                return
+            self._vectors.clear()
+            self.model_id = model_id
+        self.load()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached vector for a question, or None on a miss."""
+        key = normalize_question(text)
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is None:
+                self._stats["misses"] += 1
+                return None
+            self._vectors.move_to_end(key)
+            self._stats["hits"] += 1
+            return vector
+
+    def put(self, text: str, vector: List[float]) -> None:
+        """Cache a question's vector, evicting the least recently used."""
+        key = normalize_question(text)
+        with self._lock:
+            self._vectors[key] = np.asarray(vector, dtype=np.float32)
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+    def load(self) -> int:
+        """Load persisted vectors for the bound model.
+
+        Returns:
+            The number of vectors loaded (0 without a compatible file).
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["model_id"]) != self.model_id:
+                    logger.info(
+                        f"Ignoring query embedding cache {self.path}: built "
+                        f"for {data['model_id']}, not {self.model_id}"
+                    )
+                    return 0
+                keys, vectors = data["keys"].tolist(), data["vectors"]
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable query embedding cache: {e}")
+            return 0
+
+        # Keep the most recently used entries if the bound shrank.
+        start = max(0, len(keys) - self.max_entries)
+        with self._lock:
+            for key, vector in zip(keys[start:], vectors[start:]):
+                self._vectors[key] = vector.astype(np.float32)
+        logger.info(f"Loaded {len(keys)} query embeddings from {self.path}")
+        return len(keys)
+
+    def save(self) -> bool:
+        """Persist the cache atomically (least recently used first).
+
+        Returns:
+            True if a file was written.
+        """
+        if not self.path or self.model_id is None:
+            return False
+        with self._lock:
+            keys = list(self._vectors)
+            vectors = (
+                np.stack(list(self._vectors.values()))
+                if keys
+                else np.empty((0, 0), dtype=np.float32)
+            )
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                keys=np.array(keys, dtype=str),
+                vectors=vectors,
+                model_id=np.array(self.model_id),
+            )
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved {len(keys)} query embeddings to {self.path}")
+        return True
+
+    def clear(self) -> None:
+        """Drop every cached vector and reset the counters."""
+        with self._lock:
+            self._vectors.clear()
+            self._stats = {"hits": 0, "misses": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters, the hit rate and the current size.
+
+        Returns:
+            dict: {"hits", "misses", "hit_rate", "size", "max_entries"}
+        """
+        with self._lock:
+            total = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / total if total else 0.0,
+                "size": len(self._vectors),
+                "max_entries": self.max_entries,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embedding model wrapper serving repeated queries from the cache."""
+
+    def __init__(self, model: Embeddings, cache: QueryEmbeddingCache) -> None:
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(text)
+        if vector is not None:
+            return vector.tolist()
+        vector = self.model.embed_query(text)
+        self.cache.put(text, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[Optional[List[float]]] = []
+        misses: Dict[str, str] = {}
+        for text in texts:
+            vector = self.cache.get(text)
+            vectors.append(None if vector is None else vector.tolist())
+            if vector is None:
+                misses.setdefault(normalize_question(text), text)
+
+        embedded = dict(
+            zip(
+                misses,
+                embeddings.embed_queries(self.model, list(misses.values())),
+            )
+        )
+        for key, text in misses.items():
+            self.cache.put(text, embedded[key])
+        return [
+            embedded[normalize_question(text)] if vector is None else vector
+            for text, vector in zip(texts, vectors)
+        ]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+
+query_cache = QueryEmbeddingCache(
+    max_entries=constants.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    path=constants.QUERY_EMBEDDING_CACHE_PATH,
+)
+
+
+def wrap(model: Embeddings, model_id: str) -> Embeddings:
+    """Put the shared query cache in front of a model (if enabled)."""
+    if not constants.QUERY_EMBEDDING_CACHE_ENABLED:
+        return model
+    query_cache.bind(model_id)
+    return CachedEmbeddings(model, query_cache)
+
+
+def save() -> bool:
+    """Persist the shared query cache (no-op without a configured path)."""
+    return query_cache.save()
+
+
+def invalidate() -> None:
+    """Clear the shared query cache (in memory only)."""
+    query_cache.clear()
@@ -0,0 +1,370 @@
+"""
+Module: embeddings.py
+---------------------
+Pluggable embedding backends for `constants.EMBEDDING_MODEL`.
+
+The default backend loads the model as a full-precision PyTorch
+sentence-transformer. On CPU-only pods that dominates query embedding
+latency and worker RSS, so the same model can instead run on ONNX Runtime,
+optionally with int8 dynamically quantized weights:
+- "sentence-transformers": `HuggingFaceEmbeddings` (imports torch)
+- "onnx": `OnnxEmbeddings` (onnxruntime + tokenizers, never imports torch)
+
+The backend is chosen with `constants.EMBEDDING_BACKEND` (env
+`EMBEDDING_BACKEND`). ONNX models are exported once, ahead of time, with:
+
+    python -m app.embeddings export [--no-quantize]
+
+Export needs torch and transformers; serving with the ONNX backend does not.
+Vectors differ slightly between backends, so the docs index manifest records
+`model_id()` and the index is rebuilt when the backend changes. See
+`benchmarks/bench_embeddings.py` for the accuracy-vs-latency comparison.
+
+Many questions can be embedded at once on the query path with
+`embed_queries()`; both backends batch it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, List
+
+import logging
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app import constants
+
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_TRANSFORMERS = "sentence-transformers"
+ONNX = "onnx"
+BACKENDS = (SENTENCE_TRANSFORMERS, ONNX)
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+# Written by `export_onnx`: {"model": <exported Hugging Face model name>}
+EXPORT_INFO_FILE = "export.json"
+
+
+def onnx_model_path(
+    model_dir: str | None = None, quantized: bool | None = None
+) -> Path:
+    """Return the ONNX model file for the configured precision."""
+    quantized = (
+        constants.EMBEDDING_ONNX_QUANTIZED if quantized is None else quantized
+    )
+    return Path(model_dir or constants.EMBEDDING_ONNX_DIR) / (
+        ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE
+    )
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings computed with ONNX Runtime.
+
+    Runs the exported transformer, then applies the sentence-transformers
+    head of MiniLM-style models: attention-masked mean pooling and L2
+    normalization.
+    """
+
+    def __init__(
+        self,
+        model_dir: str | None = None,
+        quantized: bool | None = None,
+        batch_size: int | None = None,
+        max_length: int | None = None,
+    ) -> None:
+        """Load the tokenizer and the ONNX inference session.
+
+        Args:
+            model_dir: Export directory
+                (default `constants.EMBEDDING_ONNX_DIR`).
+            quantized: Use the int8 model
+                (default `constants.EMBEDDING_ONNX_QUANTIZED`).
+            batch_size: Texts per inference call
+                (default `constants.EMBED_BATCH_SIZE`).
+            max_length: Token truncation length
+                (default `constants.EMBEDDING_MAX_LENGTH`).
+
+        Raises:
+            FileNotFoundError: If the model has not been exported.
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_dir = model_dir or constants.EMBEDDING_ONNX_DIR
+        model_path = onnx_model_path(model_dir, quantized)
+        tokenizer_path = Path(model_dir) / TOKENIZER_FILE
+        for path in (model_path, tokenizer_path):
+            if not path.exists():
+                raise FileNotFoundError(
+                    f"{path} not found; run `python -m app.embeddings export`"
+                )
+
+        self.batch_size = batch_size or constants.EMBED_BATCH_SIZE
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(
+            max_length or constants.EMBEDDING_MAX_LENGTH
+        )
+        padding = self.tokenizer.padding or {}
+        self.tokenizer.enable_padding(
+            pad_id=padding.get("pad_id", 0),
+            pad_token=padding.get("pad_token", "[PAD]"),
+        )
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedding model {model_path}")
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed one batch into unit-norm float32 rows."""
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array(
+                [e.type_ids for e in encodings], dtype=np.int64
+            ),
+        }
+        hidden = self.session.run(
+            None, {k: v for k, v in feeds.items() if k in self._input_names}
+        )[0]
+
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(
+            weights.sum(axis=1), 1e-9, None
+        )
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in length-sorted batches (less padding per batch).
+
+        Returns:
+            float32 array of shape (len(texts), dim), in input order.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [
+            self._encode_batch(
+                [texts[i] for i in order[s : s + self.batch_size]]
+            )
+            for s in range(0, len(order), self.batch_size)
+        ]
+        vectors = np.empty((len(texts), batches[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.concatenate(batches)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(list(texts)).tolist()
+
+
+class SymmetricEmbeddings(Embeddings):
+    """Wrapper adding batched `embed_queries` to a symmetric model.
+
+    For models that embed a query exactly like a one-text document
+    (`HuggingFaceEmbeddings.embed_query(t)` is `embed_documents([t])[0]`),
+    a batch of queries is one `embed_documents` call.
+    """
+
+    def __init__(self, model: Embeddings) -> None:
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(texts)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+
+def embed_queries(model: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed many questions on the query path of a model.
+
+    Uses the model's batched `embed_queries` when it has one. Otherwise
+    `embed_query` is called per text: `embed_documents` is not guaranteed
+    to embed queries the same way (e.g. instruction-prefixed models).
+    """
+    batch = getattr(model, "embed_queries", None)
+    if batch is not None:
+        return batch(texts)
+    return [model.embed_query(text) for text in texts]
+
+
+def exported_model(model_dir: str | None = None) -> str:
+    """Return the model exported to an ONNX directory.
+
+    Falls back to `constants.EMBEDDING_MODEL` for exports that predate
+    `EXPORT_INFO_FILE`.
+    """
+    path = Path(model_dir or constants.EMBEDDING_ONNX_DIR) / EXPORT_INFO_FILE
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["model"]
+    except (OSError, KeyError, ValueError):
+        return constants.EMBEDDING_MODEL
+
+
+def model_id(backend: str | None = None) -> str:
+    """Identify the vectors a backend produces (stored in index manifests).
+
+    The PyTorch backend keeps the bare model name, so indexes built before
+    backends were selectable stay compatible. The ONNX backend names the
+    model actually exported (see `export_onnx`).
+    """
+    backend = backend or constants.EMBEDDING_BACKEND
+    if backend == ONNX:
+        precision = "int8" if constants.EMBEDDING_ONNX_QUANTIZED else "fp32"
+        return f"{exported_model()}:onnx-{precision}"
+    return constants.EMBEDDING_MODEL
+
+
+def build_embeddings(backend: str | None = None) -> Embeddings:
+    """Build the embedding model for a backend.
+
+    Args:
+        backend: One of `BACKENDS` (default `constants.EMBEDDING_BACKEND`).
+
+    Returns:
+        Embeddings: LangChain embeddings for `constants.EMBEDDING_MODEL`.
+
+    Raises:
+        ValueError: For an unknown backend, or the PyTorch backend while
+            `constants.TORCH_ENABLED` is off.
+    """
+    backend = backend or constants.EMBEDDING_BACKEND
+    if backend == ONNX:
+        return OnnxEmbeddings()
+    if backend != SENTENCE_TRANSFORMERS:
+        raise ValueError(
+            f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}"
+        )
+    if not constants.TORCH_ENABLED:
+        raise ValueError(
+            f"The {SENTENCE_TRANSFORMERS} backend needs torch, which is "
+            f"disabled (TORCH_ENABLED=0); use EMBEDDING_BACKEND={ONNX}"
+        )
+
+    from langchain_community.embeddings.huggingface import (
+        HuggingFaceEmbeddings,
+    )
+
+    return SymmetricEmbeddings(
+        HuggingFaceEmbeddings(model_name=constants.EMBEDDING_MODEL)
+    )
+
+
+def export_onnx(
+    model_name: str | None = None,
+    output_dir: str | None = None,
+    quantize: bool = True,
+) -> Path:
+    """Export a Hugging Face sentence encoder to ONNX (offline, needs torch).
+
+    Writes the tokenizer (`tokenizer.json`), the fp32 model (`model.onnx`)
+    and, with `quantize`, an int8 dynamically quantized copy
+    (`model_int8.onnx`; MatMul weights in int8, activations quantized at
+    runtime). The model name is recorded in `export.json`, so `model_id()`
+    reports the exported model.
+
+    Args:
+        model_name: Model to export (default `constants.EMBEDDING_MODEL`).
+        output_dir: Target directory (default `constants.EMBEDDING_ONNX_DIR`).
+        quantize: Also write the int8 model.
+
+    Returns:
+        The output directory.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    model_name = model_name or constants.EMBEDDING_MODEL
+    out = Path(output_dir or constants.EMBEDDING_ONNX_DIR)
+    out.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(out)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["Marketplace X seller policy"], return_tensors="pt")
+    names = [
+        n
+        for n in ("input_ids", "attention_mask", "token_type_ids")
+        if n in sample
+    ]
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[n] for n in names),
+            str(out / ONNX_MODEL_FILE),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                n: {0: "batch", 1: "sequence"}
+                for n in [*names, "last_hidden_state"]
+            },
+            opset_version=14,
+        )
+    logger.info(f"Exported {model_name} to {out / ONNX_MODEL_FILE}")
+
+    if quantize:
+        quantize_onnx(out / ONNX_MODEL_FILE, out / ONNX_INT8_MODEL_FILE)
+    with open(out / EXPORT_INFO_FILE, "w", encoding="utf-8") as f:
+        json.dump({"model": model_name}, f, indent=2)
+    return out
+
+
+def quantize_onnx(source: Path, target: Path) -> Path:
+    """Write an int8 dynamically quantized copy of an ONNX model."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(source), str(target), weight_type=QuantType.QInt8)
+    logger.info(f"Quantized {source} to {target}")
+    return target
+
+
+def main(argv: List[str] | None = None) -> Any:
+    parser = argparse.ArgumentParser(
+        description="Export the embedding model to ONNX."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser(
+        "export", help="Export the model (and an int8 copy) to ONNX."
+    )
+    export.add_argument("--model", default=None)
+    export.add_argument("--output-dir", default=None)
+    export.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args(argv)
+
+    out = export_onnx(
+        args.model, args.output_dir, quantize=not args.no_quantize
+    )
+    print(f"ONNX model written to {out}")
+    return out
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,29 @@ Exposes FastAPI interface for querying RAG and agent pipelines.
 Handles request validation and response normalization.
 """
 
-from typing import Any, Dict
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List
 
 import logging
 import os
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from app import agent, config, rag_pipeline
+from app import (
+    answer_cache,
+    concurrency,
+    config,
+    constants,
+    embedding_cache,
+    rag_pipeline,
+    registry,
+    tracing,
+)
+from app.agents import analytics_agent as agent, intent_classifier, router
+from app.rag import filters as metadata_filters
 
 
 config.setup_logging()
@@ -23,6 +38,42 @@ logger.info("Application started")
 app = FastAPI()
 
 
+@app.on_event("startup")
+def warm_up_resources() -> None:
+    """
+    Build shared models, indexes and chains before serving traffic.
+
+    The analytics sandbox workers are started here too, when the sandbox
+    is enabled, before request threads are busy.
+
+    Skipped in tests and when `constants.WARM_UP_ON_STARTUP` is disabled.
+    A failed warm-up is logged; resources are then built on first use.
+    """
+    if os.getenv("APP_ENV") == "test" or not constants.WARM_UP_ON_STARTUP:
+        return
+    try:
+        keys = registry.warm_up()
+        logger.info(f"Warm-up complete: {keys}")
+    except Exception as e:
+        logger.warning(f"Warm-up failed, falling back to lazy loading: {e}")
+    if constants.ANALYTICS_SANDBOX_ENABLED:
+        try:
+            agent.get_sandbox_pool()
+        except Exception as e:
+            logger.warning(f"Sandbox warm-up failed, starting it lazily: {e}")
+
+
+@app.on_event("shutdown")
+def persist_caches() -> None:
+    """
+    Save the query-embedding cache to disk, when a path is configured.
+    """
+    try:
+        embedding_cache.save()
+    except OSError as e:
+        logger.warning(f"Could not persist the query embedding cache: {e}")
+
+
 @app.get("/health")
 def health() -> Dict[str, str]:
     """
@@ -44,16 +95,25 @@ class QueryRequest(BaseModel):
 
     Attributes:
         question (str): The user’s natural language question.
-        mode (Optional[str]): The processing mode ("rag" or "agent").
+        mode (Optional[str]): The processing mode ("rag", "agent" or "router").
             If not provided, it is inferred automatically from the question content.
+        seller_id (Optional[str]): Seller identifier; scopes analytics data
+            to that seller (router and agent modes).
+        filters (Optional[dict]): Retrieval metadata filter, e.g.
+            {"doc_id": ["penalties"]} or {"category": "Garden",
+            "price": {"max": 30}} (see `app.rag.filters`).
+        debug (bool): Attach per-stage timings ("timings") to the response.
     """
 
     question: str
     mode: str | None = None  # optional now
+    seller_id: str | None = None
+    filters: Dict[str, Any] | None = None
+    debug: bool = False
 
 
 @app.post("/query")
-def query_endpoint(request: QueryRequest) -> Dict[str, Any]:
+async def query_endpoint(request: QueryRequest) -> Dict[str, Any]:
     """
     Handle analytical or knowledge-based user queries.
 
@@ -61,8 +121,21 @@ def query_endpoint(request: QueryRequest) -> Dict[str, Any]:
     - **RAG mode** for retrieval-augmented generation (context-based responses).
     - **Agent mode** for analytical reasoning over structured data.
 
+    A third mode, **router**, sends the question through the multi-agent
+    router on the fully async path (async Ollama client).
+
+    In agent mode, common analytics question shapes are answered by
+    deterministic templates (see `app.agents.analytics_templates`), as
+    {"template", "answer", "table"}, without calling the LLM agent.
+
     If no mode is specified, the function infers it based on analytical keywords.
 
+    LLM work runs under a bounded per-backend limiter; when its wait queue
+    is full the request is rejected immediately with a 503.
+
+    Every request is traced (see `app.tracing`); with `debug=true` the
+    span timings are returned under "timings".
+
     Args:
         request (QueryRequest): Request payload containing the user's question
             and optionally the processing mode.
@@ -77,7 +150,8 @@ def query_endpoint(request: QueryRequest) -> Dict[str, Any]:
         }
 
     Raises:
-        HTTPException: If an invalid mode is provided or a runtime error occurs.
+        HTTPException: If an invalid mode is provided, the LLM backend is
+            overloaded (503), or a runtime error occurs.
     """
     question = request.question.strip()
     mode = request.mode
@@ -99,12 +173,55 @@ def query_endpoint(request: QueryRequest) -> Dict[str, Any]:
             else "rag"
         )
 
+    with tracing.trace("query") as current:
+        if mode != "router":
+            tracing.set_intent(mode)
+        response = await _answer_query(request, question, mode)
+    if request.debug:
+        response["timings"] = current.to_dict()
+    return response
+
+
+async def _answer_query(
+    request: QueryRequest, question: str, mode: str
+) -> Dict[str, Any]:
+    """Answer a /query request in the selected mode (see `query_endpoint`)."""
     IS_TEST = os.getenv("APP_ENV") == "test"
     try:
+        if mode == "router":
+            answer = await router.aroute(
+                question, seller_id=request.seller_id, filters=request.filters
+            )
+            return {"mode": mode, "question": question, "answer": answer}
+
+        if mode == "agent":
+            await asyncio.to_thread(agent.check_data_freshness)
+        filters = request.filters
+        if mode == "rag" and filters is None:
+            # Retrieval is scoped by the filters found in the question, so
+            # answers for different categories/prices must not share entries.
+            filters = metadata_filters.extract_product_filters(question)
+        namespace = f"query:{mode}"
+        if mode == "agent" and request.seller_id:
+            namespace += f":{request.seller_id}"
+        if filters:
+            namespace += f":{metadata_filters.cache_key(filters)}"
+        cached = await asyncio.to_thread(
+            answer_cache.lookup, question, namespace=namespace
+        )
+        if cached is not None:
+            return {"mode": mode, "question": question, "answer": cached}
+
         if mode == "rag":
-            answer = rag_pipeline.query(question)
+            answer = await rag_pipeline.aquery(question, filters=filters)
         elif mode == "agent":
-            answer = agent.ask_agent(question)
+            answer = await asyncio.to_thread(
+                agent.answer_with_template, question, request.seller_id
+            )
+            if answer is None:
+                answer = await agent.aask_agent(
+                    question, seller_id=request.seller_id
+                )
         else:
             if not IS_TEST:
                 raise HTTPException(status_code=400, detail="Invalid mode")
@@ -112,11 +229,203 @@ def query_endpoint(request: QueryRequest) -> Dict[str, Any]:
                 raise ValueError(
                     "Invalid mode"
                 )  # simple exception for unit tests
+        await asyncio.to_thread(
+            answer_cache.store, question, answer, namespace=namespace
+        )
         return {"mode": mode, "question": question, "answer": answer}
 
+    except concurrency.OverloadedError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
     except Exception as e:
         if not IS_TEST:
             logger.info(e)
             raise HTTPException(status_code=500, detail=str(e))
         else:
             raise e
+
+
+class BatchQueryRequest(BaseModel):
+    """
+    Request schema for the `/query/batch` endpoint.
+
+    Attributes:
+        questions (list[str]): Questions to route (at most
+            `constants.BATCH_MAX_QUESTIONS`).
+        seller_id (Optional[str]): Seller identifier shared by the batch.
+        filters (Optional[dict]): Retrieval metadata filter shared by the
+            batch (see `QueryRequest`).
+        stream (bool): Stream results as NDJSON lines, in completion order,
+            instead of one JSON response in input order.
+    """
+
+    questions: List[str]
+    seller_id: str | None = None
+    filters: Dict[str, Any] | None = None
+    stream: bool = False
+
+
+@app.post("/query/batch", response_model=None)
+async def query_batch_endpoint(
+    request: BatchQueryRequest,
+) -> Dict[str, Any] | StreamingResponse:
+    """
+    Answer many questions in one call through the router.
+
+    Intents are classified in bulk, RAG questions are embedded and searched
+    together, and LLM calls run with bounded parallelism (see
+    `router.aiter_route_batch`). A question that fails gets an "error"
+    entry; the rest of the batch is still answered.
+
+    Args:
+        request (BatchQueryRequest): Questions and shared options.
+
+    Returns:
+        dict: {"results": [{"index", "question", "answer"}, ...]} in input
+        order, or, with `stream=true`, an `application/x-ndjson` stream
+        with one such object per line as answers complete.
+
+    Raises:
+        HTTPException: 400 if the batch exceeds `constants.BATCH_MAX_QUESTIONS`.
+    """
+    questions = [q.strip() for q in request.questions]
+    if len(questions) > constants.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds {constants.BATCH_MAX_QUESTIONS} questions",
+        )
+
+    if request.stream:
+        return StreamingResponse(
+            _ndjson_stream(questions, request.seller_id, request.filters),
+            media_type="application/x-ndjson",
+        )
+
+    with tracing.trace("query_batch"):
+        answers = await router.aroute_batch(
+            questions, seller_id=request.seller_id, filters=request.filters
+        )
+    return {
+        "results": [
+            {"index": i, "question": q, "answer": a}
+            for i, (q, a) in enumerate(zip(questions, answers))
+        ]
+    }
+
+
+async def _ndjson_stream(
+    questions: List[str],
+    seller_id: str | None,
+    filters: Dict[str, Any] | None,
+) -> AsyncIterator[str]:
+    """Serialize batch results as NDJSON lines, reporting failures."""
+    started = time.perf_counter()
+    try:
+        async for i, answer in router.aiter_route_batch(
+            questions, seller_id=seller_id, filters=filters
+        ):
+            line = {"index": i, "question": questions[i], "answer": answer}
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+    except Exception as e:
+        logger.info(e)
+        yield json.dumps({"error": str(e)}) + "\n"
+    finally:
+        tracing.REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            "query_batch_stream",
+            tracing.NO_INTENT,
+        )
+
+
+@app.get("/status")
+def status() -> Dict[str, Any]:
+    """
+    Report runtime load and cache statistics.
+
+    Returns:
+        dict: LLM limiter queue depths, answer cache, query embedding
+        cache, analytics agent cache and router fast-path counters.
+    """
+    return {
+        "llm": concurrency.stats(),
+        "answer_cache": answer_cache.answer_cache.stats(),
+        "query_embedding_cache": embedding_cache.query_cache.stats(),
+        "analytics_cache": agent.cache_stats(),
+        "routing": intent_classifier.routing_stats(),
+    }
+
+
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    """
+    Export per-stage and per-request latency histograms.
+
+    Returns:
+        PlainTextResponse: Prometheus text exposition format, with
+        `marketplace_stage_duration_seconds{stage, intent}` and
+        `marketplace_request_duration_seconds{endpoint, intent}`.
+    """
+    return PlainTextResponse(
+        tracing.render_metrics(), media_type="text/plain; version=0.0.4"
+    )
+
+
+def _format_sse(event: str, data: Any) -> str:
+    """Serialize one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_stream(
+    question: str,
+    seller_id: str | None,
+    filters: Dict[str, Any] | None = None,
+) -> Iterator[str]:
+    """Convert router stream events into SSE frames, reporting failures.
+
+    The request latency (up to the last frame) and the stream's intent are
+    recorded in the request histogram.
+    """
+    started = time.perf_counter()
+    intent = tracing.NO_INTENT
+    try:
+        for event in router.stream_route(
+            question, seller_id=seller_id, filters=filters
+        ):
+            if event["event"] == "done":
+                intent = event["data"].get("intent", intent)
+            yield _format_sse(event["event"], event["data"])
+    except Exception as e:
+        logger.info(e)
+        yield _format_sse("error", {"detail": str(e)})
+    finally:
+        tracing.REQUEST_SECONDS.observe(
+            time.perf_counter() - started, "query_stream", intent
+        )
+
+
+@app.post("/query/stream")
+def query_stream_endpoint(request: QueryRequest) -> StreamingResponse:
+    """
+    Stream an answer as Server-Sent Events.
+
+    The question is routed automatically (`mode` is ignored). Frames are
+    sent in order:
+    - `citations`: list of citations for the retrieved documents
+    - `token`: answer text, one frame per generated token
+    - `done`: final metadata (intent, confidence, sources)
+
+    An `error` frame is sent instead if the pipeline fails mid-stream.
+
+    Args:
+        request (QueryRequest): Request payload containing the user's question.
+
+    Returns:
+        StreamingResponse: `text/event-stream` response.
+    """
+    question = request.question.strip()
+    return StreamingResponse(
+        _sse_stream(question, request.seller_id, request.filters),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
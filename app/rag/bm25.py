@@ -0,0 +1,222 @@
+"""
+Module: bm25.py
+---------------
+In-process BM25 inverted index over documentation chunks.
+
+Dense MiniLM retrieval misses exact terms (SKU rules, penalty names, category
+names). This lexical index complements it:
+- Built from the same chunks as the Chroma index
+- Persisted as JSON next to the Chroma directory
+- Searched in microseconds via an inverted index (term -> postings)
+- Fused with vector results via reciprocal-rank fusion (`reciprocal_rank_fusion`)
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import logging
+import os
+from langchain.schema import Document
+
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokenization shared by indexing and querying."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 index with an inverted postings list."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        """Create an empty index.
+
+        Args:
+            k1: Term-frequency saturation parameter.
+            b: Document-length normalization parameter.
+        """
+        self.k1 = k1
+        self.b = b
+        self.docs: List[Document] = []
+        self.doc_lengths: List[int] = []
+        self.avg_length = 0.0
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.idf: Dict[str, float] = {}
+        self._stale = False
+
+    @classmethod
+    def from_documents(
+        cls, docs: Sequence[Document], k1: float = 1.5, b: float = 0.75
+    ) -> "BM25Index":
+        """Build an index from LangChain documents.
+
+        Args:
+            docs: Chunks to index.
+            k1: Term-frequency saturation parameter.
+            b: Document-length normalization parameter.
+
+        Returns:
+            BM25Index: Ready-to-search index.
+        """
+        index = cls(k1=k1, b=b)
+        index.add_documents(docs)
+        return index
+
+    def add_documents(self, docs: Sequence[Document]) -> None:
+        """Append chunks to the index, e.g. batch by batch while streaming.
+
+        Corpus statistics (average length, IDF) are recomputed once, on the
+        next search, rather than after every batch.
+
+        Args:
+            docs: Chunks to index.
+        """
+        for doc in docs:
+            doc_idx = len(self.docs)
+            self.docs.append(doc)
+            terms = tokenize(doc.page_content)
+            self.doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings.setdefault(term, []).append((doc_idx, tf))
+
+        self._stale = True
+
+    def _compute_stats(self) -> None:
+        """Derive average length and IDF values from postings."""
+        n_docs = len(self.docs)
+        self.avg_length = sum(self.doc_lengths) / n_docs if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+        self._stale = False
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        predicate: Callable[[Document], bool] | None = None,
+    ) -> List[Tuple[Document, float]]:
+        """Return the top-k chunks for a query by BM25 score.
+
+        Args:
+            query: Free-text query.
+            k: Number of results.
+            predicate: Optional filter; chunks it rejects are never returned.
+
+        Returns:
+            List of (document, score) pairs, best first. Chunks sharing no
+            term with the query are never returned.
+        """
+        if self._stale:
+            self._compute_stats()
+        avg_length = self.avg_length or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for doc_idx, tf in plist:
+                length_ratio = self.doc_lengths[doc_idx] / avg_length
+                norm = self.k1 * (1 - self.b + self.b * length_ratio)
+                scores[doc_idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if predicate is not None:
+            scores = {
+                doc_idx: score
+                for doc_idx, score in scores.items()
+                if predicate(self.docs[doc_idx])
+            }
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(self.docs[doc_idx], score) for doc_idx, score in ranked[:k]]
+
+    def save(self, path: str) -> None:
+        """Persist the index as JSON (written atomically).
+
+        Args:
+            path: Destination file.
+        """
+        payload = {
+            "k1": self.k1,
+            "b": self.b,
+            "docs": [
+                {"text": d.page_content, "metadata": d.metadata}
+                for d in self.docs
+            ],
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Load an index saved with `save`.
+
+        Args:
+            path: Source file.
+
+        Returns:
+            BM25Index: Loaded index.
+        """
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+
+        index = cls(k1=payload["k1"], b=payload["b"])
+        index.docs = [
+            Document(page_content=d["text"], metadata=d["metadata"])
+            for d in payload["docs"]
+        ]
+        index.doc_lengths = payload["doc_lengths"]
+        index.postings = {
+            term: [tuple(p) for p in plist]
+            for term, plist in payload["postings"].items()
+        }
+        index._compute_stats()
+        return index
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[Document]],
+    weights: Sequence[float],
+    k: int,
+    rrf_k: int = 60,
+) -> List[Document]:
+    """Fuse several ranked document lists with weighted reciprocal-rank fusion.
+
+    score(d) = sum_i weight_i / (rrf_k + rank_i(d)), ranks starting at 1.
+    Documents are identified by their `chunk_id` metadata.
+
+    Args:
+        ranked_lists: Ranked results from each retriever, best first.
+        weights: One weight per list.
+        k: Number of fused results to return.
+        rrf_k: RRF damping constant.
+
+    Returns:
+        The top-k fused documents, best first.
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    by_id: Dict[str, Document] = {}
+
+    for docs, weight in zip(ranked_lists, weights):
+        for rank, doc in enumerate(docs, start=1):
+            key = doc.metadata.get("chunk_id") or doc.page_content
+            scores[key] += weight / (rrf_k + rank)
+            by_id.setdefault(key, doc)
+
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [by_id[key] for key in best]
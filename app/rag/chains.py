@@ -5,23 +5,78 @@ Define RAG chains for Marketplace X:
 - Policy/Compliance chain (strict)
 - Recommendation chain (reasoning allowed but grounded)
 - Refusal logic if retrieval confidence is low
+- Token streaming and async variants of both chains
+- Batched retrieval (one vector search for many questions)
+
+Each pipeline runs a single hybrid retrieval: a scored similarity search fused
+with BM25 lexical results (reciprocal-rank fusion). The dense relevance scores
+drive the confidence (and the refusal, before any LLM call), and the very same
+documents, merged and packed to a token budget, are stuffed into the prompt.
 """
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import asyncio
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
 import logging
-from langchain.chains import RetrievalQA
+from langchain.prompts import PromptTemplate
 from langchain.schema import Document
 from langchain_community.llms import Ollama
 
-from app import constants
-from app.rag.index import get_doc_retriever
+from app import concurrency, constants, registry, tracing
+from app.rag import filters as metadata_filters
+from app.rag.bm25 import reciprocal_rank_fusion
+from app.rag.context import (
+    PackedSpan,
+    format_context,
+    pack_context,
+    token_budget,
+)
+from app.rag.docs_index import load_bm25_index, load_doc_index
+from app.rag.filters import Filters
+from app.rag.rerank import rerank
 
 
 logger = logging.getLogger(__name__)
 
+POLICY_CHAIN_KEY = f"{registry.CHAIN_PREFIX}policy"
+RECOMMENDATION_CHAIN_KEY = f"{registry.CHAIN_PREFIX}recommendation"
+
+POLICY_PROMPT = (
+    "You are the Marketplace X Policy Assistant.\n"
+    "Your answer MUST be strictly based on the retrieved documentation.\n"
+    "If the documentation does not support the answer, you MUST refuse with:\n"
+    '"I’m sorry, but I don’t have enough information to answer this question based on Marketplace X documentation.".\n'
+    "Always include citations using the format: [doc_id > section > chunk_id].\n"
+    "Do not invent or speculate.\n"
+    "\n"
+    "Question:\n{question}\n\n"
+    "Relevant documentation:\n{context}\n\n"
+    "Answer:"
+)
+
+RECOMMENDATION_PROMPT = (
+    "You are the Marketplace X Growth & Listing Assistant.\n"
+    "You can provide recommendations and reasoning, but all factual claims must be grounded "
+    "in the retrieved documentation. Always include citations.\n"
+    "If not enough context is available, refuse politely.\n\n"
+    "Question:\n{question}\n\n"
+    "Relevant documentation:\n{context}\n\n"
+    "Answer:"
+)
+
+POLICY_REFUSAL = (
+    "I’m sorry, but I don’t have enough information to answer "
+    "this question based on Marketplace X documentation."
+)
+
+RECOMMENDATION_REFUSAL = (
+    "I’m sorry, but I don’t have enough information to provide "
+    "a grounded recommendation based on Marketplace X documentation."
+)
+
 
 # ---------------------------------------------------------------------------
 # Utility helpers
@@ -46,29 +101,274 @@ def _extract_citations(docs: List[Document]) -> List[str]:
     return [_format_citation(d) for d in docs]
 
 
-def _retrieval_confidence(docs: List[Document]) -> float:
-    """Compute a simple confidence score for retrieved docs.
+def _span_label(span: PackedSpan) -> str:
+    """Label a packed span with the citations of the chunks it contains."""
+    return " ".join(_format_citation(d) for d in span.sources)
+
+
+@tracing.traced("pack")
+def _pack(docs: List[Document]) -> Tuple[str, List[Document]]:
+    """Pack retrieved chunks into a token-budgeted context.
+
+    Overlapping and adjacent chunks of the same section are merged and
+    duplicates dropped (see `app.rag.context`).
+
+    Args:
+        docs: Retrieved chunks, best first.
+
+    Returns:
+        Tuple of (context string, chunks that made it into the context).
+    """
+    spans = pack_context(
+        docs,
+        max_tokens=token_budget(constants.LLM_MODEL_RAG),
+        label=_span_label,
+    )
+    packed_docs = [d for span in spans for d in span.sources]
+    return format_context(spans, label=_span_label), packed_docs
+
 
-    Heuristic:
-    - If no docs: 0.0
-    - If all docs have very short text (<40 chars): suspicious
-    - Later we can extend with cosine similarity checks.
+def _retrieval_confidence(scores: List[float]) -> float:
+    """Compute a confidence score from retrieval relevance scores.
+
+    The confidence is the best relevance score (Chroma's normalized
+    similarity), clipped to [0, 1]. No documents means no confidence.
 
     Args:
-        docs: Retrieved chunks.
+        scores: Relevance scores of the retrieved chunks.
 
     Returns:
         Confidence score in [0, 1].
     """
-    if not docs:
+    if not scores:
         return 0.0
 
-    avg_len = sum(len(d.page_content) for d in docs) / len(docs)
+    return min(max(max(scores), 0.0), 1.0)
+
+
+def _retrieval_scope(
+    pipeline: str, filters: Filters | None
+) -> Tuple[Dict[str, Any], Filters | None, int]:
+    """Resolve a pipeline's retrieval settings.
+
+    Returns:
+        Tuple of (settings from `constants.RETRIEVAL_CONFIG`, active metadata
+        filter, number of fused candidates to keep).
+    """
+    config = constants.RETRIEVAL_CONFIG[pipeline]
+    scope = None
+    if config.get("doc_ids"):
+        scope = {"doc_id": config["doc_ids"]}
+    elif config.get("exclude_doc_ids"):
+        scope = {"doc_id": {"not_in": config["exclude_doc_ids"]}}
+    active_filters = metadata_filters.merge(scope, filters)
+    # With reranking on, fusion keeps a wider candidate set for the reranker.
+    n_candidates = (
+        config["rerank_candidates"] if config["rerank"] else config["k"]
+    )
+    return config, active_filters, n_candidates
+
+
+@tracing.traced("retrieve")
+def _retrieve(
+    question: str, pipeline: str, filters: Filters | None = None
+) -> Tuple[List[Document], float]:
+    """Run the single retrieval shared by confidence and generation.
+
+    Dense results (with relevance scores) are fused with BM25 lexical results
+    via weighted reciprocal-rank fusion, using the per-pipeline settings in
+    `constants.RETRIEVAL_CONFIG`. Confidence comes from the dense relevance
+    scores; without a BM25 index, retrieval is vector-only. When reranking
+    is enabled, the fused candidates are reordered by a cross-encoder within
+    the request's latency budget.
+
+    Both retrievers only consider chunks matching the metadata filter: the
+    pipeline's default doc scope (`exclude_doc_ids`, or an opt-in `doc_ids`
+    allow-list), overridden by any `filters` passed down by the router (see
+    `app.rag.filters`).
+
+    Args:
+        question: User question.
+        pipeline: Key into `constants.RETRIEVAL_CONFIG` ("policy", ...).
+        filters: Optional metadata filter, e.g. {"doc_id": "penalties"}.
+
+    Returns:
+        Tuple of (retrieved documents, confidence).
+    """
+    config, active_filters, n_candidates = _retrieval_scope(pipeline, filters)
+    started_at = time.perf_counter()
+
+    with tracing.span("vector_search"):
+        results = load_doc_index().similarity_search_with_relevance_scores(
+            question,
+            k=max(config["vector_k"], n_candidates),
+            filter=metadata_filters.to_chroma_where(active_filters),
+        )
+    return _fuse(
+        question, results, config, active_filters, n_candidates, started_at
+    )
+
+
+def _fuse(
+    question: str,
+    results: List[Tuple[Document, float]],
+    config: Dict[str, Any],
+    active_filters: Filters | None,
+    n_candidates: int,
+    started_at: float,
+) -> Tuple[List[Document], float]:
+    """Fuse dense results with BM25 and rerank (see `_retrieve`).
+
+    Args:
+        question: User question.
+        results: Dense (document, relevance score) pairs, best first.
+        config: Pipeline settings from `constants.RETRIEVAL_CONFIG`.
+        active_filters: Metadata filter applied to the lexical search.
+        n_candidates: Number of fused candidates to keep.
+        started_at: Retrieval start (perf_counter), for the rerank budget.
+
+    Returns:
+        Tuple of (retrieved documents, confidence).
+    """
+    vector_docs = [doc for doc, _ in results]
+    confidence = _retrieval_confidence([score for _, score in results])
+
+    bm25_index = load_bm25_index() if config["bm25_weight"] > 0 else None
+    if bm25_index is None:
+        candidates = vector_docs[:n_candidates]
+    else:
+        with tracing.span("bm25_search"):
+            lexical_docs = [
+                doc
+                for doc, _ in bm25_index.search(
+                    question,
+                    config["bm25_k"],
+                    predicate=lambda d: metadata_filters.matches(
+                        d.metadata, active_filters
+                    ),
+                )
+            ]
+        candidates = reciprocal_rank_fusion(
+            [vector_docs, lexical_docs],
+            weights=[config["vector_weight"], config["bm25_weight"]],
+            k=n_candidates,
+            rrf_k=constants.RRF_K,
+        )
+
+    if not config["rerank"]:
+        return candidates[: config["k"]], confidence
+
+    with tracing.span("rerank"):
+        docs = rerank(
+            question, candidates, top_n=config["k"], started_at=started_at
+        )
+    return docs, confidence
+
+
+def _vector_search_many(
+    embeddings: List[List[float]], k: int, where: Dict[str, Any] | None
+) -> List[List[Tuple[Document, float]]]:
+    """Run one Chroma query for many query embeddings.
+
+    Distances are converted to the same relevance scores as
+    `similarity_search_with_relevance_scores`.
+
+    Returns:
+        Per query, the (document, relevance score) pairs, best first.
+    """
+    index = load_doc_index()
+    results = index._collection.query(
+        query_embeddings=embeddings,
+        n_results=k,
+        where=where,
+        include=["documents", "metadatas", "distances"],
+    )
+    relevance = index._select_relevance_score_fn()
+    return [
+        [
+            (Document(page_content=text, metadata=meta or {}), relevance(dist))
+            for text, meta, dist in zip(texts, metas, dists)
+        ]
+        for texts, metas, dists in zip(
+            results["documents"], results["metadatas"], results["distances"]
+        )
+    ]
+
+
+@tracing.traced("retrieve_batch")
+def retrieve_many(
+    questions: List[str],
+    pipeline: str,
+    embeddings: List[List[float]],
+    filters: Filters | None = None,
+) -> List[Tuple[List[Document], float]]:
+    """Retrieve for many questions with a single vector search.
+
+    All query embeddings go to Chroma in one top-k query; BM25 fusion and
+    reranking then run per question, as in `_retrieve`. Each question gets
+    its own rerank budget, charged with the shared search time, so later
+    questions are not starved by the reranking of earlier ones.
+
+    Args:
+        questions: User questions.
+        pipeline: Key into `constants.RETRIEVAL_CONFIG` ("policy", ...).
+        embeddings: Query embedding of each question (same order).
+        filters: Optional metadata filter shared by all questions.
+
+    Returns:
+        Per question, a tuple of (retrieved documents, confidence).
+    """
+    if not questions:
+        return []
+
+    config, active_filters, n_candidates = _retrieval_scope(pipeline, filters)
+    search_started = time.perf_counter()
+
+    with tracing.span("vector_search", queries=len(questions)):
+        results = _vector_search_many(
+            embeddings,
+            k=max(config["vector_k"], n_candidates),
+            where=metadata_filters.to_chroma_where(active_filters),
+        )
+    search_s = time.perf_counter() - search_started
+    return [
+        _fuse(
+            question,
+            hits,
+            config,
+            active_filters,
+            n_candidates,
+            started_at=time.perf_counter() - search_s,
+        )
+        for question, hits in zip(questions, results)
+    ]
+
+
+def _is_confident(confidence: float) -> bool:
+    """Return True if retrieval is strong enough to call the LLM."""
+    return confidence >= constants.RAG_MIN_CONFIDENCE
+
+
+def _refusal_response(refusal: str, confidence: float) -> Dict[str, Any]:
+    """Build the unified refusal payload."""
+    return {
+        "answer": refusal,
+        "citations": [],
+        "sources": [],
+        "confidence": confidence,
+    }
 
-    if avg_len < 40:
-        return 0.2
 
-    return 1.0
+def _answer_response(
+    answer: str, docs: List[Document], confidence: float
+) -> Dict[str, Any]:
+    """Build the unified answer payload with citations for `docs`."""
+    return {
+        "answer": answer,
+        "citations": _extract_citations(docs),
+        "sources": [d.metadata for d in docs],
+        "confidence": confidence,
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -76,8 +376,17 @@ def _retrieval_confidence(docs: List[Document]) -> float:
 # ---------------------------------------------------------------------------
 
 
-def get_policy_chain() -> RetrievalQA:
-    """Create a strict policy/compliance chain using RetrievalQA.
+def _get_rag_llm() -> Ollama:
+    """Return the shared Ollama LLM used by the RAG chains."""
+    return registry.get_llm(
+        constants.LLM_MODEL_RAG,
+        constants.TEMPERATURE_RAG,
+        llm_cls=Ollama,
+    )
+
+
+def get_policy_chain() -> Any:
+    """Return the strict policy/compliance chain, compiled once per process.
 
     Behavior:
     - Must cite at least one retrieved document
@@ -85,39 +394,16 @@ def get_policy_chain() -> RetrievalQA:
     - No speculation allowed
 
     Returns:
-        A configured RetrievalQA chain.
+        A runnable (prompt | llm) taking {"question", "context"}.
     """
-    retriever = get_doc_retriever(k=4)
-    llm = Ollama(
-        model=constants.LLM_MODEL_RAG,
-        temperature=constants.TEMPERATURE_RAG,
+    return registry.get_or_create(
+        POLICY_CHAIN_KEY,
+        lambda: PromptTemplate.from_template(POLICY_PROMPT) | _get_rag_llm(),
     )
 
-    prompt_template = (
-        "You are the Marketplace X Policy Assistant.\n"
-        "Your answer MUST be strictly based on the retrieved documentation.\n"
-        "If the documentation does not support the answer, you MUST refuse with:\n"
-        '"I’m sorry, but I don’t have enough information to answer this question based on Marketplace X documentation.".\n'
-        "Always include citations using the format: [doc_id > section > chunk_id].\n"
-        "Do not invent or speculate.\n"
-        "\n"
-        "Question:\n{question}\n\n"
-        "Relevant documentation:\n{context}\n\n"
-        "Answer:"
-    )
 
-    chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=retriever,
-        chain_type="stuff",
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": prompt_template},
-    )
-    return chain
-
-
-def get_recommendation_chain() -> RetrievalQA:
-    """Create a recommendation RAG chain with reasoning allowed.
+def get_recommendation_chain() -> Any:
+    """Return the recommendation chain, compiled once per process.
 
     Behavior:
     - Can synthesize recommendations
@@ -125,32 +411,21 @@ def get_recommendation_chain() -> RetrievalQA:
     - Must refuse if retrieval confidence is too low
 
     Returns:
-        A configured RetrievalQA chain.
+        A runnable (prompt | llm) taking {"question", "context"}.
     """
-    retriever = get_doc_retriever(k=4)
-    llm = Ollama(
-        model=constants.LLM_MODEL_RAG,
-        temperature=constants.TEMPERATURE_RAG,
+    return registry.get_or_create(
+        RECOMMENDATION_CHAIN_KEY,
+        lambda: (
+            PromptTemplate.from_template(RECOMMENDATION_PROMPT) | _get_rag_llm()
+        ),
     )
 
-    prompt_template = (
-        "You are the Marketplace X Growth & Listing Assistant.\n"
-        "You can provide recommendations and reasoning, but all factual claims must be grounded "
-        "in the retrieved documentation. Always include citations.\n"
-        "If not enough context is available, refuse politely.\n\n"
-        "Question:\n{question}\n\n"
-        "Relevant documentation:\n{context}\n\n"
-        "Answer:"
-    )
 
-    chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=retriever,
-        chain_type="stuff",
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": prompt_template},
-    )
-    return chain
+# Pipeline name -> (chain getter, refusal message).
+PIPELINES: Dict[str, Tuple[Callable[[], Any], str]] = {
+    "policy": (get_policy_chain, POLICY_REFUSAL),
+    "recommendation": (get_recommendation_chain, RECOMMENDATION_REFUSAL),
+}
 
 
 # ---------------------------------------------------------------------------
@@ -158,11 +433,44 @@ def get_recommendation_chain() -> RetrievalQA:
 # ---------------------------------------------------------------------------
 
 
-def run_policy_rag(question: str) -> Dict[str, Any]:
+def _run_rag(
+    question: str,
+    pipeline: str,
+    get_chain: Callable[[], Any],
+    refusal: str,
+    filters: Filters | None = None,
+) -> Dict[str, Any]:
+    """Retrieve once, refuse on low confidence, otherwise generate.
+
+    Args:
+        question: User question.
+        pipeline: Retrieval settings key ("policy" or "recommendation").
+        get_chain: Returns the compiled prompt | llm chain.
+        refusal: Refusal message used when confidence is too low.
+        filters: Optional metadata filter (see `_retrieve`).
+
+    Returns:
+        A dictionary with keys "answer", "citations", "sources", "confidence".
+    """
+    docs, confidence = _retrieve(question, pipeline, filters)
+
+    if not _is_confident(confidence):
+        return _refusal_response(refusal, confidence)
+
+    context, docs = _pack(docs)
+    with tracing.span("generate", pipeline=pipeline):
+        answer = get_chain().invoke({"question": question, "context": context})
+    return _answer_response(answer, docs, confidence)
+
+
+def run_policy_rag(
+    question: str, filters: Filters | None = None
+) -> Dict[str, Any]:
     """Run the full policy RAG pipeline and apply refusal logic.
 
     Args:
         question: User question.
+        filters: Optional metadata filter narrowing the policy doc scope.
 
     Returns:
         A dictionary with keys:
@@ -171,38 +479,19 @@ def run_policy_rag(question: str) -> Dict[str, Any]:
         - "sources"
         - "confidence"
     """
-    chain = get_policy_chain()
-    raw = chain({"query": question})
-
-    docs = raw.get("source_documents", [])
-    confidence = _retrieval_confidence(docs)
-
-    if confidence < 0.5:
-        return {
-            "answer": (
-                "I’m sorry, but I don’t have enough information to answer "
-                "this question based on Marketplace X documentation."
-            ),
-            "citations": [],
-            "sources": [],
-            "confidence": confidence,
-        }
-
-    citations = _extract_citations(docs)
-
-    return {
-        "answer": raw["result"],
-        "citations": citations,
-        "sources": [d.metadata for d in docs],
-        "confidence": confidence,
-    }
+    return _run_rag(
+        question, "policy", get_policy_chain, POLICY_REFUSAL, filters
+    )
 
 
-def run_recommendation_rag(question: str) -> Dict[str, Any]:
+def run_recommendation_rag(
+    question: str, filters: Filters | None = None
+) -> Dict[str, Any]:
     """Run the recommendation RAG pipeline.
 
     Args:
         question: User question.
+        filters: Optional metadata filter narrowing the doc scope.
 
     Returns:
         A dictionary with keys:
@@ -211,28 +500,203 @@ def run_recommendation_rag(question: str) -> Dict[str, Any]:
         - "sources"
         - "confidence"
     """
-    chain = get_recommendation_chain()
-    raw = chain({"query": question})
+    return _run_rag(
+        question,
+        "recommendation",
+        get_recommendation_chain,
+        RECOMMENDATION_REFUSAL,
+        filters,
+    )
 
-    docs = raw.get("source_documents", [])
-    confidence = _retrieval_confidence(docs)
 
-    if confidence < 0.5:
-        return {
-            "answer": (
-                "I’m sorry, but I don’t have enough information to provide "
-                "a grounded recommendation based on Marketplace X documentation."
-            ),
-            "citations": [],
-            "sources": [],
-            "confidence": confidence,
+# ---------------------------------------------------------------------------
+# Streaming
+# ---------------------------------------------------------------------------
+
+
+def _stream_rag(
+    question: str,
+    pipeline: str,
+    get_chain: Callable[[], Any],
+    refusal: str,
+    filters: Filters | None = None,
+) -> Iterator[Dict[str, Any]]:
+    """Stream a RAG answer as citations, tokens, then a final frame.
+
+    Retrieval runs first so citations reach the client before generation
+    starts; low-confidence retrievals refuse without calling the LLM.
+
+    Args:
+        question: User question.
+        pipeline: Retrieval settings key ("policy" or "recommendation").
+        get_chain: Returns the compiled prompt | llm chain.
+        refusal: Refusal message used when confidence is too low.
+        filters: Optional metadata filter (see `_retrieve`).
+
+    Yields:
+        Event dicts:
+        - {"event": "citations", "data": list[str]}
+        - {"event": "token", "data": str}
+        - {"event": "done", "data": {"confidence": float, "sources": list}}
+    """
+    docs, confidence = _retrieve(question, pipeline, filters)
+
+    if not _is_confident(confidence):
+        yield {"event": "citations", "data": []}
+        yield {"event": "token", "data": refusal}
+        yield {
+            "event": "done",
+            "data": {"confidence": confidence, "sources": []},
         }
+        return
 
-    citations = _extract_citations(docs)
+    context, docs = _pack(docs)
+    yield {"event": "citations", "data": _extract_citations(docs)}
 
-    return {
-        "answer": raw["result"],
-        "citations": citations,
-        "sources": [d.metadata for d in docs],
-        "confidence": confidence,
+    inputs = {"question": question, "context": context}
+    # A span cannot stay open across yields; record generation afterwards.
+    started = time.perf_counter()
+    for token in get_chain().stream(inputs):
+        yield {"event": "token", "data": token}
+    tracing.record_span("generate", started, pipeline=pipeline)
+
+    yield {
+        "event": "done",
+        "data": {
+            "confidence": confidence,
+            "sources": [d.metadata for d in docs],
+        },
     }
+
+
+def stream_policy_rag(
+    question: str, filters: Filters | None = None
+) -> Iterator[Dict[str, Any]]:
+    """Stream the policy RAG pipeline (see `_stream_rag`)."""
+    return _stream_rag(
+        question, "policy", get_policy_chain, POLICY_REFUSAL, filters
+    )
+
+
+def stream_recommendation_rag(
+    question: str, filters: Filters | None = None
+) -> Iterator[Dict[str, Any]]:
+    """Stream the recommendation RAG pipeline (see `_stream_rag`)."""
+    return _stream_rag(
+        question,
+        "recommendation",
+        get_recommendation_chain,
+        RECOMMENDATION_REFUSAL,
+        filters,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Async
+# ---------------------------------------------------------------------------
+
+
+async def _arun_rag(
+    question: str,
+    pipeline: str,
+    get_chain: Callable[[], Any],
+    refusal: str,
+    filters: Filters | None = None,
+) -> Dict[str, Any]:
+    """Run a RAG pipeline on the async path.
+
+    Retrieval (Chroma, sync) runs in a worker thread; generation uses the
+    async Ollama client and holds a slot of the shared LLM limiter.
+
+    Args:
+        question: User question.
+        pipeline: Retrieval settings key ("policy" or "recommendation").
+        get_chain: Returns the compiled prompt | llm chain.
+        refusal: Refusal message used when confidence is too low.
+        filters: Optional metadata filter (see `_retrieve`).
+
+    Returns:
+        Same schema as `run_policy_rag`.
+
+    Raises:
+        OverloadedError: If the LLM wait queue is full.
+    """
+    docs, confidence = await asyncio.to_thread(
+        _retrieve, question, pipeline, filters
+    )
+    return await _agenerate(
+        question, pipeline, get_chain, refusal, docs, confidence
+    )
+
+
+async def _agenerate(
+    question: str,
+    pipeline: str,
+    get_chain: Callable[[], Any],
+    refusal: str,
+    docs: List[Document],
+    confidence: float,
+) -> Dict[str, Any]:
+    """Refuse on low confidence, otherwise pack and generate asynchronously.
+
+    Raises:
+        OverloadedError: If the LLM wait queue is full.
+    """
+    if not _is_confident(confidence):
+        return _refusal_response(refusal, confidence)
+
+    context, docs = _pack(docs)
+    inputs = {"question": question, "context": context}
+    async with concurrency.get_limiter().slot():
+        with tracing.span("generate", pipeline=pipeline):
+            answer = await get_chain().ainvoke(inputs)
+
+    return _answer_response(answer, docs, confidence)
+
+
+async def arun_policy_rag(
+    question: str, filters: Filters | None = None
+) -> Dict[str, Any]:
+    """Async variant of `run_policy_rag`."""
+    return await _arun_rag(
+        question, "policy", get_policy_chain, POLICY_REFUSAL, filters
+    )
+
+
+async def arun_recommendation_rag(
+    question: str, filters: Filters | None = None
+) -> Dict[str, Any]:
+    """Async variant of `run_recommendation_rag`."""
+    return await _arun_rag(
+        question,
+        "recommendation",
+        get_recommendation_chain,
+        RECOMMENDATION_REFUSAL,
+        filters,
+    )
+
+
+async def agenerate_rag(
+    question: str,
+    pipeline: str,
+    docs: List[Document],
+    confidence: float,
+) -> Dict[str, Any]:
+    """Answer from an existing retrieval (e.g. from `retrieve_many`).
+
+    Args:
+        question: User question.
+        pipeline: "policy" or "recommendation".
+        docs: Retrieved documents, best first.
+        confidence: Retrieval confidence.
+
+    Returns:
+        Same schema as `run_policy_rag`.
+
+    Raises:
+        OverloadedError: If the LLM wait queue is full.
+    """
+    get_chain, refusal = PIPELINES[pipeline]
+    return await _agenerate(
+        question, pipeline, get_chain, refusal, docs, confidence
+    )
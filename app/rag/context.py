@@ -0,0 +1,246 @@
+"""
+Module: context.py
+------------------
+Token-budgeted context assembly for the "stuff" prompts.
+
+Retrieved chunks overlap (the splitters use `chunk_overlap`) and often come
+from the same section, so stuffing them verbatim repeats text and inflates
+prompt prefill. This stage:
+- Drops chunks whose text is already covered by another retrieved chunk
+- Merges overlapping or adjacent chunks of the same doc/section into one span
+- Packs spans in relevance order up to a token budget for the target model
+- Keeps every packed chunk as a source of its span, so citations survive
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import logging
+from langchain.schema import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from app import constants, tracing
+
+
+logger = logging.getLogger(__name__)
+
+DOC_GROUP_KEYS = ("doc_id", "section", "subsection")
+PRODUCT_GROUP_KEYS = ("product_id",)
+
+_CHUNK_INDEX_RE = re.compile(r"_(\d+)$")
+
+
+@dataclass
+class PackedSpan:
+    """A contiguous piece of context and the chunks it was built from."""
+
+    text: str
+    sources: List[Document] = field(default_factory=list)
+    rank: int = 0
+
+    def to_document(self) -> Document:
+        """Return the span as a Document carrying the first source's metadata.
+
+        All source metadata is kept under "sources" for citations.
+        """
+        metadata = dict(self.sources[0].metadata) if self.sources else {}
+        metadata["sources"] = [dict(s.metadata) for s in self.sources]
+        return Document(page_content=self.text, metadata=metadata)
+
+
+def token_budget(model: str) -> int:
+    """Return the context token budget for an LLM model name."""
+    return constants.CONTEXT_TOKEN_BUDGETS.get(
+        model, constants.DEFAULT_CONTEXT_TOKEN_BUDGET
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text (chars / CHARS_PER_TOKEN)."""
+    return math.ceil(len(text) / constants.CHARS_PER_TOKEN)
+
+
+def _chunk_index(doc: Document) -> Optional[int]:
+    """Return the numeric suffix of a chunk_id ("returns_007" -> 7)."""
+    match = _CHUNK_INDEX_RE.search(str(doc.metadata.get("chunk_id", "")))
+    return int(match.group(1)) if match else None
+
+
+def _merge_overlap(left: str, right: str) -> Optional[str]:
+    """Join two texts if the end of `left` overlaps the start of `right`.
+
+    Returns:
+        The merged text, or None if the overlap is shorter than
+        `constants.CONTEXT_MIN_OVERLAP` characters.
+    """
+    if right in left:
+        return left
+    if left in right:
+        return right
+
+    longest = min(len(left), len(right))
+    for size in range(longest, constants.CONTEXT_MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return None
+
+
+def _merge_group(docs: List[Tuple[int, Document]]) -> List[PackedSpan]:
+    """Merge the chunks of one doc/section into as few spans as possible.
+
+    Args:
+        docs: (retrieval rank, document) pairs from the same group.
+
+    Returns:
+        Spans in document order, each ranked by its best member.
+    """
+    ordered = sorted(
+        docs,
+        key=lambda item: (
+            _chunk_index(item[1]) is None,
+            _chunk_index(item[1]) or 0,
+            item[0],
+        ),
+    )
+
+    spans: List[PackedSpan] = []
+    last_index: Optional[int] = None
+    for rank, doc in ordered:
+        text = doc.page_content.strip()
+        index = _chunk_index(doc)
+        if spans:
+            span = spans[-1]
+            merged = _merge_overlap(span.text, text)
+            if merged is None and index is not None and last_index is not None:
+                if index == last_index + 1:
+                    merged = f"{span.text}\n{text}"
+            if merged is not None:
+                span.text = merged
+                span.sources.append(doc)
+                span.rank = min(span.rank, rank)
+                last_index = index
+                continue
+        spans.append(PackedSpan(text=text, sources=[doc], rank=rank))
+        last_index = index
+    return spans
+
+
+def merge_chunks(
+    docs: Sequence[Document],
+    group_keys: Sequence[str] = DOC_GROUP_KEYS,
+) -> List[PackedSpan]:
+    """Dedup and merge retrieved chunks into spans, best-ranked first.
+
+    Args:
+        docs: Retrieved chunks, best first.
+        group_keys: Metadata keys identifying chunks that may be merged.
+
+    Returns:
+        List of spans ordered by the rank of their best chunk.
+    """
+    groups: Dict[Tuple, List[Tuple[int, Document]]] = {}
+    for rank, doc in enumerate(docs):
+        key = tuple(doc.metadata.get(k) for k in group_keys)
+        groups.setdefault(key, []).append((rank, doc))
+
+    spans: List[PackedSpan] = []
+    for members in groups.values():
+        spans.extend(_merge_group(members))
+
+    # Text repeated across groups (e.g. shared boilerplate) is sent once.
+    unique: List[PackedSpan] = []
+    for span in sorted(spans, key=lambda s: s.rank):
+        duplicate = next((u for u in unique if span.text in u.text), None)
+        if duplicate is None:
+            unique.append(span)
+        else:
+            duplicate.sources.extend(span.sources)
+    return unique
+
+
+def pack_context(
+    docs: Sequence[Document],
+    max_tokens: int,
+    group_keys: Sequence[str] = DOC_GROUP_KEYS,
+    label: Callable[[PackedSpan], str] | None = None,
+) -> List[PackedSpan]:
+    """Merge retrieved chunks and keep the best spans within a token budget.
+
+    Spans are added in relevance order; a span that does not fit is skipped
+    so a smaller, lower-ranked one can still use the remaining budget. If
+    even the best span is over budget, it is truncated rather than dropped.
+
+    Args:
+        docs: Retrieved chunks, best first.
+        max_tokens: Token budget for the whole context.
+        group_keys: Metadata keys identifying chunks that may be merged.
+        label: Optional span header (e.g. citations), counted in the budget.
+
+    Returns:
+        The packed spans, best first.
+    """
+    spans = merge_chunks(docs, group_keys)
+    packed: List[PackedSpan] = []
+    used = 0
+    for span in spans:
+        cost = estimate_tokens(format_span(span, label)) + 1
+        if used + cost <= max_tokens:
+            packed.append(span)
+            used += cost
+
+    if not packed and spans:
+        best = spans[0]
+        header = estimate_tokens(label(best)) + 1 if label else 0
+        max_chars = max(max_tokens - header, 0) * constants.CHARS_PER_TOKEN
+        best.text = best.text[:max_chars]
+        packed.append(best)
+        used = estimate_tokens(format_span(best, label))
+
+    logger.debug(
+        f"Packed {sum(len(s.sources) for s in packed)}/{len(docs)} chunks "
+        f"into {len(packed)} spans (~{used}/{max_tokens} tokens)"
+    )
+    return packed
+
+
+def format_span(
+    span: PackedSpan, label: Callable[[PackedSpan], str] | None = None
+) -> str:
+    """Render one span, preceded by its label when given."""
+    return f"{label(span)}\n{span.text}" if label else span.text
+
+
+def format_context(
+    spans: Sequence[PackedSpan],
+    label: Callable[[PackedSpan], str] | None = None,
+) -> str:
+    """Join packed spans into the prompt's context block."""
+    return "\n\n".join(format_span(s, label) for s in spans)
+
+
+class PackedRetriever(BaseRetriever):
+    """Retriever wrapper returning merged, token-budgeted spans.
+
+    Lets `RetrievalQA` "stuff" chains benefit from context packing without
+    changing the chain itself.
+    """
+
+    retriever: BaseRetriever
+    max_tokens: int
+    group_keys: Tuple[str, ...] = DOC_GROUP_KEYS
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        with tracing.span("retrieve"):
+            docs = self.retriever.get_relevant_documents(
+                query, callbacks=run_manager.get_child()
+            )
+        with tracing.span("pack"):
+            spans = pack_context(docs, self.max_tokens, self.group_keys)
+        return [span.to_document() for span in spans]
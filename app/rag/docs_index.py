@@ -5,32 +5,53 @@ Build and load the Chroma vector index for Marketplace X documentation.
 
 This module:
 - Converts chunks from loader.py into LangChain Documents
-- Embeds them using HuggingFace sentence-transformers
+- Consumes chunk streams in fixed-size batches (see `docs_loader.iter_chunks`)
+- Embeds them using HuggingFace sentence-transformers in batches (see ingest.py)
 - Persists them locally with ChromaDB
+- Re-embeds only new or changed chunks, tracked in a content-hash manifest
+- Maintains a BM25 lexical index over the same chunks for hybrid retrieval
+- Shares the loaded store process-wide via `app.registry`
 - Exposes a retriever for downstream RAG chains
 """
 
 from __future__ import annotations
 
-from typing import Dict, List
+import hashlib
+import json
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import logging
 import os
 from langchain.schema import Document
-from langchain_community.embeddings.huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores.chroma import Chroma
 
-from app import constants
+from app import answer_cache, constants, embeddings, registry
+from app.rag import ingest
+from app.rag.bm25 import BM25Index
 
 
 logger = logging.getLogger(__name__)
 
+DOCS_STORE_KEY = f"{registry.VECTORSTORE_PREFIX}docs"
+BM25_KEY = "bm25:docs"
+MANIFEST_VERSION = 1
+
 
 def _get_index_dir() -> str:
     """Return the directory where the Chroma index is stored."""
     return constants.CHROMA_DOCS_DIR
 
 
+def _get_manifest_path() -> str:
+    """Return the path of the chunk-hash manifest stored next to the index."""
+    return f"{_get_index_dir().rstrip('/')}_manifest.json"
+
+
+def _get_bm25_path() -> str:
+    """Return the path of the BM25 index stored next to the Chroma index."""
+    return f"{_get_index_dir().rstrip('/')}_bm25.json"
+
+
 def _convert_chunks_to_documents(chunks: List[Dict]) -> List[Document]:
     """Convert chunk dictionaries into LangChain Document objects.
 
@@ -49,6 +70,8 @@ def _convert_chunks_to_documents(chunks: List[Dict]) -> List[Document]:
             "section": chunk["section"],
             "subsection": chunk.get("subsection"),
             "path": chunk["metadata"].get("path"),
+            "start_char": chunk["metadata"].get("start_char"),
+            "end_char": chunk["metadata"].get("end_char"),
             "start_line": chunk["metadata"].get("start_line"),
             "end_line": chunk["metadata"].get("end_line"),
         }
@@ -63,51 +86,236 @@ def _convert_chunks_to_documents(chunks: List[Dict]) -> List[Document]:
     return docs
 
 
-def build_doc_index(chunks: List[Dict], force: bool = False) -> Chroma:
-    """Build a Chroma index for Marketplace X documentation.
+def _chunk_hash(doc: Document) -> str:
+    """Return a content hash covering a chunk's text and metadata.
 
-    If the index already exists and force=False, it is reused.
+    Args:
+        doc (Document): Converted chunk.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    payload = json.dumps(
+        {"text": doc.page_content, "metadata": doc.metadata},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_manifest() -> Optional[Dict]:
+    """Load the chunk-hash manifest stored next to the index, if any."""
+    path = _get_manifest_path()
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(hashes: Dict[str, str]) -> None:
+    """Persist the chunk-hash manifest atomically.
 
     Args:
-        chunks (List[Dict]): Chunk data from loader.
-        force (bool): Force rebuild even if the index exists.
+        hashes (Dict[str, str]): Mapping chunk_id -> content hash.
+    """
+    path = _get_manifest_path()
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "embedding_model": embeddings.model_id(),
+        "chunks": hashes,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _manifest_is_compatible(manifest: Optional[Dict]) -> bool:
+    """Return True if an incremental update can build on this manifest."""
+    return (
+        manifest is not None
+        and manifest.get("version") == MANIFEST_VERSION
+        and manifest.get("embedding_model") == embeddings.model_id()
+    )
+
+
+def _iter_batches(
+    chunks: Iterable[Dict], batch_size: int
+) -> Iterator[List[Document]]:
+    """Convert a chunk stream into batches of at most `batch_size` Documents."""
+    batch: List[Dict] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield _convert_chunks_to_documents(batch)
+            batch = []
+    if batch:
+        yield _convert_chunks_to_documents(batch)
+
+
+def build_doc_index(
+    chunks: Iterable[Dict],
+    force: bool = False,
+    batch_size: int | None = None,
+) -> Chroma:
+    """Build or incrementally update the Marketplace X documentation index.
+
+    Every chunk is hashed (text + metadata) and the hashes are kept in a
+    manifest next to the index. On rebuild only new or changed chunks are
+    embedded and upserted, and chunks that disappeared are deleted. A full
+    rebuild happens when `force=True`, or when the manifest is missing or was
+    produced with a different embedding model or backend
+    (`embeddings.model_id()`).
+
+    Chunks may be any iterable (e.g. `docs_loader.iter_chunks()`); they are
+    consumed and written in batches, so only one batch is embedded at a time.
+
+    Args:
+        chunks (Iterable[Dict]): Chunk data from loader.
+        force (bool): Drop the existing index and re-embed every chunk.
+        batch_size (int): Chunks per write batch. Defaults to
+            `constants.DOCS_INDEX_BATCH_SIZE`.
 
     Returns:
         Chroma: A persistent Chroma vector store.
     """
     index_dir = _get_index_dir()
+    batches = _iter_batches(
+        chunks, batch_size or constants.DOCS_INDEX_BATCH_SIZE
+    )
 
-    if os.path.exists(index_dir) and not force:
-        logger.info(f"Using existing documentation index at {index_dir}.")
-        return Chroma(
-            persist_directory=index_dir,
-            embedding_function=HuggingFaceEmbeddings(
-                model_name=constants.EMBEDDING_MODEL
-            ),
-        )
+    manifest = _load_manifest()
+    if (
+        os.path.exists(index_dir)
+        and not force
+        and _manifest_is_compatible(manifest)
+    ):
+        return _update_doc_index(batches, manifest["chunks"])
 
     logger.info("Building documentation index...")
 
-    docs = _convert_chunks_to_documents(chunks)
-    embeddings = HuggingFaceEmbeddings(model_name=constants.EMBEDDING_MODEL)
-
+    registry.invalidate(DOCS_STORE_KEY)
     os.makedirs(index_dir, exist_ok=True)
-
-    vectorstore = Chroma.from_documents(
-        documents=docs,
-        embedding=embeddings,
+    vectorstore = Chroma(
         persist_directory=index_dir,
+        embedding_function=registry.get_embeddings(),
     )
+    # Drop the collection rather than the directory: Chroma keeps the
+    # database open for the process, so deleting the files would leave it
+    # read-only.
+    vectorstore.delete_collection()
+    vectorstore = Chroma(
+        persist_directory=index_dir,
+        embedding_function=registry.get_embeddings(),
+    )
+
+    hashes: Dict[str, str] = {}
+    bm25 = BM25Index()
+    with ingest.encoder_pool() as pool:
+        for docs in batches:
+            ids = [d.metadata["chunk_id"] for d in docs]
+            hashes.update(zip(ids, map(_chunk_hash, docs)))
+            ingest.add_documents(vectorstore, docs, ids=ids, pool=pool)
+            bm25.add_documents(docs)
 
     vectorstore.persist()
-    logger.info("Documentation index built and persisted.")
+    _write_manifest(hashes)
+    _save_bm25_index(bm25)
+    logger.info(f"Documentation index built with {len(hashes)} chunks.")
 
+    # Chains hold retrievers bound to the previous store instance.
+    registry.invalidate(registry.CHAIN_PREFIX)
+    answer_cache.invalidate()
+    return registry.register(DOCS_STORE_KEY, vectorstore)
+
+
+def _update_doc_index(
+    batches: Iterable[List[Document]],
+    previous: Dict[str, str],
+) -> Chroma:
+    """Apply a chunk-level diff to the existing index, batch by batch.
+
+    Args:
+        batches (Iterable[List[Document]]): All current chunks, in batches.
+        previous (Dict[str, str]): chunk_id -> hash from the manifest.
+
+    Returns:
+        Chroma: The updated shared vector store.
+    """
+    vectorstore = load_doc_index()
+
+    hashes: Dict[str, str] = {}
+    bm25 = BM25Index()
+    n_changed = 0
+    with ingest.encoder_pool() as pool:
+        for docs in batches:
+            changed: List[Document] = []
+            for doc in docs:
+                chunk_id = doc.metadata["chunk_id"]
+                hashes[chunk_id] = _chunk_hash(doc)
+                if previous.get(chunk_id) != hashes[chunk_id]:
+                    changed.append(doc)
+            if changed:
+                ingest.add_documents(
+                    vectorstore,
+                    changed,
+                    ids=[d.metadata["chunk_id"] for d in changed],
+                    pool=pool,
+                )
+                n_changed += len(changed)
+            bm25.add_documents(docs)
+
+    removed = [chunk_id for chunk_id in previous if chunk_id not in hashes]
+
+    if not n_changed and not removed:
+        if not os.path.exists(_get_bm25_path()):
+            _save_bm25_index(bm25)
+        logger.info("Documentation index is up to date.")
+        return vectorstore
+
+    logger.info(
+        f"Updated documentation index: {n_changed} new/changed, "
+        f"{len(removed)} removed, {len(hashes) - n_changed} unchanged."
+    )
+
+    if removed:
+        vectorstore.delete(ids=removed)
+
+    vectorstore.persist()
+    _write_manifest(hashes)
+    _save_bm25_index(bm25)
+    answer_cache.invalidate()
     return vectorstore
 
 
+def _save_bm25_index(index: BM25Index) -> None:
+    """Persist the BM25 index next to Chroma and share it process-wide.
+
+    Args:
+        index (BM25Index): Index over all current chunks.
+    """
+    index.save(_get_bm25_path())
+    registry.register(BM25_KEY, index)
+
+
+def load_bm25_index() -> Optional[BM25Index]:
+    """Load the persisted BM25 index, shared process-wide.
+
+    Returns:
+        Optional[BM25Index]: The lexical index, or None if it was never built
+        (retrieval then falls back to vector search only).
+    """
+    path = _get_bm25_path()
+    if not os.path.exists(path):
+        return None
+    return registry.get_or_create(BM25_KEY, lambda: BM25Index.load(path))
+
+
 def load_doc_index() -> Chroma:
     """Load the existing Chroma documentation index.
 
+    The store is opened once per process and shared through `app.registry`.
+
     Returns:
         Chroma: Loaded vector store.
 
@@ -122,10 +330,11 @@ def load_doc_index() -> Chroma:
             "Build it first with build_doc_index()."
         )
 
-    return Chroma(
-        persist_directory=index_dir,
-        embedding_function=HuggingFaceEmbeddings(
-            model_name=constants.EMBEDDING_MODEL
+    return registry.get_or_create(
+        DOCS_STORE_KEY,
+        lambda: Chroma(
+            persist_directory=index_dir,
+            embedding_function=registry.get_embeddings(),
         ),
     )
 
@@ -141,3 +350,9 @@ def get_doc_retriever(k: int = 3):
     """
     vectorstore = load_doc_index()
     return vectorstore.as_retriever(search_kwargs={"k": k})
+
+
+if __name__ == "__main__":
+    from app.rag.docs_loader import iter_chunks
+
+    build_doc_index(iter_chunks())
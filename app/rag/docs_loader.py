@@ -9,14 +9,25 @@ This module:
 - Detects sections and subsections based on headings.
 - Splits content into character-based chunks.
 - Produces a standardized schema ready for vector indexing.
+
+Large documentation trees are processed lazily with `iter_chunks`: files are
+discovered by a recursive directory walk, parsed in a process pool and
+yielded chunk by chunk, so memory stays bounded by the number of files in
+flight rather than by the size of the corpus.
 """
 
 from __future__ import annotations
 
+import bisect
+import functools
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
 
 import logging
+import os
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 from app import constants
@@ -30,6 +41,71 @@ def _get_docs_dir() -> Path:
     return Path(constants.SELLER_DOCS_DIR).resolve()
 
 
+def iter_doc_paths(docs_dir: Path | None = None) -> Iterator[Path]:
+    """Walk the docs directory recursively and yield markdown files lazily.
+
+    Directories and files are visited in sorted order so chunk ids are
+    stable between runs.
+
+    Args:
+        docs_dir (Path): Root directory. Defaults to `_get_docs_dir()`.
+
+    Yields:
+        Path: One markdown file at a time.
+    """
+    docs_dir = docs_dir or _get_docs_dir()
+    for root, dirnames, filenames in os.walk(docs_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(".md"):
+                yield Path(root) / filename
+
+
+def _doc_id_for(path: Path, docs_dir: Path) -> str:
+    """Derive a doc_id from a file path ("01_overview.md" -> "overview").
+
+    Files in subdirectories are prefixed with their relative directory
+    ("guides/02_returns.md" -> "guides/returns") to keep ids unique.
+    """
+    stem = path.stem  # ex: "01_overview"
+    parts = stem.split("_", 1)
+    doc_id = parts[1] if len(parts) == 2 else stem
+
+    parent = path.parent.relative_to(docs_dir)
+    if parent.parts:
+        doc_id = f"{parent.as_posix()}/{doc_id}"
+    return doc_id
+
+
+def _read_raw_doc(path: Path, docs_dir: Path) -> Dict:
+    """Read one markdown file into the raw document schema."""
+    return {
+        "doc_id": _doc_id_for(path, docs_dir),
+        "path": str(path),
+        "content": path.read_text(encoding="utf-8"),
+    }
+
+
+def iter_raw_docs(docs_dir: Path | None = None) -> Iterator[Dict]:
+    """Yield raw markdown documents one at a time (see `load_raw_docs`).
+
+    Args:
+        docs_dir (Path): Root directory. Defaults to `_get_docs_dir()`.
+
+    Yields:
+        Dict: {"doc_id", "path", "content"} for each markdown file.
+
+    Raises:
+        FileNotFoundError: If the docs directory does not exist.
+    """
+    docs_dir = docs_dir or _get_docs_dir()
+    if not docs_dir.exists():
+        raise FileNotFoundError(f"Seller docs directory not found: {docs_dir}")
+
+    for path in iter_doc_paths(docs_dir):
+        yield _read_raw_doc(path, docs_dir)
+
+
 def load_raw_docs() -> List[Dict]:
     """Load raw markdown documents from the seller docs directory.
 
@@ -48,40 +124,41 @@ def load_raw_docs() -> List[Dict]:
         FileNotFoundError: If the docs directory does not exist.
         RuntimeError: If no markdown files are found.
     """
-    docs_dir = _get_docs_dir()
-    if not docs_dir.exists():
-        raise FileNotFoundError(f"Seller docs directory not found: {docs_dir}")
+    raw_docs = list(iter_raw_docs())
 
-    raw_docs: List[Dict] = []
+    if not raw_docs:
+        raise RuntimeError(f"No markdown documents found in {_get_docs_dir()}")
 
-    for path in sorted(docs_dir.glob("*.md")):
-        content = path.read_text(encoding="utf-8")
+    return raw_docs
 
-        stem = path.stem  # ex: "01_overview"
-        parts = stem.split("_", 1)
-        doc_id = parts[1] if len(parts) == 2 else stem
 
-        raw_docs.append(
-            {
-                "doc_id": doc_id,
-                "path": str(path),
-                "content": content,
-            }
-        )
+_HEADING_RE = re.compile(r"^[ \t]*(#{1,3}) (.*)$", re.MULTILINE)
 
-    if not raw_docs:
-        raise RuntimeError(f"No markdown documents found in {docs_dir}")
 
-    return raw_docs
+def _line_of(newlines: List[int], pos: int) -> int:
+    """Return the 1-based line number of character `pos`."""
+    return bisect.bisect_left(newlines, pos) + 1
+
+
+def _stripped_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Return the bounds of `text[start:end]` without surrounding whitespace."""
+    segment = text[start:end]
+    left = len(segment) - len(segment.lstrip())
+    right = len(segment.rstrip())
+    return start + left, start + max(right, left)
 
 
 def extract_sections(markdown_text: str) -> List[Dict]:
-    """Extract structured sections from markdown text.
+    """Extract structured sections from markdown text in a single pass.
 
     Identifies:
         - Level-2 headings (## ) → sections
         - Level-3 headings (### ) → subsections
 
+    Headings are found with one multi-line regex scan and section bodies are
+    sliced from the original text, so every section carries exact character
+    and line offsets. Top-level titles (# ) are not part of any section.
+
     If no sections are present, the entire document becomes a single section
     titled "General".
 
@@ -95,73 +172,80 @@ def extract_sections(markdown_text: str) -> List[Dict]:
                     "section": "Delivery Standards",
                     "subsection": "Late Shipments",
                     "text": "...",
+                    "start_char": 1024,
+                    "end_char": 2048,
                     "start_line": 42,
                     "end_line": 78,
                 },
                 ...
             ]
     """
-    lines = markdown_text.splitlines()
-
+    newlines = [m.start() for m in re.finditer("\n", markdown_text)]
     sections: List[Dict] = []
-    current_section: Optional[str] = None
-    current_subsection: Optional[str] = None
-    buffer: List[str] = []
-    start_line: Optional[int] = None
 
-    def flush(end_line: int) -> None:
-        """Store the current buffered section/subsection."""
-        nonlocal buffer, current_section, current_subsection, start_line
-        if current_section and buffer:
+    def add(section: str, subsection: Optional[str], start: int, end: int):
+        start, end = _stripped_span(markdown_text, start, end)
+        if start < end:
             sections.append(
                 {
-                    "section": current_section,
-                    "subsection": current_subsection,
-                    "text": "\n".join(buffer).strip(),
-                    "start_line": start_line or 1,
-                    "end_line": end_line,
+                    "section": section,
+                    "subsection": subsection,
+                    "text": markdown_text[start:end],
+                    "start_char": start,
+                    "end_char": end,
+                    "start_line": _line_of(newlines, start),
+                    "end_line": _line_of(newlines, end - 1),
                 }
             )
-        buffer = []
-        start_line = None
-
-    for line_no, line in enumerate(lines, start=1):
-        stripped = line.strip()
 
-        if stripped.startswith("## "):
-            flush(line_no - 1)
-            current_section = stripped[3:].strip()
-            current_subsection = None
-            start_line = line_no + 1
-            continue
-
-        if stripped.startswith("### "):
-            flush(line_no - 1)
-            current_subsection = stripped[4:].strip()
-            start_line = line_no + 1
-            continue
+    current_section: Optional[str] = None
+    current_subsection: Optional[str] = None
+    body_start = 0
 
-        if stripped.startswith("# "):
-            continue  # Ignore top-level doc title
+    for match in _HEADING_RE.finditer(markdown_text):
+        if current_section:
+            add(current_section, current_subsection, body_start, match.start())
 
-        buffer.append(line)
+        level, title = len(match.group(1)), match.group(2).strip()
+        if level == 2:
+            current_section, current_subsection = title, None
+        elif level == 3:
+            current_subsection = title
+        body_start = match.end()
 
-    flush(len(lines))
+    if current_section:
+        add(current_section, current_subsection, body_start, len(markdown_text))
 
     if not sections:
-        sections.append(
-            {
-                "section": "General",
-                "subsection": None,
-                "text": markdown_text.strip(),
-                "start_line": 1,
-                "end_line": len(lines),
-            }
-        )
+        add("General", None, 0, len(markdown_text))
+        if not sections:
+            sections.append(
+                {
+                    "section": "General",
+                    "subsection": None,
+                    "text": "",
+                    "start_char": 0,
+                    "end_char": 0,
+                    "start_line": 1,
+                    "end_line": 1,
+                }
+            )
 
     return sections
 
 
+@functools.lru_cache(maxsize=None)
+def _get_splitter(
+    chunk_size: int, chunk_overlap: int
+) -> RecursiveCharacterTextSplitter:
+    """Return the shared splitter for one (chunk_size, chunk_overlap) config."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+
+
 def chunk_section(
     section: Dict,
     doc_id: str,
@@ -170,6 +254,9 @@ def chunk_section(
 ) -> List[Dict]:
     """Split a section/subsection into smaller text chunks.
 
+    Each chunk is located in the section text, so its metadata carries its
+    own character offsets (relative to the whole document) and line range.
+
     Args:
         section (Dict): A section block returned by `extract_sections`.
         doc_id (str): Parent document identifier.
@@ -184,32 +271,71 @@ def chunk_section(
     if not text:
         return []
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-    )
-    raw_chunks = splitter.split_text(text)
+    raw_chunks = _get_splitter(chunk_size, chunk_overlap).split_text(text)
+    section_char = section.get("start_char", 0)
+    section_line = section["start_line"]
 
     chunks: List[Dict] = []
-    for chunk_text in raw_chunks:
+    cursor = 0
+    line = section_line
+    line_pos = 0
+    for raw_chunk in raw_chunks:
+        chunk_text = raw_chunk.strip()
+        found = text.find(chunk_text, cursor)
+        start = found if found >= 0 else cursor
+        end = start + len(chunk_text)
+        cursor = start + 1
+
+        # Lines are counted incrementally: chunks only move forward.
+        line += text.count("\n", line_pos, start)
+        line_pos = start
+        start_line = line
+        end_line = start_line + text.count("\n", start, end)
+
         chunks.append(
             {
                 "doc_id": doc_id,
                 "chunk_id": None,  # filled later
-                "text": chunk_text.strip(),
+                "text": chunk_text,
                 "section": section["section"],
                 "subsection": section.get("subsection"),
                 "metadata": {
                     "path": None,  # filled later
-                    "start_line": section["start_line"],
-                    "end_line": section["end_line"],
+                    "start_char": section_char + start,
+                    "end_char": section_char + end,
+                    "start_line": start_line,
+                    "end_line": end_line,
                 },
             }
         )
     return chunks
 
 
+def chunk_raw_doc(raw_doc: Dict) -> List[Dict]:
+    """Chunk one raw document and assign its `chunk_id`s.
+
+    Args:
+        raw_doc (Dict): One entry of `load_raw_docs`.
+
+    Returns:
+        List[Dict]: The document's chunks, with ids "{doc_id}_{001}".
+    """
+    doc_id = raw_doc["doc_id"]
+    path = raw_doc["path"]
+
+    doc_chunks: List[Dict] = []
+    for section in extract_sections(raw_doc["content"]):
+        section_chunks = chunk_section(section, doc_id=doc_id)
+        for chunk in section_chunks:
+            chunk["metadata"]["path"] = path
+        doc_chunks.extend(section_chunks)
+
+    for idx, chunk in enumerate(doc_chunks, start=1):
+        chunk["chunk_id"] = f"{doc_id}_{idx:03d}"
+
+    return doc_chunks
+
+
 def chunk_docs(raw_docs: List[Dict]) -> List[Dict]:
     """Chunk all raw documents into retrieval-friendly chunks.
 
@@ -227,27 +353,64 @@ def chunk_docs(raw_docs: List[Dict]) -> List[Dict]:
     all_chunks: List[Dict] = []
 
     for raw_doc in raw_docs:
-        doc_id = raw_doc["doc_id"]
-        path = raw_doc["path"]
+        all_chunks.extend(chunk_raw_doc(raw_doc))
 
-        sections = extract_sections(raw_doc["content"])
+    if not all_chunks:
+        raise RuntimeError("No chunks generated from seller documentation.")
 
-        doc_chunks: List[Dict] = []
-        for section in sections:
-            section_chunks = chunk_section(section, doc_id=doc_id)
-            for chunk in section_chunks:
-                chunk["metadata"]["path"] = path
-            doc_chunks.extend(section_chunks)
+    return all_chunks
 
-        for idx, chunk in enumerate(doc_chunks, start=1):
-            chunk["chunk_id"] = f"{doc_id}_{idx:03d}"
 
-        all_chunks.extend(doc_chunks)
+def _chunk_file(path: str, docs_dir: str) -> List[Dict]:
+    """Read and chunk one file (process-pool worker entry point)."""
+    return chunk_raw_doc(_read_raw_doc(Path(path), Path(docs_dir)))
 
-    if not all_chunks:
-        raise RuntimeError("No chunks generated from seller documentation.")
 
-    return all_chunks
+def iter_chunks(
+    docs_dir: Path | None = None,
+    num_workers: int | None = None,
+) -> Iterator[Dict]:
+    """Stream chunks for a documentation tree of any size.
+
+    Files are parsed and chunked in a process pool. At most
+    `2 * num_workers` files are in flight at once and results are yielded in
+    walk order, so memory stays flat regardless of corpus size.
+
+    Args:
+        docs_dir (Path): Root directory. Defaults to `_get_docs_dir()`.
+        num_workers (int): Parser processes. Defaults to
+            `constants.DOCS_PARSE_WORKERS` (one per CPU core when None).
+            With 1, files are parsed in-process.
+
+    Yields:
+        Dict: Chunks in the schema of `chunk_docs`.
+
+    Raises:
+        FileNotFoundError: If the docs directory does not exist.
+    """
+    docs_dir = docs_dir or _get_docs_dir()
+    if not docs_dir.exists():
+        raise FileNotFoundError(f"Seller docs directory not found: {docs_dir}")
+
+    num_workers = (
+        num_workers or constants.DOCS_PARSE_WORKERS or os.cpu_count() or 1
+    )
+    paths = iter_doc_paths(docs_dir)
+
+    if num_workers == 1:
+        for path in paths:
+            yield from _chunk_file(str(path), str(docs_dir))
+        return
+
+    max_in_flight = 2 * num_workers
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        pending: Deque[Future] = deque()
+        for path in paths:
+            pending.append(pool.submit(_chunk_file, str(path), str(docs_dir)))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
 
 
 def load_and_chunk_docs() -> List[Dict]:
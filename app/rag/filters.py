@@ -0,0 +1,193 @@
+"""
+Module: filters.py
+------------------
+Structured metadata filters for retrieval.
+
+A filter is a plain dict keyed by chunk metadata field:
+- scalar value      -> equality           {"category": "Garden"}
+- list of values    -> membership         {"doc_id": ["penalties", "logistics"]}
+- {"min", "max"}    -> inclusive range    {"price": {"max": 50}}
+- {"not_in": [...]} -> exclusion          {"doc_id": {"not_in": ["penalties"]}}
+
+The same filter is translated to a Chroma `where` clause (so dense search
+only touches matching vectors) and evaluated in Python for BM25 results.
+Product filters (category, price range) can also be extracted from the
+question itself.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+import logging
+
+from app import constants
+
+
+logger = logging.getLogger(__name__)
+
+Filters = Dict[str, Any]
+
+_NUMBER = r"(\d+(?:[.,]\d+)?)"
+_CURRENCY = r"(?:€|\$|\beuros?\b|\beur\b)"
+_PRICE_WORDS = r"\b(?:price|priced|prices|cost|costs|costing)"
+_PRICE_CONTEXT_RE = re.compile(
+    rf"{_CURRENCY}|\b(?:price|priced|cost|costs|cheap|cheaper|budget)\b"
+)
+_BETWEEN_RE = re.compile(
+    rf"\bbetween\s*[€$]?\s*{_NUMBER}\s*{_CURRENCY}?\s*and\s*[€$]?\s*{_NUMBER}"
+)
+_MAX_RE = re.compile(
+    rf"\b(?:under|below|less than|cheaper than|at most|up to)\s*[€$]?\s*{_NUMBER}"
+)
+# "from" is only a lower bound next to a currency or a price word, so
+# "shipping from 3 warehouses" or "returns from 2023" are not prices.
+_MIN_RE = re.compile(
+    rf"\b(?:over|above|more than|at least)\s*[€$]?\s*{_NUMBER}"
+    rf"|\bfrom\s*[€$]\s*{_NUMBER}"
+    rf"|\bfrom\s*{_NUMBER}\s*{_CURRENCY}"
+    rf"|{_PRICE_WORDS}\s+from\s*[€$]?\s*{_NUMBER}"
+)
+
+
+def _to_float(raw: str) -> float:
+    """Parse a price that may use a decimal comma."""
+    return float(raw.replace(",", "."))
+
+
+def _extract_price_range(text: str) -> Dict[str, float]:
+    """Extract {"min", "max"} price bounds from a lower-cased question."""
+    between = _BETWEEN_RE.search(text)
+    if between:
+        low, high = sorted(map(_to_float, between.groups()))
+        return {"min": low, "max": high}
+
+    price: Dict[str, float] = {}
+    if (upper := _MAX_RE.search(text)) is not None:
+        price["max"] = _to_float(upper.group(1))
+    if (lower := _MIN_RE.search(text)) is not None:
+        price["min"] = _to_float(next(g for g in lower.groups() if g))
+    return price
+
+
+def _clause(field: str, value: Any) -> List[Dict[str, Any]]:
+    """Translate one filter entry into Chroma where clauses."""
+    if isinstance(value, dict):
+        clauses = []
+        if value.get("not_in"):
+            clauses.append({field: {"$nin": list(value["not_in"])}})
+        if value.get("min") is not None:
+            clauses.append({field: {"$gte": value["min"]}})
+        if value.get("max") is not None:
+            clauses.append({field: {"$lte": value["max"]}})
+        return clauses
+    if isinstance(value, (list, tuple, set)):
+        return [{field: {"$in": list(value)}}]
+    return [{field: {"$eq": value}}]
+
+
+def to_chroma_where(filters: Optional[Filters]) -> Optional[Dict[str, Any]]:
+    """Translate a filter dict into a Chroma `where` clause.
+
+    Args:
+        filters: Metadata filter (see module docstring), or None.
+
+    Returns:
+        The `where` dict, or None when there is nothing to filter on.
+    """
+    clauses = [
+        clause
+        for field, value in (filters or {}).items()
+        for clause in _clause(field, value)
+    ]
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def matches(metadata: Dict[str, Any], filters: Optional[Filters]) -> bool:
+    """Return True if chunk metadata satisfies a filter dict.
+
+    Args:
+        metadata: Chunk metadata.
+        filters: Metadata filter (see module docstring), or None.
+    """
+    for field, value in (filters or {}).items():
+        actual = metadata.get(field)
+        if isinstance(value, dict):
+            if actual in value.get("not_in", ()):
+                return False
+            if "min" not in value and "max" not in value:
+                continue
+            if actual is None:
+                return False
+            if value.get("min") is not None and actual < value["min"]:
+                return False
+            if value.get("max") is not None and actual > value["max"]:
+                return False
+        elif isinstance(value, (list, tuple, set)):
+            if actual not in value:
+                return False
+        elif actual != value:
+            return False
+    return True
+
+
+def merge(*filters: Optional[Filters]) -> Filters:
+    """Combine filters left to right; later filters override earlier keys."""
+    merged: Filters = {}
+    for f in filters:
+        merged.update(f or {})
+    return merged
+
+
+def cache_key(filters: Optional[Filters]) -> str:
+    """Return a stable string for a filter, used in answer-cache namespaces."""
+    return json.dumps(filters or {}, sort_keys=True, default=str)
+
+
+def extract_product_filters(question: str) -> Filters:
+    """Extract a category and price range from a product question.
+
+    Examples:
+        "garden chairs under 30 euros" -> {"category": "Garden",
+                                           "price": {"max": 30.0}}
+        "electronics priced between 50 and 100" -> {"category": "Electronics",
+                                                    "price": {"min": 50.0,
+                                                              "max": 100.0}}
+
+    Price bounds are only read when the question talks about prices
+    (a currency, "price", "cost", "cheap", ...), so "rated above 4" is
+    not mistaken for a price.
+
+    Args:
+        question: User question.
+
+    Returns:
+        Filters found in the question (possibly empty).
+    """
+    text = question.lower()
+    filters: Filters = {}
+
+    categories = [
+        c
+        for c in constants.PRODUCT_CATEGORIES
+        if re.search(rf"\b{re.escape(c.lower())}\b", text)
+    ]
+    if len(categories) == 1:
+        filters["category"] = categories[0]
+    elif categories:
+        filters["category"] = categories
+
+    if _PRICE_CONTEXT_RE.search(text):
+        price = _extract_price_range(text)
+        if price:
+            filters["price"] = price
+
+    if filters:
+        logger.info(f"Extracted product filters: {filters}")
+    return filters
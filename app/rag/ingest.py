@@ -0,0 +1,245 @@
+"""
+Module: ingest.py
+-----------------
+Batched embedding and bulk Chroma ingestion for index builds.
+
+`Chroma.from_documents` embeds everything through one opaque call. This module
+gives index builds control over throughput instead:
+- Texts are sorted by length so each encoder batch pads to similar sizes
+- Encoding runs in large configurable batches, optionally across a
+  multi-process sentence-transformers pool (one worker per CPU core),
+  opened once per index build with `encoder_pool()`
+- Vectors are written with bulk Chroma upserts in sized batches
+- Throughput is logged and returned in docs/sec
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import logging
+from langchain.schema import Document
+
+from app import constants, registry
+
+
+logger = logging.getLogger(__name__)
+
+
+def _batched(items: Sequence[Any], size: int) -> Iterable[Sequence[Any]]:
+    """Yield consecutive slices of at most `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class EncoderPool:
+    """sentence-transformers multi-process pool shared by an index build.
+
+    The worker processes each load the model, so they are started on the
+    first `encode` call and kept until `close`, instead of once per batch.
+    """
+
+    def __init__(self, client: Any, num_workers: int, normalize: bool) -> None:
+        self.client = client
+        self.num_workers = num_workers
+        self.normalize = normalize
+        self._pool: Any = None
+
+    def encode(self, texts: List[str], batch_size: int) -> List[List[float]]:
+        """Encode texts across the worker processes, in input order."""
+        if self._pool is None:
+            self._pool = self.client.start_multi_process_pool(
+                target_devices=["cpu"] * self.num_workers
+            )
+        vectors = self.client.encode_multi_process(
+            texts,
+            self._pool,
+            batch_size=batch_size,
+            normalize_embeddings=self.normalize,
+        )
+        return [v.tolist() for v in vectors]
+
+    def close(self) -> None:
+        """Stop the worker processes, if they were started."""
+        if self._pool is not None:
+            self.client.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+
+@contextmanager
+def encoder_pool(
+    embeddings: Any | None = None, num_workers: int | None = None
+) -> Iterator[Optional[EncoderPool]]:
+    """Open one encoder process pool for a whole index build.
+
+    Args:
+        embeddings: LangChain embeddings wrapper. Defaults to the shared
+            model.
+        num_workers: Encoder processes. Defaults to
+            `constants.EMBED_NUM_WORKERS`.
+
+    Yields:
+        The pool to pass to `add_documents`, or None with a single worker
+        or a backend without a process pool (e.g. ONNX).
+    """
+    num_workers = num_workers or constants.EMBED_NUM_WORKERS
+    if num_workers <= 1:
+        yield None
+        return
+
+    embeddings = embeddings or registry.get_embeddings()
+    client = getattr(embeddings, "client", None)
+    if client is None or not hasattr(client, "start_multi_process_pool"):
+        yield None
+        return
+
+    encode_kwargs = getattr(embeddings, "encode_kwargs", {}) or {}
+    pool = EncoderPool(
+        client,
+        num_workers,
+        normalize=encode_kwargs.get("normalize_embeddings", False),
+    )
+    try:
+        yield pool
+    finally:
+        pool.close()
+
+
+def embed_texts(
+    texts: List[str],
+    embeddings: Any | None = None,
+    batch_size: int | None = None,
+    num_workers: int | None = None,
+    pool: EncoderPool | None = None,
+) -> List[List[float]]:
+    """Embed texts in length-sorted batches.
+
+    Args:
+        texts: Texts to embed.
+        embeddings: Embeddings implementation. Defaults to the shared model.
+        batch_size: Texts per encoder call. Defaults to
+            `constants.EMBED_BATCH_SIZE`.
+        num_workers: Encoder processes. Defaults to
+            `constants.EMBED_NUM_WORKERS`. Values above 1 use a
+            sentence-transformers multi-process pool when available.
+        pool: Process pool from `encoder_pool()`, shared across calls.
+            Without one, a pool is opened for this call only.
+
+    Returns:
+        List[List[float]]: One vector per input text, in input order.
+    """
+    embeddings = embeddings or registry.get_embeddings()
+    batch_size = batch_size or constants.EMBED_BATCH_SIZE
+    num_workers = num_workers or constants.EMBED_NUM_WORKERS
+
+    if not texts:
+        return []
+
+    # Sorting by length keeps padding per batch to a minimum.
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    sorted_texts = [texts[i] for i in order]
+
+    vectors = None
+    if pool is not None:
+        vectors = pool.encode(sorted_texts, batch_size)
+    elif num_workers > 1:
+        with encoder_pool(embeddings, num_workers) as one_off:
+            if one_off is not None:
+                vectors = one_off.encode(sorted_texts, batch_size)
+    if vectors is None:
+        vectors = []
+        for batch in _batched(sorted_texts, batch_size):
+            vectors.extend(embeddings.embed_documents(list(batch)))
+
+    result: List[List[float]] = [[] for _ in texts]
+    for position, index in enumerate(order):
+        result[index] = vectors[position]
+    return result
+
+
+def _upsert_batch(
+    collection: Any,
+    ids: List[str],
+    vectors: List[List[float]],
+    docs: List[Document],
+) -> None:
+    """Upsert one batch into a Chroma collection.
+
+    Chroma rejects None metadata values and empty metadata dicts, so None
+    values are dropped and documents without metadata go in a separate call.
+    """
+    with_meta: List[int] = []
+    without_meta: List[int] = []
+    metadatas = []
+    for i, doc in enumerate(docs):
+        meta = {k: v for k, v in doc.metadata.items() if v is not None}
+        metadatas.append(meta)
+        (with_meta if meta else without_meta).append(i)
+
+    for group in (with_meta, without_meta):
+        if not group:
+            continue
+        collection.upsert(
+            ids=[ids[i] for i in group],
+            embeddings=[vectors[i] for i in group],
+            documents=[docs[i].page_content for i in group],
+            metadatas=[metadatas[i] for i in group]
+            if group is with_meta
+            else None,
+        )
+
+
+def add_documents(
+    vectorstore: Any,
+    docs: List[Document],
+    ids: List[str],
+    embeddings: Any | None = None,
+    batch_size: int | None = None,
+    num_workers: int | None = None,
+    add_batch_size: int | None = None,
+    pool: EncoderPool | None = None,
+) -> Dict[str, float]:
+    """Embed documents and upsert them into a Chroma store in bulk.
+
+    Args:
+        vectorstore: LangChain Chroma store to write into.
+        docs: Documents to index.
+        ids: One unique id per document.
+        embeddings: Embeddings implementation. Defaults to the shared model.
+        batch_size: Encoder batch size (see `embed_texts`).
+        num_workers: Encoder processes (see `embed_texts`).
+        add_batch_size: Documents per Chroma upsert. Defaults to
+            `constants.CHROMA_ADD_BATCH_SIZE`.
+        pool: Process pool from `encoder_pool()` (see `embed_texts`).
+
+    Returns:
+        dict: {"docs": int, "seconds": float, "docs_per_sec": float}
+    """
+    add_batch_size = add_batch_size or constants.CHROMA_ADD_BATCH_SIZE
+    start = time.perf_counter()
+
+    vectors = embed_texts(
+        [d.page_content for d in docs],
+        embeddings=embeddings,
+        batch_size=batch_size,
+        num_workers=num_workers,
+        pool=pool,
+    )
+
+    for offset in range(0, len(docs), add_batch_size):
+        end = offset + add_batch_size
+        _upsert_batch(
+            vectorstore._collection,
+            ids[offset:end],
+            vectors[offset:end],
+            docs[offset:end],
+        )
+
+    seconds = time.perf_counter() - start
+    rate = len(docs) / seconds if seconds > 0 else float("inf")
+    logger.info(
+        f"Indexed {len(docs)} documents in {seconds:.2f}s ({rate:.1f} docs/sec)"
+    )
+    return {"docs": len(docs), "seconds": seconds, "docs_per_sec": rate}
@@ -0,0 +1,154 @@
+"""
+Module: rerank.py
+-----------------
+CPU cross-encoder reranking of retrieved chunks.
+
+Retrieval returns a wide candidate set; a small local cross-encoder scores
+each (question, chunk) pair jointly and only the top-N go into the prompt.
+Fewer, more relevant chunks mean shorter prompts and faster generation.
+
+Reranking is skipped (candidates are kept in retrieval order) when:
+- the request has already spent its latency budget before reranking, or
+  by the time the model is loaded (`registry.warm_up` preloads it)
+- the cross-encoder cannot be loaded (or torch is disabled); the failure is
+  remembered, so later requests do not retry the import or download
+
+When the remaining budget does not cover every candidate (at the measured
+cost per pair), only the leading candidates are scored.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, List
+
+import logging
+from langchain.schema import Document
+
+from app import constants, registry
+
+
+logger = logging.getLogger(__name__)
+
+CROSS_ENCODER_KEY = "reranker:cross_encoder"
+
+# Moving average of the cross-encoder's cost per (question, chunk) pair.
+_pair_ms = {"estimate": constants.RERANK_PAIR_MS}
+
+
+class _Unavailable:
+    """Registry placeholder for a cross-encoder that failed to load."""
+
+    def __init__(self, reason: str) -> None:
+        self.reason = reason
+
+
+def get_cross_encoder() -> Any:
+    """Return the shared CPU cross-encoder, loading it on first use.
+
+    A failed load is cached as well, until `registry.invalidate()`.
+
+    Returns:
+        CrossEncoder: sentence-transformers cross-encoder for
+        `constants.RERANK_MODEL`.
+
+    Raises:
+        RuntimeError: If the model could not be loaded.
+    """
+
+    def _build() -> Any:
+        try:
+            if not constants.TORCH_ENABLED:
+                raise RuntimeError("torch is disabled (TORCH_ENABLED=0)")
+
+            from sentence_transformers import CrossEncoder
+
+            return CrossEncoder(constants.RERANK_MODEL, device="cpu")
+        except Exception as e:
+            logger.warning(f"Cross-encoder unavailable, not reranking: {e}")
+            return _Unavailable(str(e))
+
+    model = registry.get_or_create(CROSS_ENCODER_KEY, _build)
+    if isinstance(model, _Unavailable):
+        raise RuntimeError(f"cross-encoder unavailable: {model.reason}")
+    return model
+
+
+def _budget_spent(started_at: float | None, budget_ms: float) -> bool:
+    """Return True (and log it) if a request has used up its budget."""
+    if started_at is None:
+        return False
+    spent_ms = (time.perf_counter() - started_at) * 1000
+    if spent_ms < budget_ms:
+        return False
+    logger.info(
+        f"Skipping rerank: {spent_ms:.0f}ms spent, budget {budget_ms}ms"
+    )
+    return True
+
+
+def rerank(
+    question: str,
+    docs: List[Document],
+    top_n: int,
+    started_at: float | None = None,
+    budget_ms: float | None = None,
+) -> List[Document]:
+    """Reorder candidates by cross-encoder score and keep the top-N.
+
+    Args:
+        question: User question.
+        docs: Candidate chunks, in retrieval order.
+        top_n: Number of chunks to keep.
+        started_at: `time.perf_counter()` at the start of the request.
+        budget_ms: Latency budget in milliseconds. Defaults to
+            `constants.RERANK_BUDGET_MS`.
+
+    Returns:
+        The top-N chunks, reranked when the budget allows. Candidates the
+        budget did not cover follow the scored ones in retrieval order.
+    """
+    if len(docs) <= 1:
+        return docs[:top_n]
+
+    budget_ms = constants.RERANK_BUDGET_MS if budget_ms is None else budget_ms
+    if _budget_spent(started_at, budget_ms):
+        return docs[:top_n]
+
+    try:
+        model = get_cross_encoder()
+    except Exception as e:
+        logger.debug(f"Skipping rerank: {e}")
+        return docs[:top_n]
+
+    # Loading the model on first use can take seconds: re-check the budget.
+    if _budget_spent(started_at, budget_ms):
+        return docs[:top_n]
+
+    # Score only as many leading candidates as the remaining budget allows.
+    n_scored = len(docs)
+    if started_at is not None and _pair_ms["estimate"] > 0:
+        remaining_ms = budget_ms - (time.perf_counter() - started_at) * 1000
+        n_scored = min(n_scored, int(remaining_ms / _pair_ms["estimate"]))
+        if n_scored <= 1:
+            logger.info(f"Skipping rerank: {remaining_ms:.0f}ms left")
+            return docs[:top_n]
+        if n_scored < len(docs):
+            logger.info(
+                f"Reranking {n_scored}/{len(docs)} candidates within budget"
+            )
+
+    head, tail = docs[:n_scored], docs[n_scored:]
+    start = time.perf_counter()
+    scores = model.predict(
+        [(question, d.page_content) for d in head],
+        batch_size=constants.RERANK_BATCH_SIZE,
+        show_progress_bar=False,
+    )
+    pair_ms = (time.perf_counter() - start) * 1000 / len(head)
+    _pair_ms["estimate"] = 0.8 * _pair_ms["estimate"] + 0.2 * pair_ms
+
+    order = sorted(
+        range(len(head)), key=lambda i: float(scores[i]), reverse=True
+    )
+    return ([head[i] for i in order] + tail)[:top_n]
@@ -9,7 +9,9 @@ Enable the LLM to ground its responses in internal product documentation
 by retrieving relevant text chunks before generation.
 """
 
-from typing import Any, Dict, List
+import asyncio
+import json
+from typing import Any, Dict, Iterator, List, Tuple
 
 import logging
 import os
@@ -17,11 +19,87 @@ import pandas as pd
 from langchain.chains import RetrievalQA
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-from app import constants
+from app import (
+    answer_cache,
+    concurrency,
+    constants,
+    embeddings,
+    registry,
+    tracing,
+)
+from app.rag import filters as metadata_filters, ingest
+from app.rag.context import PRODUCT_GROUP_KEYS, PackedRetriever, token_budget
+from app.rag.filters import Filters
 
 
 logger = logging.getLogger(__name__)
 
+PRODUCTS_STORE_KEY = f"{registry.VECTORSTORE_PREFIX}products"
+PRODUCTS_CHAIN_KEY = f"{registry.CHAIN_PREFIX}products"
+
+
+def _format_products(df: pd.DataFrame) -> pd.Series:
+    """Render one descriptive text block per product with column-wise ops.
+
+    Args:
+        df (pd.DataFrame): Product rows.
+
+    Returns:
+        pd.Series: One formatted product description per row.
+    """
+    return (
+        "Product ID: "
+        + df["product_id"].astype(str)
+        + "\nName: "
+        + df["name"].astype(str)
+        + "\nCategory: "
+        + df["category"].astype(str)
+        + "\nPrice: "
+        + df["price"].astype(str)
+        + " euros\nAverage rating: "
+        + df["avg_rating"].astype(str)
+        + "\nReturn rate: "
+        + df["return_rate"].astype(str)
+        + "\nDelivery estimate: "
+        + df["delivery_estimate_days"].astype(str)
+        + " days\nDescription: "
+        + df["description"].astype(str)
+    )
+
+
+def _product_metadata(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Extract filterable metadata for each product.
+
+    Args:
+        df (pd.DataFrame): Product rows.
+
+    Returns:
+        List[dict]: One metadata dict per row with `product_id`, `category`,
+        `price`, `avg_rating`, `return_rate`, `delivery_estimate_days` and
+        `stock_qty` (missing values dropped). These are the fields retrieval
+        filters can target (see `app.rag.filters`).
+    """
+    meta = pd.DataFrame(
+        {
+            "product_id": df["product_id"].astype(str),
+            "category": df["category"].astype(str),
+            "price": pd.to_numeric(df["price"], errors="coerce"),
+            "avg_rating": pd.to_numeric(df["avg_rating"], errors="coerce"),
+            "return_rate": pd.to_numeric(df["return_rate"], errors="coerce"),
+            "delivery_estimate_days": pd.to_numeric(
+                df["delivery_estimate_days"], errors="coerce"
+            ),
+            "stock_qty": pd.to_numeric(
+                df.get("stock_qty", pd.Series(index=df.index, dtype=float)),
+                errors="coerce",
+            ),
+        }
+    )
+    return [
+        {k: v for k, v in record.items() if not pd.isna(v)}
+        for record in meta.to_dict("records")
+    ]
+
 
 def load_documents() -> List[str]:
     """
@@ -36,21 +114,57 @@ def load_documents() -> List[str]:
         represents a product document ready for embedding (one per product).
     """
     df = pd.read_csv(constants.PRODUCTS_PATH)
-    docs = []
-
-    for _, row in df.iterrows():
-        text = (
-            f"Product ID: {row['product_id']}\n"
-            f"Name: {row['name']}\n"
-            f"Category: {row['category']}\n"
-            f"Price: {row['price']} euros\n"
-            f"Average rating: {row['avg_rating']}\n"
-            f"Return rate: {row['return_rate']}\n"
-            f"Delivery estimate: {row['delivery_estimate_days']} days\n"
-            f"Description: {row['description']}"
+    return _format_products(df).tolist()
+
+
+def iter_product_batches(
+    batch_size: int | None = None,
+) -> Iterator[List[Tuple[str, str, Dict[str, Any]]]]:
+    """
+    Stream product documents from the catalog CSV in fixed-size batches.
+
+    Only one batch of rows and texts is held in memory at a time, so large
+    catalogs can be fed straight into the embedding stage.
+
+    Args:
+        batch_size (int): Products per batch. Defaults to
+            `constants.PRODUCTS_BATCH_SIZE`.
+
+    Yields:
+        List[Tuple[str, str, dict]]: `(product_id, text, metadata)` triples.
+    """
+    batch_size = batch_size or constants.PRODUCTS_BATCH_SIZE
+    for df in pd.read_csv(constants.PRODUCTS_PATH, chunksize=batch_size):
+        yield list(
+            zip(
+                df["product_id"].astype(str),
+                _format_products(df),
+                _product_metadata(df),
+            )
         )
-        docs.append(text)
-    return docs
+
+
+def _get_manifest_path() -> str:
+    """Return the path of the manifest stored next to the product store."""
+    return f"{constants.CHROMA_DIR.rstrip('/')}_manifest.json"
+
+
+def _stored_model_id() -> str | None:
+    """Return the embedding model the product store was built with, if known."""
+    path = _get_manifest_path()
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("embedding_model")
+
+
+def _write_manifest() -> None:
+    """Record the embedding model of the product store atomically."""
+    path = _get_manifest_path()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"embedding_model": embeddings.model_id()}, f, indent=2)
+    os.replace(tmp_path, path)
 
 
 def build_vectorstore(force_rebuild: bool = False) -> Any:
@@ -58,14 +172,27 @@ def build_vectorstore(force_rebuild: bool = False) -> Any:
     Build or load a Chroma vector store containing product embeddings.
 
     Process:
-    1. Each product is transformed into a text document (via `load_documents`).
+    1. Products are streamed from the catalog in batches and formatted into
+       text documents with filterable metadata (via `iter_product_batches`).
     2. Documents are split into smaller text units ("chunks") using
        `RecursiveCharacterTextSplitter`. This improves retrieval granularity:
        - avoids exceeding context limits,
        - allows retrieval of only the relevant fragment of a long document.
     3. Each chunk is embedded into a high-dimensional vector using a
-       pre-trained sentence-transformer model.
-    4. All embeddings are stored in ChromaDB for semantic search.
+       pre-trained sentence-transformer model, in length-sorted batches,
+       on the configured embedding backend (see `app.embeddings`).
+    4. All embeddings are upserted into ChromaDB in bulk for semantic search.
+
+    The loaded store is shared process-wide through `app.registry`, so only
+    the first call per process pays for opening Chroma and loading the
+    embedding model.
+
+    A rebuild drops the existing index first, so products removed from the
+    catalog (or trailing chunks of shortened descriptions) do not linger.
+
+    The embedding model (`embeddings.model_id()`) is recorded in a manifest
+    next to the store; a store without one, or built with another model or
+    backend, is rebuilt instead of being queried with incompatible vectors.
 
     Args:
         force_rebuild (bool): If True, rebuilds the index from scratch even if it exists.
@@ -73,80 +200,158 @@ def build_vectorstore(force_rebuild: bool = False) -> Any:
     Returns:
         Chroma: Persisted Chroma vector store instance.
     """
-    from langchain_community.embeddings.huggingface import HuggingFaceEmbeddings
     from langchain_community.vectorstores.chroma import Chroma
 
     if os.path.exists(constants.CHROMA_DIR) and not force_rebuild:
-        logger.info("Using existing Chroma index.")
-        return Chroma(
-            persist_directory=constants.CHROMA_DIR,
-            embedding_function=HuggingFaceEmbeddings(
-                model_name=constants.EMBEDDING_MODEL
-            ),
+        stored_model = _stored_model_id()
+        if stored_model == embeddings.model_id():
+            return registry.get_or_create(
+                PRODUCTS_STORE_KEY,
+                lambda: Chroma(
+                    persist_directory=constants.CHROMA_DIR,
+                    embedding_function=registry.get_embeddings(),
+                ),
+            )
+        logger.info(
+            f"Product store was built with embedding model {stored_model}, "
+            f"not {embeddings.model_id()}; rebuilding."
         )
 
     logger.info("Building new Chroma index...")
-    docs = load_documents()
-
     splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.create_documents(docs)
 
-    embeddings = HuggingFaceEmbeddings(model_name=constants.EMBEDDING_MODEL)
+    registry.invalidate(PRODUCTS_STORE_KEY)
     os.makedirs(constants.CHROMA_DIR, exist_ok=True)
-    vectorstore = Chroma.from_documents(
-        chunks, embedding=embeddings, persist_directory=constants.CHROMA_DIR
+    vectorstore = Chroma(
+        persist_directory=constants.CHROMA_DIR,
+        embedding_function=registry.get_embeddings(),
+    )
+    # Drop the collection rather than the directory: Chroma keeps the
+    # database open for the process, so deleting the files would leave it
+    # read-only.
+    vectorstore.delete_collection()
+    vectorstore = Chroma(
+        persist_directory=constants.CHROMA_DIR,
+        embedding_function=registry.get_embeddings(),
     )
+
+    with ingest.encoder_pool() as pool:
+        for batch in iter_product_batches():
+            _, texts, metadatas = zip(*batch)
+            chunks = splitter.create_documents(list(texts), list(metadatas))
+            ids = _chunk_ids(chunks)
+            ingest.add_documents(vectorstore, chunks, ids=ids, pool=pool)
+
     vectorstore.persist()
+    _write_manifest()
     logger.info("Chroma index built and saved.")
-    return vectorstore
 
+    registry.invalidate(PRODUCTS_CHAIN_KEY)
+    answer_cache.invalidate()
+    return registry.register(PRODUCTS_STORE_KEY, vectorstore)
 
-def get_rag_chain() -> RetrievalQA:
+
+def _chunk_ids(chunks: List[Any]) -> List[str]:
+    """Build stable chunk ids of the form "{product_id}_{n}".
+
+    Args:
+        chunks (List[Document]): Split product chunks, in product order.
+
+    Returns:
+        List[str]: One id per chunk.
     """
-    Create a RetrievalQA chain combining:
-      - Chroma retriever for semantic search
-      - Mistral model for answer generation
+    ids: List[str] = []
+    counts: Dict[str, int] = {}
+    for chunk in chunks:
+        product_id = chunk.metadata["product_id"]
+        counts[product_id] = counts.get(product_id, 0) + 1
+        ids.append(f"{product_id}_{counts[product_id]}")
+    return ids
+
 
-    The retriever fetches the k most relevant chunks, and the model synthesizes
-    a grounded response using that context.
+def _build_rag_chain(filters: Filters | None = None) -> RetrievalQA:
+    """Build a RetrievalQA chain, optionally restricted by a metadata filter.
+
+    Args:
+        filters (dict): Optional product filter, e.g.
+            {"category": "Garden", "price": {"max": 30}}.
 
     Returns:
         RetrievalQA: Configured LangChain RAG chain.
     """
-    from langchain_community.llms import Ollama
-
     vectorstore = build_vectorstore()
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-    llm = Ollama(
-        model=constants.LLM_MODEL_RAG, temperature=constants.TEMPERATURE_RAG
+    search_kwargs: Dict[str, Any] = {"k": 3}
+    where = metadata_filters.to_chroma_where(filters)
+    if where is not None:
+        search_kwargs["filter"] = where
+
+    retriever = PackedRetriever(
+        retriever=vectorstore.as_retriever(search_kwargs=search_kwargs),
+        max_tokens=token_budget(constants.LLM_MODEL_RAG),
+        group_keys=PRODUCT_GROUP_KEYS,
     )
+    llm = registry.get_llm(constants.LLM_MODEL_RAG, constants.TEMPERATURE_RAG)
 
-    qa_chain = RetrievalQA.from_chain_type(
+    return RetrievalQA.from_chain_type(
         llm=llm,
         retriever=retriever,
         chain_type="stuff",
         return_source_documents=True,
     )
-    return qa_chain
 
 
-def query(question: str) -> Dict[str, Any]:
+def get_rag_chain() -> RetrievalQA:
+    """
+    Create a RetrievalQA chain combining:
+      - Chroma retriever for semantic search
+      - Mistral model for answer generation
+
+    The retriever fetches the k most relevant chunks, merges overlapping chunks
+    of the same product and packs them to the model's context token budget
+    (see `app.rag.context`); the model then synthesizes a grounded response
+    using that context. The compiled chain is cached in `app.registry` and
+    reused across requests.
+
+    Returns:
+        RetrievalQA: Configured LangChain RAG chain.
+    """
+    return registry.get_or_create(PRODUCTS_CHAIN_KEY, _build_rag_chain)
+
+
+def _get_chain(filters: Filters | None) -> RetrievalQA:
+    """Return the chain for a filter.
+
+    Unfiltered queries share the cached chain; filtered ones get a retriever
+    bound to their `where` clause (store and LLM are shared).
+    """
+    return _build_rag_chain(filters) if filters else get_rag_chain()
+
+
+def query(question: str, filters: Filters | None = None) -> Dict[str, Any]:
     """
     Execute a user query through the RAG pipeline.
 
     Steps:
-    1. Retrieve top-k relevant chunks from ChromaDB.
+    1. Retrieve top-k relevant chunks from ChromaDB, restricted to products
+       matching the metadata filter (category, price range, ...).
     2. Inject them into Mistral's context window.
     3. Generate a concise, grounded answer.
 
     Args:
         question (str): User question in natural language.
+        filters (dict): Optional product filter. When omitted, a category
+            and price range are extracted from the question itself.
 
     Returns:
         dict: Full LangChain response (answer + retrieved source documents).
     """
-    chain = get_rag_chain()
-    response = chain({"query": question})
+    if filters is None:
+        filters = metadata_filters.extract_product_filters(question)
+
+    chain = _get_chain(filters)
+    # Covers retrieval + packing (their own spans) and the LLM call.
+    with tracing.span("rag_chain"):
+        response = chain({"query": question})
     # Convert LangChain Document objects to dicts to ensure JSON-serializable response
     if "source_documents" in response:
         response["source_documents"] = [
@@ -157,5 +362,45 @@ def query(question: str) -> Dict[str, Any]:
     return response
 
 
+async def aquery(
+    question: str, filters: Filters | None = None
+) -> Dict[str, Any]:
+    """
+    Async variant of `query`.
+
+    Chain setup and retrieval (Chroma, sync) run in worker threads; only
+    generation holds a slot of the shared LLM limiter, so questions waiting
+    for the LLM do not keep others from retrieving.
+
+    Args:
+        question (str): User question in natural language.
+        filters (dict): Optional product filter (see `query`).
+
+    Returns:
+        dict: Same schema as `query` ("query", "result", "source_documents").
+
+    Raises:
+        OverloadedError: If the LLM wait queue is full.
+    """
+    if filters is None:
+        filters = metadata_filters.extract_product_filters(question)
+
+    chain = await asyncio.to_thread(_get_chain, filters)
+    with tracing.span("rag_chain"):
+        docs = await asyncio.to_thread(
+            chain.retriever.get_relevant_documents, question
+        )
+        async with concurrency.get_limiter().slot():
+            with tracing.span("generate", pipeline="products"):
+                answer = await chain.combine_documents_chain.arun(
+                    input_documents=docs, question=question
+                )
+    return {
+        "query": question,
+        "result": answer,
+        "source_documents": [doc.dict() for doc in docs],
+    }
+
+
 if __name__ == "__main__":
     query("Which products have a high return rate and low rating?")
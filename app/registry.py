@@ -0,0 +1,225 @@
+"""
+Module: registry.py
+-------------------
+Process-wide registry of expensive shared resources.
+
+Loading the embedding model weights, reopening a Chroma store or
+compiling a RetrievalQA chain costs far more than answering a question, so
+these objects are built once per process and handed out as shared instances.
+
+This module:
+- Lazily builds and caches resources behind a single re-entrant lock
+- Exposes typed helpers for embeddings and Ollama LLMs
+- Provides explicit `warm_up()` and `invalidate()` hooks
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, List
+
+import logging
+from langchain_core.embeddings import Embeddings
+
+from app import constants, tracing
+
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_KEY = "embeddings"
+VECTORSTORE_PREFIX = "vectorstore:"
+CHAIN_PREFIX = "chain:"
+LLM_PREFIX = "llm:"
+
+_lock = threading.RLock()
+_resources: Dict[str, Any] = {}
+
+
+def get_or_create(key: str, factory: Callable[[], Any]) -> Any:
+    """Return the shared resource for `key`, building it on first use.
+
+    The factory runs at most once per key while the entry is cached, even
+    when several threads request it concurrently.
+
+    Args:
+        key: Registry key, e.g. "vectorstore:docs".
+        factory: Zero-argument callable that builds the resource.
+
+    Returns:
+        The cached (or freshly built) resource.
+    """
+    resource = _resources.get(key)
+    if resource is not None:
+        return resource
+
+    with _lock:
+        resource = _resources.get(key)
+        if resource is None:
+            logger.info(f"Building shared resource {key}")
+            resource = factory()
+            _resources[key] = resource
+        return resource
+
+
+def register(key: str, resource: Any) -> Any:
+    """Store (or replace) a shared resource under `key`.
+
+    Used after a rebuild, when the caller already holds the new instance.
+
+    Args:
+        key: Registry key.
+        resource: Instance to share.
+
+    Returns:
+        The registered resource.
+    """
+    with _lock:
+        _resources[key] = resource
+    return resource
+
+
+def invalidate(prefix: str | None = None) -> List[str]:
+    """Drop cached resources so they are rebuilt on next access.
+
+    Args:
+        prefix: Only drop keys starting with this prefix. Drops everything
+            when None.
+
+    Returns:
+        The list of keys that were removed.
+    """
+    with _lock:
+        keys = [k for k in _resources if prefix is None or k.startswith(prefix)]
+        for key in keys:
+            del _resources[key]
+
+    if keys:
+        logger.info(f"Invalidated shared resources: {keys}")
+    return keys
+
+
+def cached_keys() -> List[str]:
+    """Return the keys of currently cached resources."""
+    with _lock:
+        return sorted(_resources)
+
+
+# ---------------------------------------------------------------------------
+# Typed helpers
+# ---------------------------------------------------------------------------
+
+
+class TracedEmbeddings(Embeddings):
+    """Embedding model wrapper timing each call as a tracing span."""
+
+    def __init__(self, model: Embeddings) -> None:
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with tracing.span("embed_documents", texts=len(texts)):
+            return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with tracing.span("embed_query"):
+            return self.model.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        from app import embeddings
+
+        with tracing.span("embed_query", texts=len(texts)):
+            return embeddings.embed_queries(self.model, texts)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+
+def get_embeddings() -> Any:
+    """Return the shared embedding model.
+
+    Returns:
+        TracedEmbeddings: Embedding function for `constants.EMBEDDING_MODEL`
+        on the `constants.EMBEDDING_BACKEND` backend (see `app.embeddings`),
+        with repeated query embeddings served from the LRU query cache
+        (`app.embedding_cache`) and query/document embedding timed as
+        tracing spans.
+    """
+
+    def _build() -> Any:
+        from app import embedding_cache, embeddings
+
+        model = embeddings.build_embeddings()
+        return TracedEmbeddings(
+            embedding_cache.wrap(model, embeddings.model_id())
+        )
+
+    return get_or_create(EMBEDDINGS_KEY, _build)
+
+
+def get_llm(
+    model: str,
+    temperature: float,
+    llm_cls: Callable[..., Any] | None = None,
+) -> Any:
+    """Return a shared Ollama LLM client for a model/temperature pair.
+
+    The client talks to `constants.OLLAMA_BASE_URL` (env `OLLAMA_BASE_URL`).
+
+    Args:
+        model: Ollama model name.
+        temperature: Sampling temperature.
+        llm_cls: LLM class to instantiate. Defaults to LangChain's Ollama;
+            callers pass their own module-level reference so it stays
+            patchable in tests.
+
+    Returns:
+        Ollama: LangChain Ollama LLM wrapper.
+    """
+
+    def _build() -> Any:
+        cls = llm_cls
+        if cls is None:
+            from langchain_community.llms import Ollama as cls
+
+        return cls(
+            model=model,
+            temperature=temperature,
+            base_url=constants.OLLAMA_BASE_URL,
+        )
+
+    return get_or_create(f"{LLM_PREFIX}{model}:{temperature}", _build)
+
+
+def warm_up(include_chains: bool = True) -> List[str]:
+    """Eagerly build shared resources so the first request pays nothing.
+
+    Indexes that do not exist on disk yet are skipped rather than built.
+    The reranking cross-encoder is loaded when a pipeline reranks, so the
+    first request does not pay for it inside its latency budget.
+
+    Args:
+        include_chains: Also compile the policy and recommendation chains.
+
+    Returns:
+        The keys cached after warm-up.
+    """
+    from app.rag import chains, docs_index, rerank
+
+    get_embeddings()
+
+    if any(c.get("rerank") for c in constants.RETRIEVAL_CONFIG.values()):
+        try:
+            rerank.get_cross_encoder()
+        except RuntimeError as e:
+            logger.warning(f"Skipping cross-encoder warm-up: {e}")
+
+    try:
+        docs_index.load_doc_index()
+    except FileNotFoundError as e:
+        logger.warning(f"Skipping docs index warm-up: {e}")
+        include_chains = False
+
+    if include_chains:
+        chains.get_policy_chain()
+        chains.get_recommendation_chain()
+
+    return cached_keys()
@@ -0,0 +1,410 @@
+"""
+Module: sandbox.py
+------------------
+Time- and memory-limited execution of LLM-written pandas code.
+
+The pandas agent's Python tool used to `exec` model output in the API
+process, so one runaway merge or loop could stall a worker thread and grow
+the server's RSS for every request. `SandboxPool` instead runs each snippet
+in a long-lived worker process:
+- Workers are started from a forkserver, a clean single-threaded process
+  with pandas preloaded, so starting one from the multithreaded API server
+  never forks locks held by other threads. Each worker receives the
+  analytics frame once, at start, instead of per call
+- Each call gets a wall-clock timeout and a memory cap; the parent polls the
+  worker and kills it when either is exceeded, then starts a fresh one.
+  The cap applies to the worker's RSS growth over its size once ready
+  (interpreter, libraries and frame), i.e. to what the snippet allocates
+- The worker's CPU time is reported for every execution
+
+Each execution starts from a clean namespace ({"df", "pd", "np"}), so state
+never leaks between requests or sellers. RSS and CPU time for killed
+workers are read from /proc; on platforms without it only the timeout is
+enforced.
+"""
+
+from __future__ import annotations
+
+import ast
+import multiprocessing
+import queue
+import re
+import threading
+import time
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from io import StringIO
+from typing import Any, Dict, Optional
+
+import logging
+import numpy as np
+import os
+import pandas as pd
+
+from app import constants
+
+
+logger = logging.getLogger(__name__)
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class SandboxClosedError(RuntimeError):
+    """Raised by `SandboxPool.execute` once the pool is closed."""
+
+
+@dataclass
+class ExecutionResult:
+    """Outcome of one sandboxed execution.
+
+    `status` is one of "ok", "timeout", "memory" or "crashed"; code that
+    raised an exception is still "ok" (the error is the output, as with
+    the in-process REPL tool).
+    """
+
+    output: str
+    status: str
+    cpu_seconds: Optional[float]
+    wall_seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+def sanitize_input(code: str) -> str:
+    """Strip backticks, whitespace and a leading "python" from model output."""
+    code = re.sub(r"^(\s|`)*(?i:python)?\s*", "", code)
+    return re.sub(r"(\s|`)*$", "", code)
+
+
+def execute_code(code: str, namespace: Dict[str, Any]) -> str:
+    """Run code like a REPL: exec all statements, return the last value.
+
+    Mirrors LangChain's `PythonAstREPLTool`, so agent prompts behave the
+    same inside and outside the sandbox.
+
+    Returns:
+        The value of the last expression, printed output, or
+        "<ExceptionType>: <message>".
+    """
+    try:
+        tree = ast.parse(sanitize_input(code))
+        exec(
+            ast.unparse(ast.Module(tree.body[:-1], type_ignores=[])), namespace
+        )
+        last = ast.unparse(ast.Module(tree.body[-1:], type_ignores=[]))
+        buffer = StringIO()
+        try:
+            with redirect_stdout(buffer):
+                value = eval(last, namespace)
+        except SyntaxError:
+            with redirect_stdout(buffer):
+                exec(last, namespace)
+            value = None
+        return buffer.getvalue() if value is None else str(value)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def _worker_main(
+    conn: Any,
+    frame: pd.DataFrame,
+    seller_index: Dict[str, np.ndarray],
+) -> None:
+    """Worker loop: receive (code, seller_id), send (output, cpu_seconds).
+
+    Sends None first, once the frame is loaded, so the parent can record
+    the worker's baseline RSS.
+
+    Each call gets its own copy-on-write view of the frame, so a snippet
+    that edits `df` (new columns, in-place updates) never changes what the
+    next call on this worker sees.
+    """
+    pd.set_option("mode.copy_on_write", True)
+    empty = np.empty(0, dtype=np.intp)
+    conn.send(None)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if message is None:
+            return
+
+        code, seller_id = message
+        if seller_id is not None and seller_index:
+            df = frame.take(seller_index.get(seller_id, empty))
+        else:
+            df = frame.copy(deep=False)
+        start = time.process_time()
+        output = execute_code(code, {"df": df, "pd": pd, "np": np})
+        conn.send((output, time.process_time() - start))
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Return a process's resident set size, or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    """Return a process's user + system CPU time, or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime and stime are fields 14 and 15 of /proc/<pid>/stat.
+        return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    """Prefer forkserver (forks from a clean process); fall back to spawn."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+@dataclass
+class _Worker:
+    process: Any
+    conn: Any
+    # RSS once the worker is ready; the memory cap applies to growth over it.
+    baseline_rss: Optional[int] = None
+
+
+class SandboxPool:
+    """Pool of long-lived worker processes executing pandas code."""
+
+    def __init__(
+        self,
+        frame: pd.DataFrame,
+        seller_index: Dict[str, np.ndarray] | None = None,
+        workers: int | None = None,
+        timeout_s: float | None = None,
+        max_rss_mb: int | None = None,
+    ) -> None:
+        """Start the workers.
+
+        Args:
+            frame: DataFrame exposed to code as `df`.
+            seller_index: Optional seller_id -> row positions, so a call can
+                be scoped to one seller's rows.
+            workers: Pool size (default `constants.ANALYTICS_SANDBOX_WORKERS`).
+            timeout_s: Wall-clock limit per call
+                (default `constants.ANALYTICS_SANDBOX_TIMEOUT_S`).
+            max_rss_mb: Limit on a worker's RSS growth while running code
+                (default `constants.ANALYTICS_SANDBOX_MAX_RSS_MB`).
+        """
+        self._frame = frame
+        self._seller_index = seller_index or {}
+        self.timeout_s = timeout_s or constants.ANALYTICS_SANDBOX_TIMEOUT_S
+        self.max_rss_bytes = (
+            (max_rss_mb or constants.ANALYTICS_SANDBOX_MAX_RSS_MB) * 1024 * 1024
+        )
+        self._ctx = _mp_context()
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats: Dict[str, float] = {
+            "executions": 0,
+            "timeouts": 0,
+            "memory_kills": 0,
+            "crashes": 0,
+            "respawns": 0,
+            "cpu_seconds": 0.0,
+        }
+
+        self.size = workers or constants.ANALYTICS_SANDBOX_WORKERS
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        logger.info(
+            f"Sandbox pool started: {self.size} workers "
+            f"({self._ctx.get_start_method()}), timeout={self.timeout_s}s, "
+            f"max_rss={self.max_rss_bytes // (1024 * 1024)}MB"
+        )
+
+    def _spawn(self) -> _Worker:
+        """Start one worker process."""
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self._frame, self._seller_index),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process=process, conn=parent_conn)
+        try:
+            parent_conn.recv()
+        except (EOFError, OSError):
+            # Dead on arrival; `execute` reports it as a crash and respawns.
+            return worker
+        worker.baseline_rss = _rss_bytes(process.pid)
+        return worker
+
+    def _kill(self, worker: _Worker) -> None:
+        """Kill a worker and reap it."""
+        worker.process.kill()
+        worker.process.join(timeout=5)
+        worker.conn.close()
+
+    def _wait(
+        self, worker: _Worker, started: float
+    ) -> tuple[str, str, Optional[float]]:
+        """Wait for a worker's reply while enforcing the time and memory limits.
+
+        Returns:
+            (output, status, cpu_seconds)
+        """
+        pid = worker.process.pid
+        cpu_before = _cpu_seconds(pid)
+        poll_s = constants.ANALYTICS_SANDBOX_POLL_S
+
+        def _killed(
+            status: str, output: str
+        ) -> tuple[str, str, Optional[float]]:
+            cpu_after = _cpu_seconds(pid)
+            self._kill(worker)
+            cpu = (
+                cpu_after - cpu_before
+                if cpu_before is not None and cpu_after is not None
+                else None
+            )
+            return output, status, cpu
+
+        while True:
+            try:
+                if worker.conn.poll(poll_s):
+                    output, cpu = worker.conn.recv()
+                    return output, "ok", cpu
+            except (EOFError, OSError):
+                return _killed("crashed", "Error: execution process crashed.")
+
+            if not worker.process.is_alive():
+                return _killed("crashed", "Error: execution process crashed.")
+            rss = _rss_bytes(pid)
+            if (
+                rss is not None
+                and worker.baseline_rss is not None
+                and rss - worker.baseline_rss > self.max_rss_bytes
+            ):
+                return _killed(
+                    "memory",
+                    "MemoryError: execution exceeded the "
+                    f"{self.max_rss_bytes // (1024 * 1024)} MB memory limit "
+                    "and was stopped.",
+                )
+            if time.monotonic() - started > self.timeout_s:
+                return _killed(
+                    "timeout",
+                    f"TimeoutError: execution exceeded {self.timeout_s}s and "
+                    "was stopped. Use a simpler, vectorized expression.",
+                )
+
+    def _acquire(self) -> _Worker:
+        """Wait for an idle worker, giving up once the pool is closed."""
+        while True:
+            if self._closed:
+                raise SandboxClosedError("Sandbox pool is closed")
+            try:
+                return self._idle.get(
+                    timeout=constants.ANALYTICS_SANDBOX_POLL_S
+                )
+            except queue.Empty:
+                continue
+
+    def execute(
+        self, code: str, seller_id: str | None = None
+    ) -> ExecutionResult:
+        """Run code in an idle worker.
+
+        Blocks until a worker is free. A worker killed for exceeding a limit
+        is replaced by a fresh one before this returns.
+
+        Args:
+            code: Python code; `df` is the (seller-scoped) frame.
+            seller_id: Optional seller to scope `df` to.
+
+        Returns:
+            ExecutionResult with the output and resource usage.
+
+        Raises:
+            SandboxClosedError: If the pool is closed before a worker is
+                free (including while waiting for one).
+        """
+        worker = self._acquire()
+        started = time.monotonic()
+        try:
+            worker.conn.send((code, seller_id))
+            output, status, cpu = self._wait(worker, started)
+        except (BrokenPipeError, OSError):
+            self._kill(worker)
+            output, status, cpu = (
+                "Error: execution process crashed.",
+                "crashed",
+                None,
+            )
+        finally:
+            if self._closed:
+                self._kill(worker)
+            else:
+                if not worker.process.is_alive():
+                    worker = self._spawn()
+                    with self._lock:
+                        self._stats["respawns"] += 1
+                self._idle.put(worker)
+
+        result = ExecutionResult(
+            output=output,
+            status=status,
+            cpu_seconds=cpu,
+            wall_seconds=time.monotonic() - started,
+        )
+        with self._lock:
+            self._stats["executions"] += 1
+            self._stats["cpu_seconds"] += cpu or 0.0
+            if status == "timeout":
+                self._stats["timeouts"] += 1
+            elif status == "memory":
+                self._stats["memory_kills"] += 1
+            elif status == "crashed":
+                self._stats["crashes"] += 1
+
+        cpu_text = f"{cpu:.3f}s" if cpu is not None else "n/a"
+        logger.info(
+            f"Sandbox execution status={status} cpu={cpu_text} "
+            f"wall={result.wall_seconds:.3f}s"
+        )
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        """Return execution counters and total worker CPU seconds."""
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self) -> None:
+        """Stop all idle workers; busy ones are stopped when they return.
+
+        Callers waiting for a worker get `SandboxClosedError`.
+        """
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                self._kill(worker)
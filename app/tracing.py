@@ -0,0 +1,333 @@
+"""
+Module: tracing.py
+------------------
+Lightweight span tracing and Prometheus-style stage metrics.
+
+A request opens a `trace()`; pipeline code wraps its stages in `span(name)`
+(classification, query embedding, vector/BM25 search, reranking, context
+packing, LLM generation, the pandas agent loop, ...). The active trace lives
+in a context variable, so spans opened in `asyncio.to_thread` workers and
+LangChain executors land in the same trace.
+
+This module:
+- Records nested spans (name, parent, start offset, duration) per request
+- Exposes them for the response's debug timings (`Trace.to_dict()`)
+- Feeds per-stage and per-request histograms labelled by intent, rendered
+  in the Prometheus text format by `render_metrics()` for `/metrics`
+
+Spans opened outside a trace are still counted in the histograms (intent
+"none"). Tracing costs two `perf_counter()` calls and a list append per
+span; `constants.TRACING_ENABLED = False` turns spans into no-ops.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import logging
+
+from app import constants
+
+
+logger = logging.getLogger(__name__)
+
+NO_INTENT = "none"
+
+
+@dataclass
+class Span:
+    """One timed stage of a request."""
+
+    name: str
+    parent: Optional[str]
+    start: float
+    duration: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class Trace:
+    """Spans recorded for one request."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.intent: Optional[str] = None
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return sorted(self._spans, key=lambda s: s.start)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the trace as JSON-friendly debug timings (milliseconds)."""
+        total = (
+            self.duration
+            if self.duration is not None
+            else time.perf_counter() - self.started
+        )
+        return {
+            "intent": self.intent,
+            "total_ms": round(total * 1000, 2),
+            "spans": [
+                {
+                    "name": s.name,
+                    "parent": s.parent,
+                    "start_ms": round((s.start - self.started) * 1000, 2),
+                    "duration_ms": round(s.duration * 1000, 2),
+                    **s.attributes,
+                }
+                for s in self.spans
+            ],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar(
+    "current_trace", default=None
+)
+_current_span: ContextVar[Optional[str]] = ContextVar(
+    "current_span", default=None
+)
+
+
+# ---------------------------------------------------------------------------
+# Histograms
+# ---------------------------------------------------------------------------
+
+
+class Histogram:
+    """Cumulative-bucket histogram with string labels (Prometheus semantics)."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        buckets: Sequence[float] | None = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets or constants.TRACE_HISTOGRAM_BUCKETS)
+        self._lock = threading.Lock()
+        # label values -> (bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, seconds: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.setdefault(
+                label_values, [[0] * len(self.buckets), 0.0, 0]
+            )
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][i] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        """Return the histogram in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+            for values, (counts, total, count) in series:
+                labels = ",".join(
+                    f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)
+                )
+                for bound, n in zip(self.buckets, counts):
+                    lines.append(
+                        f'{self.name}_bucket{{{labels},le="{bound}"}} {n}'
+                    )
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="+Inf"}} {count}'
+                )
+                lines.append(f"{self.name}_sum{{{labels}}} {total}")
+                lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+STAGE_SECONDS = Histogram(
+    "marketplace_stage_duration_seconds",
+    "Time spent in each pipeline stage.",
+    labels=("stage", "intent"),
+)
+REQUEST_SECONDS = Histogram(
+    "marketplace_request_duration_seconds",
+    "End-to-end request latency.",
+    labels=("endpoint", "intent"),
+)
+HISTOGRAMS = (STAGE_SECONDS, REQUEST_SECONDS)
+
+
+def render_metrics() -> str:
+    """Return all histograms in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    """Clear all recorded histogram series."""
+    for histogram in HISTOGRAMS:
+        histogram.reset()
+
+
+# ---------------------------------------------------------------------------
+# Tracing API
+# ---------------------------------------------------------------------------
+
+
+def current_trace() -> Optional[Trace]:
+    """Return the trace of the running request, if any."""
+    return _current_trace.get()
+
+
+def set_intent(intent: str) -> None:
+    """Label the running request's trace with its routed intent."""
+    trace_ = _current_trace.get()
+    if trace_ is not None:
+        trace_.intent = intent
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time a pipeline stage.
+
+    Usable in sync and async code (`with tracing.span("retrieve"): ...`).
+    Nested spans record their parent's name.
+
+    Args:
+        name: Stage name, e.g. "retrieve" or "generate".
+        **attributes: Extra JSON-friendly fields shown in debug timings.
+
+    Yields:
+        The span (attributes may be added while it runs), or None when
+        tracing is disabled.
+    """
+    if not constants.TRACING_ENABLED:
+        yield None
+        return
+
+    current = Span(
+        name=name,
+        parent=_current_span.get(),
+        start=time.perf_counter(),
+        attributes=dict(attributes),
+    )
+    token = _current_span.set(name)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - current.start
+        _finish(current)
+
+
+def _finish(current: Span) -> None:
+    """Attach a finished span to the running trace (or count it directly)."""
+    trace_ = _current_trace.get()
+    if trace_ is None:
+        STAGE_SECONDS.observe(current.duration, current.name, NO_INTENT)
+    else:
+        trace_.add(current)
+
+
+def record_span(name: str, started: float, **attributes: Any) -> None:
+    """Record a stage that started at `started` (perf_counter) and ends now.
+
+    For code that cannot hold a `span()` open, e.g. generators that yield
+    between start and end (resumed in other contexts by the server).
+    """
+    if constants.TRACING_ENABLED:
+        _finish(
+            Span(
+                name=name,
+                parent=_current_span.get(),
+                start=started,
+                duration=time.perf_counter() - started,
+                attributes=dict(attributes),
+            )
+        )
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator wrapping a whole (sync or async) function in a span."""
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def trace(endpoint: str) -> Iterator[Trace]:
+    """Collect the spans of one request.
+
+    When the block exits, every span is added to the stage histogram and
+    the total to the request histogram, labelled with the trace's intent
+    (see `set_intent`).
+
+    Args:
+        endpoint: Request label for the request histogram, e.g. "query".
+
+    Yields:
+        The active Trace.
+    """
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+        current.duration = time.perf_counter() - current.started
+        if constants.TRACING_ENABLED:
+            intent = current.intent or NO_INTENT
+            for s in current.spans:
+                STAGE_SECONDS.observe(s.duration, s.name, intent)
+            REQUEST_SECONDS.observe(current.duration, endpoint, intent)
@@ -0,0 +1,116 @@
+"""
+Benchmark: docs_loader section parsing + chunking throughput
+------------------------------------------------------------
+Generates a synthetic markdown corpus and reports chunks/sec for the
+single-pass parser (`extract_sections` + `chunk_section`), in-process and
+through the `iter_chunks` process pool.
+
+Usage:
+    python -m benchmarks.bench_docs_loader --docs 2000 --sections 12
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+from app.rag import docs_loader
+
+
+WORDS = (
+    "seller order refund return shipment delivery listing penalty strike "
+    "category price rating customer policy account window days carrier "
+    "tracking invoice stock warehouse label conversion quality"
+).split()
+
+
+def synthetic_doc(rng: random.Random, n_sections: int) -> str:
+    """Build one markdown document with sections, subsections and lists."""
+    lines = [f"# Synthetic guide {rng.randint(0, 10**6)}", ""]
+    for s in range(n_sections):
+        lines.append(f"## Section {s}")
+        for sub in range(rng.randint(0, 3)):
+            lines.append(f"### Subsection {s}.{sub}")
+            for _ in range(rng.randint(2, 6)):
+                words = rng.choices(WORDS, k=rng.randint(12, 60))
+                lines.append(" ".join(words).capitalize() + ".")
+                lines.append("")
+            lines.append(f"- {' '.join(rng.choices(WORDS, k=8))}")
+    return "\n".join(lines)
+
+
+def write_corpus(root: Path, n_docs: int, n_sections: int, seed: int) -> int:
+    """Write `n_docs` synthetic files under `root`; return total bytes."""
+    rng = random.Random(seed)
+    total = 0
+    for i in range(n_docs):
+        sub = root / f"part_{i % 10}"
+        sub.mkdir(exist_ok=True)
+        text = synthetic_doc(rng, n_sections)
+        (sub / f"{i:05d}_doc.md").write_text(text, encoding="utf-8")
+        total += len(text)
+    return total
+
+
+def _time_chunks(fn) -> Dict[str, float]:
+    """Run a chunk generator to completion and measure throughput."""
+    start = time.perf_counter()
+    n_chunks = sum(1 for _ in fn())
+    seconds = time.perf_counter() - start
+    return {
+        "chunks": n_chunks,
+        "seconds": round(seconds, 3),
+        "chunks_per_sec": round(n_chunks / seconds, 1) if seconds else None,
+    }
+
+
+def run(n_docs: int, n_sections: int, workers: int, seed: int) -> Dict:
+    """Generate the corpus and benchmark the parser; return a JSON report."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        corpus_bytes = write_corpus(root, n_docs, n_sections, seed)
+        raw_docs = list(docs_loader.iter_raw_docs(root))
+
+        report = {
+            "docs": n_docs,
+            "corpus_mb": round(corpus_bytes / 1e6, 2),
+            "parse_only": _time_chunks(
+                lambda: (
+                    c
+                    for raw in raw_docs
+                    for c in docs_loader.chunk_raw_doc(raw)
+                )
+            ),
+            "iter_chunks_1_worker": _time_chunks(
+                lambda: docs_loader.iter_chunks(root, num_workers=1)
+            ),
+        }
+        if workers > 1:
+            report[f"iter_chunks_{workers}_workers"] = _time_chunks(
+                lambda: docs_loader.iter_chunks(root, num_workers=workers)
+            )
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--sections", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        json.dumps(
+            run(args.docs, args.sections, args.workers, args.seed), indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
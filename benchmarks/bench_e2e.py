@@ -0,0 +1,485 @@
+"""
+Benchmark: end-to-end /query latency against a stub Ollama
+----------------------------------------------------------
+Starts the FastAPI app from `app.main` (uvicorn, in-process) against a local
+stub Ollama server (`benchmarks.fake_ollama`) and a deterministic fake
+embedder (`benchmarks.fake_embeddings`), on a synthetic catalog and the real
+seller docs. It replays a seeded mix of policy, recommendation, analytics
+and refusal questions through the router and reports:
+- p50/p95/p99/mean latency and throughput, overall and per intent
+- time spent per stage (intent classification, retrieval, context packing,
+  analytics templates/agent, stub LLM calls)
+- index build and server start-up time
+
+The report is written as JSON (default `benchmarks/results/e2e_<commit>.json`)
+and can be compared with a previous run to catch regressions in
+`router.route`, the chains or index loading.
+
+Usage:
+    python -m benchmarks.bench_e2e --requests 200 --concurrency 8
+    python -m benchmarks.bench_e2e --compare benchmarks/results/e2e_abc1234.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import json
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import logging
+import numpy as np
+import os
+import pandas as pd
+
+from benchmarks.fake_embeddings import HashEmbeddings
+from benchmarks.fake_ollama import FakeOllama
+
+
+QUESTIONS: Dict[str, List[str]] = {
+    "policy": [
+        "What is the return window for electronics?",
+        "How do I avoid late shipment penalties?",
+        "Which items are prohibited on Marketplace X?",
+        "What happens if my order defect rate is too high?",
+    ],
+    "recommendation": [
+        "How can I improve my listing conversion?",
+        "Any tips to improve product photos and titles?",
+        "How should I price my garden products to sell more?",
+    ],
+    "analytics": [
+        "Top 5 products by return rate",
+        "Average rating by category",
+        "Compare late delivery rates across categories",
+        "Is there a correlation between price and rating?",
+    ],
+    "refusal": [
+        "What's the weather in Paris?",
+        "Write me a poem about cats",
+        "Who won the football match yesterday?",
+    ],
+}
+DEFAULT_MIX = {
+    "policy": 0.35,
+    "recommendation": 0.25,
+    "analytics": 0.25,
+    "refusal": 0.15,
+}
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# (module path, attribute, stage name) instrumented in-process.
+STAGES = [
+    ("app.agents.router", "aclassify_intent", "classify"),
+    ("app.rag.chains", "_retrieve", "retrieve"),
+    ("app.rag.chains", "_pack", "pack"),
+    (
+        "app.agents.analytics_agent",
+        "answer_with_template",
+        "analytics_template",
+    ),
+    ("app.agents.analytics_agent", "aask_agent", "analytics_agent"),
+]
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    """Summarize latencies (seconds) as milliseconds."""
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values) * 1000
+    return {
+        "count": len(values),
+        "p50_ms": round(float(np.percentile(arr, 50)), 2),
+        "p95_ms": round(float(np.percentile(arr, 95)), 2),
+        "p99_ms": round(float(np.percentile(arr, 99)), 2),
+        "mean_ms": round(float(arr.mean()), 2),
+        "total_s": round(float(arr.sum() / 1000), 3),
+    }
+
+
+class StageTimer:
+    """Wraps module functions to record their wall time per stage."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def _record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, func: Callable, stage: str) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self._record(stage, time.perf_counter() - start)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._record(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    def instrument(self) -> None:
+        import importlib
+
+        for module_path, attr, stage in STAGES:
+            module = importlib.import_module(module_path)
+            setattr(module, attr, self.wrap(getattr(module, attr), stage))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.samples.clear()
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {s: _percentiles(v) for s, v in sorted(self.samples.items())}
+
+
+def write_dataset(
+    root: Path, n_products: int, n_orders: int, seed: int
+) -> None:
+    """Write synthetic products/orders CSVs (same schema as the notebook)."""
+    from app import constants
+
+    rng = np.random.default_rng(seed)
+    products = pd.DataFrame(
+        {
+            "product_id": [f"P{i:04d}" for i in range(n_products)],
+            "seller_id": [f"S{s:03d}" for s in rng.integers(0, 20, n_products)],
+            "name": [f"Product {i}" for i in range(n_products)],
+            "category": rng.choice(constants.PRODUCT_CATEGORIES, n_products),
+            "price": rng.uniform(10, 300, n_products).round(2),
+            "stock_qty": rng.integers(0, 500, n_products),
+            "avg_rating": rng.uniform(2.5, 5.0, n_products).round(1),
+            "return_rate": rng.uniform(0.01, 0.25, n_products).round(2),
+            "delivery_estimate_days": rng.integers(1, 10, n_products),
+            "description": "Synthetic product used for benchmarking.",
+        }
+    )
+    order_products = rng.integers(0, n_products, n_orders)
+    order_dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+        rng.integers(0, 90, n_orders), unit="D"
+    )
+    estimated = products["delivery_estimate_days"].to_numpy()[order_products]
+    delay = np.maximum(0, rng.normal(0, 2, n_orders)).astype(int)
+    orders = pd.DataFrame(
+        {
+            "order_id": [f"O{i:06d}" for i in range(n_orders)],
+            "product_id": products["product_id"].to_numpy()[order_products],
+            "order_date": order_dates.date,
+            "estimated_delivery_days": estimated,
+            "actual_delivery_date": (
+                order_dates + pd.to_timedelta(estimated + delay, unit="D")
+            ).date,
+            "delivered_late": delay > 0,
+            "customer_feedback": "Synthetic feedback.",
+        }
+    )
+    products.to_csv(root / "products.csv", index=False)
+    orders.to_csv(root / "orders.csv", index=False)
+
+
+def prepare_environment(
+    root: Path, ollama_url: str, args: argparse.Namespace
+) -> Dict[str, float]:
+    """Point the app at temp data, the stub LLM and the fake embedder.
+
+    Returns:
+        Start-up timings in seconds.
+    """
+    from app import constants, registry
+
+    constants.OLLAMA_BASE_URL = ollama_url
+    constants.PRODUCTS_PATH = str(root / "products.csv")
+    constants.ORDERS_PATH = str(root / "orders.csv")
+    constants.CHROMA_DIR = str(root / "chroma_index")
+    constants.CHROMA_DOCS_DIR = str(root / "chroma_docs_index")
+    constants.ANSWER_CACHE_ENABLED = args.cache
+    for config in constants.RETRIEVAL_CONFIG.values():
+        config["rerank"] = args.rerank
+
+    registry.invalidate()
+    registry.register(registry.EMBEDDINGS_KEY, HashEmbeddings())
+
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    write_dataset(root, args.products, args.orders, args.seed)
+    timings["dataset_s"] = time.perf_counter() - start
+
+    from app.rag import docs_index, docs_loader
+
+    start = time.perf_counter()
+    docs_index.build_doc_index(docs_loader.iter_chunks(), force=True)
+    timings["doc_index_build_s"] = time.perf_counter() - start
+
+    # Measure loading the index from disk, as a fresh server would.
+    registry.invalidate(docs_index.DOCS_STORE_KEY)
+    registry.invalidate(docs_index.BM25_KEY)
+    start = time.perf_counter()
+    docs_index.load_doc_index()
+    docs_index.load_bm25_index()
+    timings["doc_index_load_s"] = time.perf_counter() - start
+    return timings
+
+
+def start_server(port: int) -> Tuple[Any, threading.Thread, float]:
+    """Run `app.main:app` with uvicorn in a thread; wait until healthy."""
+    import httpx
+    import uvicorn
+
+    from app.main import app
+
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    start = time.perf_counter()
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    url = f"http://127.0.0.1:{port}/health"
+    while True:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                break
+        except httpx.HTTPError:
+            pass
+        if not thread.is_alive():
+            raise RuntimeError("API server failed to start")
+        time.sleep(0.05)
+    return server, thread, time.perf_counter() - start
+
+
+def question_mix(
+    n: int, mix: Dict[str, float], seed: int
+) -> List[Tuple[str, str]]:
+    """Draw a seeded (intent, question) sequence following `mix`."""
+    rng = random.Random(seed)
+    intents = list(mix)
+    weights = [mix[i] for i in intents]
+    picks = rng.choices(intents, weights=weights, k=n)
+    return [(intent, rng.choice(QUESTIONS[intent])) for intent in picks]
+
+
+def replay(
+    base_url: str,
+    plan: List[Tuple[str, str]],
+    concurrency: int,
+) -> Tuple[List[Dict[str, Any]], float]:
+    """Send the questions to /query with `concurrency` client threads."""
+    import httpx
+
+    client = httpx.Client(base_url=base_url, timeout=120)
+
+    def _one(item: Tuple[str, str]) -> Dict[str, Any]:
+        expected, question = item
+        start = time.perf_counter()
+        try:
+            response = client.post(
+                "/query", json={"question": question, "mode": "router"}
+            )
+            status = response.status_code
+            body = response.json() if status == 200 else {}
+        except httpx.HTTPError as e:
+            status, body = 0, {"error": str(e)}
+        latency = time.perf_counter() - start
+        answer = body.get("answer") or {}
+        return {
+            "expected_intent": expected,
+            "intent": answer.get("intent")
+            if isinstance(answer, dict)
+            else None,
+            "status": status,
+            "latency_s": latency,
+        }
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(_one, plan))
+    finally:
+        client.close()
+    return results, time.perf_counter() - start
+
+
+def summarize(results: List[Dict[str, Any]], wall_s: float) -> Dict[str, Any]:
+    """Aggregate request results into overall and per-intent stats."""
+    ok = [r for r in results if r["status"] == 200]
+    by_intent: Dict[str, List[float]] = defaultdict(list)
+    for r in ok:
+        by_intent[r["expected_intent"]].append(r["latency_s"])
+
+    return {
+        "overall": {
+            **_percentiles([r["latency_s"] for r in ok]),
+            "errors": len(results) - len(ok),
+            "wall_s": round(wall_s, 3),
+            "throughput_rps": round(len(ok) / wall_s, 2) if wall_s else None,
+            "intent_accuracy": round(
+                sum(r["intent"] == r["expected_intent"] for r in ok)
+                / max(len(ok), 1),
+                3,
+            ),
+        },
+        "by_intent": {i: _percentiles(v) for i, v in sorted(by_intent.items())},
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Return percentage changes of latency percentiles vs a baseline run."""
+
+    def _delta(new: Dict, old: Dict) -> Dict[str, float]:
+        return {
+            key: round((new[key] - old[key]) / old[key] * 100, 1)
+            for key in ("p50_ms", "p95_ms", "p99_ms")
+            if new.get(key) is not None and old.get(key)
+        }
+
+    return {
+        "baseline_commit": baseline.get("commit"),
+        "overall_pct": _delta(report["overall"], baseline["overall"]),
+        "by_intent_pct": {
+            intent: _delta(stats, baseline["by_intent"].get(intent, {}))
+            for intent, stats in report["by_intent"].items()
+        },
+        "stages_pct": {
+            stage: _delta(stats, baseline.get("stages", {}).get(stage, {}))
+            for stage, stats in report["stages"].items()
+        },
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Set everything up, replay the question mix and build the report."""
+    os.environ.setdefault("APP_ENV", "bench")
+    fake = FakeOllama(
+        ttft_ms=args.ttft_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        n_tokens=args.tokens,
+    ).start()
+    timer = StageTimer()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            startup = prepare_environment(Path(tmp), fake.url, args)
+            server, thread, startup["server_start_s"] = start_server(args.port)
+            timer.instrument()
+            if not args.verbose:
+                logging.getLogger().setLevel(logging.WARNING)
+
+            base_url = f"http://127.0.0.1:{args.port}"
+            # One pass over every question warms lazily built resources.
+            warmup = [(i, q) for i, qs in QUESTIONS.items() for q in qs]
+            replay(base_url, warmup, 1)
+            timer.reset()
+            llm_calls_before = len(fake.durations())
+
+            plan = question_mix(args.requests, DEFAULT_MIX, args.seed)
+            results, wall_s = replay(base_url, plan, args.concurrency)
+        finally:
+            fake_durations = fake.durations()
+            fake.stop()
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    report = {
+        "commit": _git_commit(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "ttft_ms": args.ttft_ms,
+            "tokens_per_sec": args.tokens_per_sec,
+            "tokens": args.tokens,
+            "products": args.products,
+            "orders": args.orders,
+            "rerank": args.rerank,
+            "cache": args.cache,
+            "seed": args.seed,
+        },
+        "startup": {k: round(v, 3) for k, v in startup.items()},
+        **summarize(results, wall_s),
+        "stages": {
+            **timer.report(),
+            "llm": _percentiles(fake_durations[llm_calls_before:]),
+        },
+    }
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        report["comparison"] = compare(report, baseline)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ttft-ms", type=float, default=150.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=800)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--rerank",
+        action="store_true",
+        help="Enable cross-encoder reranking (downloads the model).",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Keep the answer cache on (off by default to time the pipeline).",
+    )
+    parser.add_argument(
+        "--compare", help="Baseline JSON report to diff against."
+    )
+    parser.add_argument("--output", help="Report path (default: results dir).")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = Path(
+        args.output or RESULTS_DIR / f"e2e_{report['commit'] or 'local'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    print(f"Report saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
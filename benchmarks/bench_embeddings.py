@@ -0,0 +1,288 @@
+"""
+Benchmark: embedding backends, accuracy vs latency
+--------------------------------------------------
+Compares the embedding backends of `app.embeddings` on the real seller docs
+corpus (`docs_loader.iter_chunks`) and a set of seller questions:
+- sentence-transformers: full-precision PyTorch (the reference)
+- onnx-fp32: ONNX Runtime, same weights
+- onnx-int8: ONNX Runtime, int8 dynamically quantized weights
+
+Each backend runs in a fresh subprocess, so model load time, RSS and whether
+torch was imported are measured in isolation. Reported per backend:
+- load time, RSS after load, peak RSS, torch imported or not
+- corpus embedding throughput (chunks/sec)
+- single-query embedding latency (p50/p95/mean)
+- accuracy against the reference: cosine similarity of the vectors, and
+  recall@k / top-1 agreement of the chunks each question retrieves
+
+The ONNX models must be exported first (`python -m app.embeddings export`).
+A backend that cannot load (missing export, no torch) is reported with its
+error and skipped. The report is written as JSON (default
+`benchmarks/results/embeddings_<commit>.json`).
+
+Usage:
+    python -m benchmarks.bench_embeddings --repeats 50 --k 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import os
+
+from app import constants
+
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Backend label -> (constants.EMBEDDING_BACKEND, EMBEDDING_ONNX_QUANTIZED).
+BACKENDS: Dict[str, tuple] = {
+    "sentence-transformers": ("sentence-transformers", False),
+    "onnx-fp32": ("onnx", False),
+    "onnx-int8": ("onnx", True),
+}
+REFERENCE = "sentence-transformers"
+
+QUESTIONS = [
+    "What is the return window for electronics?",
+    "How do I avoid late shipment penalties?",
+    "Which items are prohibited on Marketplace X?",
+    "What happens if my order defect rate is too high?",
+    "How fast must I answer buyer messages?",
+    "Can I sell refurbished products?",
+    "What fees does Marketplace X charge per sale?",
+    "How can I improve my listing conversion?",
+    "Any tips to improve product photos and titles?",
+    "How should I price my garden products to sell more?",
+    "How do I get my products ranked higher in search?",
+    "What makes a good product description?",
+]
+
+
+def _rss_mb() -> float:
+    """Current resident set size of this process in MB (Linux)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        return float("nan")
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    """Summarize latencies (seconds) as milliseconds."""
+    arr = np.asarray(values) * 1000
+    return {
+        "count": len(values),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+    }
+
+
+def worker(args: argparse.Namespace) -> None:
+    """Embed the corpus and questions with one backend (in a subprocess)."""
+    backend, quantized = BACKENDS[args.worker]
+    constants.EMBEDDING_BACKEND = backend
+    constants.EMBEDDING_ONNX_QUANTIZED = quantized
+    if args.onnx_dir:
+        constants.EMBEDDING_ONNX_DIR = args.onnx_dir
+
+    from app import embeddings
+
+    payload = json.loads(Path(args.corpus).read_text(encoding="utf-8"))
+    docs, questions = payload["docs"], payload["questions"]
+
+    rss_start = _rss_mb()
+    start = time.perf_counter()
+    model = embeddings.build_embeddings()
+    load_s = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    start = time.perf_counter()
+    doc_vectors = np.asarray(model.embed_documents(docs), dtype=np.float32)
+    corpus_s = time.perf_counter() - start
+
+    for question in questions[:3]:  # warm-up
+        model.embed_query(question)
+    latencies = []
+    for _ in range(args.repeats):
+        for question in questions:
+            start = time.perf_counter()
+            model.embed_query(question)
+            latencies.append(time.perf_counter() - start)
+    query_vectors = np.asarray(
+        [model.embed_query(q) for q in questions], dtype=np.float32
+    )
+
+    out = Path(args.out)
+    np.savez(out.with_suffix(".npz"), docs=doc_vectors, queries=query_vectors)
+    stats = {
+        "model_id": embeddings.model_id(),
+        "load_s": round(load_s, 3),
+        "rss_start_mb": rss_start,
+        "rss_loaded_mb": rss_loaded,
+        "rss_peak_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "torch_imported": "torch" in sys.modules,
+        "corpus_chunks_per_s": round(len(docs) / corpus_s, 1),
+        "query_latency": _percentiles(latencies),
+    }
+    out.with_suffix(".json").write_text(json.dumps(stats), encoding="utf-8")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def accuracy(
+    reference: Dict[str, np.ndarray], candidate: Dict[str, np.ndarray], k: int
+) -> Dict[str, float]:
+    """Compare a backend's vectors and retrievals with the reference's."""
+    ref_docs, docs = (
+        _normalize(reference["docs"]),
+        _normalize(candidate["docs"]),
+    )
+    ref_q, q = (
+        _normalize(reference["queries"]),
+        _normalize(candidate["queries"]),
+    )
+    doc_cos = (ref_docs * docs).sum(axis=1)
+    query_cos = (ref_q * q).sum(axis=1)
+
+    ref_scores, scores = ref_q @ ref_docs.T, q @ docs.T
+    ref_top = np.argsort(-ref_scores, axis=1)[:, :k]
+    top = np.argsort(-scores, axis=1)[:, :k]
+    recall = [len(set(a) & set(b)) / k for a, b in zip(ref_top, top)]
+    return {
+        "doc_cosine_mean": round(float(doc_cos.mean()), 5),
+        "doc_cosine_min": round(float(doc_cos.min()), 5),
+        "query_cosine_mean": round(float(query_cos.mean()), 5),
+        f"recall_at_{k}": round(float(np.mean(recall)), 4),
+        "top1_agreement": round(float((ref_top[:, 0] == top[:, 0]).mean()), 4),
+        # Shift of the best relevance score, which drives RAG refusals.
+        "best_score_abs_diff": round(
+            float(np.abs(ref_scores.max(axis=1) - scores.max(axis=1)).mean()),
+            5,
+        ),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run every backend in a subprocess and build the report."""
+    from app.rag import docs_loader
+
+    docs = [c["text"] for c in docs_loader.iter_chunks(num_workers=1)]
+    report: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "corpus_chunks": len(docs),
+        "questions": len(QUESTIONS),
+        "repeats": args.repeats,
+        "k": args.k,
+        "backends": {},
+    }
+
+    vectors: Dict[str, Dict[str, np.ndarray]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = Path(tmp) / "corpus.json"
+        corpus.write_text(
+            json.dumps({"docs": docs, "questions": QUESTIONS}), encoding="utf-8"
+        )
+        for label in args.backends:
+            out = Path(tmp) / label
+            cmd = [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_embeddings",
+                "--worker",
+                label,
+                "--corpus",
+                str(corpus),
+                "--out",
+                str(out),
+                "--repeats",
+                str(args.repeats),
+            ]
+            if args.onnx_dir:
+                cmd += ["--onnx-dir", args.onnx_dir]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                error = proc.stderr.strip().splitlines()[-1:] or ["failed"]
+                report["backends"][label] = {"error": error[0]}
+                print(f"{label}: skipped ({error[0]})")
+                continue
+            report["backends"][label] = json.loads(
+                out.with_suffix(".json").read_text(encoding="utf-8")
+            )
+            with np.load(out.with_suffix(".npz")) as data:
+                vectors[label] = {
+                    "docs": data["docs"],
+                    "queries": data["queries"],
+                }
+
+    reference = REFERENCE if REFERENCE in vectors else next(iter(vectors), None)
+    report["reference"] = reference
+    for label, candidate in vectors.items():
+        if label != reference:
+            report["backends"][label]["accuracy"] = accuracy(
+                vectors[reference], candidate, args.k
+            )
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument(
+        "--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS)
+    )
+    parser.add_argument("--onnx-dir", help="ONNX export directory.")
+    parser.add_argument("--output", help="Report path (default: results dir).")
+    parser.add_argument(
+        "--worker", choices=list(BACKENDS), help=argparse.SUPPRESS
+    )
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    report = run(args)
+    output = Path(
+        args.output
+        or RESULTS_DIR / f"embeddings_{report['commit'] or 'local'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    print(f"Report saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark helper: deterministic fake embedder
+---------------------------------------------
+Feature-hashed bag of words (md5 per token, signed buckets, L2-normalized),
+so retrieval still favours chunks sharing words with the question, results
+are identical across runs and processes, and no model weights are loaded.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashEmbeddings(Embeddings):
+    """LangChain embeddings backed by feature hashing."""
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            digest = int.from_bytes(
+                hashlib.md5(token.encode()).digest()[:8], "little"
+            )
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.dim] += sign
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
@@ -0,0 +1,217 @@
+"""
+Benchmark helper: local stub of the Ollama HTTP API
+---------------------------------------------------
+Serves `/api/generate` (streamed JSON lines, as LangChain's Ollama client
+expects) with a configurable time-to-first-token and token rate, so the
+API can be benchmarked end to end without a GPU or a real model.
+
+Responses are deterministic and shaped by the prompt:
+- Router prompts get a one-word intent (keyword match on the question)
+- Pandas-agent (ReAct) prompts get one `python_repl_ast` action, then a
+  final answer once an observation is present
+- Everything else (RAG prompts) gets a canned answer of `--tokens` tokens
+
+Usage:
+    python -m benchmarks.fake_ollama --port 11434 --ttft-ms 150 --tokens-per-sec 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List
+
+
+INTENT_KEYWORDS = {
+    "refusal": ("weather", "poem", "football", "joke", "recipe"),
+    "analytics": (
+        "rate",
+        "average",
+        "top",
+        "compare",
+        "correlation",
+        "revenue",
+    ),
+    "recommendation": ("improve", "tips", "increase", "boost", "should i"),
+}
+
+RAG_ANSWER = (
+    "According to the Marketplace X seller guidelines, sellers must ship "
+    "orders within the handling time shown on the listing, keep tracking "
+    "information up to date and answer buyer messages within two business "
+    "days. Repeated late shipments or cancellations lower the seller "
+    "performance score and can lead to penalties or listing restrictions."
+).split()
+
+
+def _classify(prompt: str) -> str:
+    """Pick an intent for a router prompt by keyword."""
+    question = prompt.rsplit("Question:", 1)[-1].lower()
+    for intent, keywords in INTENT_KEYWORDS.items():
+        if any(k in question for k in keywords):
+            return intent
+    return "policy"
+
+
+def respond(prompt: str, n_tokens: int) -> List[str]:
+    """Return the response tokens for a prompt."""
+    if "Respond with one word" in prompt:
+        return [_classify(prompt)]
+    if "python_repl_ast" in prompt:
+        scratchpad = prompt.rsplit("Question:", 1)[-1]
+        if "Observation:" in scratchpad:
+            text = (
+                "Thought: I now know the final answer\n"
+                "Final Answer: Based on the data, Garden has the highest "
+                "late delivery rate."
+            )
+        else:
+            text = (
+                "Thought: I should look at the data\n"
+                "Action: python_repl_ast\n"
+                "Action Input: df.describe()"
+            )
+        return text.split(" ")
+    words = (RAG_ANSWER * (n_tokens // len(RAG_ANSWER) + 1))[:n_tokens]
+    return [w + " " for w in words]
+
+
+class FakeOllama:
+    """Threaded stub Ollama server with per-request timing stats."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        ttft_ms: float = 150.0,
+        tokens_per_sec: float = 40.0,
+        n_tokens: int = 64,
+    ) -> None:
+        """Bind the server (port 0 picks a free port).
+
+        Args:
+            ttft_ms: Delay before the first token (simulated prefill).
+            tokens_per_sec: Decode rate after the first token.
+            n_tokens: Length of RAG answers.
+        """
+        self.ttft_s = ttft_ms / 1000
+        self.token_interval_s = 1 / tokens_per_sec if tokens_per_sec else 0.0
+        self.n_tokens = n_tokens
+        self._lock = threading.Lock()
+        self._durations: List[float] = []
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _stream(self, prompt: str) -> Iterator[Dict]:
+        """Yield Ollama stream chunks with the configured timing."""
+        time.sleep(self.ttft_s)
+        tokens = respond(prompt, self.n_tokens)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_interval_s)
+            yield {"response": token, "done": False}
+        yield {
+            "response": "",
+            "done": True,
+            "prompt_eval_count": len(prompt) // 4,
+            "eval_count": len(tokens),
+        }
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:  # silence access logs
+                pass
+
+            def _send_json(self, body: Dict) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                self._send_json({"models": [{"name": "stub"}]})
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+
+                start = time.perf_counter()
+                prompt = payload.get("prompt", "")
+                if payload.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for chunk in server._stream(prompt):
+                        line = json.dumps(chunk).encode() + b"\n"
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    chunks = list(server._stream(prompt))
+                    text = "".join(c["response"] for c in chunks)
+                    self._send_json({**chunks[-1], "response": text})
+                with server._lock:
+                    server._durations.append(time.perf_counter() - start)
+
+        return Handler
+
+    def start(self) -> "FakeOllama":
+        """Serve in a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def durations(self) -> List[float]:
+        """Return the wall time of every generate call served so far."""
+        with self._lock:
+            return list(self._durations)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--ttft-ms", type=float, default=150.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    server = FakeOllama(
+        port=args.port,
+        ttft_ms=args.ttft_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        n_tokens=args.tokens,
+    ).start()
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Shared pytest fixtures.
+"""
+
+import pytest
+
+from app import answer_cache, embedding_cache, registry
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    """
+    Drop process-wide shared resources, cached answers and cached query
+    embeddings so mocks never leak between tests.
+    """
+    registry.invalidate()
+    answer_cache.invalidate()
+    embedding_cache.invalidate()
+    yield
+    registry.invalidate()
+    answer_cache.invalidate()
+    embedding_cache.invalidate()
@@ -0,0 +1,121 @@
+"""
+Tests: agents/analytics_agent.py (cached DataFrame + agent)
+"""
+
+from unittest.mock import MagicMock, patch
+
+import os
+import pytest
+
+from app import constants
+from app.agents import analytics_agent
+
+
+@pytest.fixture
+def csv_data(tmp_path, monkeypatch):
+    products = tmp_path / "products.csv"
+    orders = tmp_path / "orders.csv"
+    products.write_text("product_id,name\n1,Mug\n2,Lamp\n")
+    orders.write_text(
+        "order_id,product_id,delivered_late\n1,1,1\n2,1,0\n3,2,0\n"
+    )
+
+    monkeypatch.setattr(constants, "PRODUCTS_PATH", str(products))
+    monkeypatch.setattr(constants, "ORDERS_PATH", str(orders))
+    analytics_agent.invalidate_cache()
+    yield products, orders
+    analytics_agent.invalidate_cache()
+
+
+def test_get_data_is_cached(csv_data):
+    with patch.object(
+        analytics_agent, "load_data", wraps=analytics_agent.load_data
+    ) as spy:
+        first = analytics_agent.get_data()
+        second = analytics_agent.get_data()
+
+    assert first is second
+    spy.assert_called_once()
+    assert first.loc[first["product_id"] == 1, "late_rate"].item() == 0.5
+
+
+@patch("app.agents.analytics_agent._build_pandas_agent")
+def test_agent_reused_and_counted(mock_build, csv_data):
+    mock_build.return_value = MagicMock()
+    before = analytics_agent.cache_stats()
+
+    a = analytics_agent.get_pandas_agent()
+    b = analytics_agent.get_pandas_agent()
+
+    after = analytics_agent.cache_stats()
+    assert a is b
+    mock_build.assert_called_once()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+
+@patch("app.agents.analytics_agent._build_pandas_agent")
+def test_agent_rebuilt_when_csv_changes(mock_build, csv_data):
+    mock_build.side_effect = lambda df, seller_id=None: MagicMock()
+    products, _ = csv_data
+
+    first = analytics_agent.get_pandas_agent()
+
+    products.write_text("product_id,name\n1,Mug\n2,Lamp\n3,Desk\n")
+    stat = products.stat()
+    os.utime(products, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    second = analytics_agent.get_pandas_agent()
+
+    assert first is not second
+    assert len(mock_build.call_args.args[0]) == 3
+
+
+@pytest.fixture
+def seller_csv_data(csv_data):
+    products, _ = csv_data
+    products.write_text("product_id,seller_id,name\n1,S1,Mug\n2,S2,Lamp\n")
+    analytics_agent.invalidate_cache()
+    return csv_data
+
+
+def test_seller_data_is_an_indexed_slice(seller_csv_data):
+    index = analytics_agent.get_seller_index()
+    mine = analytics_agent.get_seller_data("S1")
+
+    assert set(index) == {"S1", "S2"}
+    assert mine["name"].tolist() == ["Mug"]
+    assert analytics_agent.get_seller_data("S1") is mine
+    assert analytics_agent.get_seller_data("unknown").empty
+    assert len(analytics_agent.get_seller_data()) == 2
+
+
+def test_seller_data_without_seller_column_is_whole_frame(csv_data):
+    assert len(analytics_agent.get_seller_data("S1")) == 2
+
+
+@patch("app.agents.analytics_agent._build_pandas_agent")
+def test_per_seller_agents_are_lru_cached(
+    mock_build, seller_csv_data, monkeypatch
+):
+    mock_build.side_effect = lambda df, seller_id=None: MagicMock(rows=len(df))
+    monkeypatch.setattr(constants, "SELLER_AGENT_CACHE_SIZE", 1)
+
+    s1 = analytics_agent.get_pandas_agent("S1")
+    assert analytics_agent.get_pandas_agent("S1") is s1
+    assert s1.rows == 1
+
+    analytics_agent.get_pandas_agent("S2")
+    assert analytics_agent.get_pandas_agent("S1") is not s1
+    assert mock_build.call_count == 3
+
+
+def test_python_tool_runs_in_sandbox(csv_data):
+    from langchain_experimental.tools.python.tool import PythonAstREPLTool
+
+    original = PythonAstREPLTool(locals={"df": analytics_agent.get_data()})
+    (tool,) = analytics_agent._sandboxed_tools([original], seller_id=None)
+
+    assert tool.name == original.name
+    assert tool.run("df['late_rate'].max()") == "0.5"
+    assert analytics_agent.sandbox_stats()["executions"] == 1
@@ -0,0 +1,108 @@
+"""
+Tests: analytics_store.py (Parquet store + precomputed KPIs)
+"""
+
+import os
+import pandas as pd
+import pytest
+
+from app import analytics_store, constants
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    products = pd.DataFrame(
+        {
+            "product_id": ["P1", "P2", "P3"],
+            "name": ["Mug", "Lamp", "Rake"],
+            "category": ["Home Decor", "Home Decor", "Garden"],
+            "price": [10.0, 30.0, 20.0],
+            "stock_qty": [5, 0, 12],
+            "avg_rating": [4.5, 3.0, 4.0],
+            "return_rate": [0.05, 0.20, 0.10],
+            "delivery_estimate_days": [2, 5, 3],
+            "description": ["Ceramic", "Desk lamp", "Steel rake"],
+        }
+    )
+    orders = pd.DataFrame(
+        {
+            "order_id": [f"o{i}" for i in range(6)],
+            "product_id": ["P1", "P1", "P2", "P3", "P3", "P3"],
+            "order_date": [
+                "2024-01-01",
+                "2024-03-01",
+                "2024-03-02",
+                "2024-01-15",
+                "2024-02-28",
+                "2024-03-02",
+            ],
+            "estimated_delivery_days": [2, 2, 5, 3, 3, 3],
+            "actual_delivery_date": ["2024-01-03"] * 6,
+            "delivered_late": [True, False, True, False, True, True],
+            "customer_feedback": ["ok"] * 6,
+        }
+    )
+    products_path = tmp_path / "products.csv"
+    orders_path = tmp_path / "orders.csv"
+    products.to_csv(products_path, index=False)
+    orders.to_csv(orders_path, index=False)
+
+    monkeypatch.setattr(constants, "PRODUCTS_PATH", str(products_path))
+    monkeypatch.setattr(constants, "ORDERS_PATH", str(orders_path))
+    analytics_store.invalidate()
+    yield products_path, orders_path
+    analytics_store.invalidate()
+
+
+def test_store_tables_use_explicit_dtypes(dataset, tmp_path):
+    products = analytics_store.get_table("products")
+
+    assert (tmp_path / "analytics_store" / "products.parquet").exists()
+    assert isinstance(products["category"].dtype, pd.CategoricalDtype)
+    assert products["price"].dtype == "float32"
+    assert analytics_store.get_table("orders")["order_date"].dtype.kind == "M"
+
+
+def test_product_and_category_kpis(dataset):
+    kpis = analytics_store.get_table("product_kpis").set_index("product_id")
+
+    assert kpis.loc["P3", "orders"] == 3
+    assert kpis.loc["P3", "late_rate"] == pytest.approx(2 / 3)
+    assert kpis.loc["P3", "revenue"] == pytest.approx(60.0)
+    # 7-day window ends at the latest order date (2024-03-02).
+    assert kpis.loc["P3", "orders_7d"] == 2
+    assert kpis.loc["P1", "orders_7d"] == 1
+
+    categories = analytics_store.get_table("category_kpis").set_index(
+        "category"
+    )
+    assert categories.loc["Home Decor", "products"] == 2
+    assert categories.loc["Home Decor", "revenue"] == pytest.approx(50.0)
+    assert categories.loc["Garden", "return_rate"] == pytest.approx(0.10)
+
+    daily = analytics_store.get_table("daily_kpis")
+    garden = daily[daily["category"] == "Garden"].set_index("day")
+    assert garden.loc["2024-03-02", "orders_30d"] == 2
+
+
+def test_store_rebuilt_when_csv_changes(dataset):
+    products_path, _ = dataset
+    first = analytics_store.get_table("products")
+    assert analytics_store.get_table("products") is first
+
+    df = pd.read_csv(products_path)
+    df.loc[0, "price"] = 99.0
+    df.to_csv(products_path, index=False)
+    os.utime(products_path, ns=(1, 1))
+
+    reloaded = analytics_store.get_table("products")
+    assert reloaded is not first
+    assert reloaded.loc[0, "price"] == pytest.approx(99.0)
+
+
+def test_merged_frame_and_footprint(dataset):
+    merged = analytics_store.get_merged_frame()
+
+    assert {"late_rate", "orders", "revenue", "price"} <= set(merged.columns)
+    footprint = analytics_store.memory_footprint()
+    assert footprint["store_bytes"] < footprint["csv_bytes"]
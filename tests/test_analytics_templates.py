@@ -0,0 +1,160 @@
+"""
+Tests: analytics_templates.py (deterministic analytics answers)
+"""
+
+import pandas as pd
+import pytest
+
+from app.agents import analytics_agent, analytics_templates
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame(
+        {
+            "product_id": ["P1", "P2", "P3", "P4"],
+            "name": ["Mug", "Lamp", "Rake", "Drill"],
+            "category": ["Home Decor", "Home Decor", "Garden", "Tools"],
+            "price": [10.0, 30.0, 20.0, 80.0],
+            "avg_rating": [4.5, 3.0, 4.0, 4.8],
+            "return_rate": [0.05, 0.20, 0.10, 0.02],
+            "orders": [2, 1, 3, 4],
+            "late_orders": [1, 1, 2, 0],
+            "late_rate": [0.5, 1.0, 2 / 3, 0.0],
+            "revenue": [20.0, 30.0, 60.0, 320.0],
+        }
+    )
+
+
+def test_top_products_by_return_rate(frame):
+    result = analytics_templates.match(
+        "What are the top 2 products by return rate?", frame
+    )
+
+    assert result.template == "top_products"
+    assert result.columns == ["product_id", "name", "category", "return_rate"]
+    assert [row[0] for row in result.rows] == ["P2", "P3"]
+
+
+def test_lowest_rated_products_sort_ascending(frame):
+    result = analytics_templates.match("Show the lowest rated products", frame)
+
+    assert [row[0] for row in result.rows][:2] == ["P2", "P3"]
+
+
+def test_category_average_and_weighted_late_rate(frame):
+    rating = analytics_templates.match("Average rating by category", frame)
+    late = analytics_templates.match(
+        "Compare late delivery rates across categories", frame
+    )
+
+    assert rating.template == "by_category"
+    ratings = dict((row[0], row[1]) for row in rating.rows)
+    assert ratings["Home Decor"] == pytest.approx(3.75)
+    # Order-weighted: (1 + 1) late out of (2 + 1) Home Decor orders.
+    rates = dict((row[0], row[1]) for row in late.rows)
+    assert rates["Home Decor"] == pytest.approx(0.6667, abs=1e-4)
+    assert late.rows[0][0] == "Garden"
+
+
+def test_named_categories_limit_the_table(frame):
+    result = analytics_templates.match(
+        "Late delivery rate for Garden vs Tools", frame
+    )
+
+    assert sorted(row[0] for row in result.rows) == ["Garden", "Tools"]
+
+
+def test_overall_figure(frame):
+    result = analytics_templates.match("What is the overall late rate?", frame)
+
+    assert result.template == "overall"
+    assert result.rows == [["late_rate", 0.4]]
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Why do Garden products get returned?",
+        "Is there a correlation between price and rating?",
+        "Summarize our catalog",
+        # Thresholds, comparators, negations and several metrics filter rows,
+        # which the templates cannot do.
+        "Which products have a return rate above 20%?",
+        "Which products have a rating below 3?",
+        "List products with no returns",
+        "How many orders were late in Garden?",
+        "Average return rate for products over 50 euros",
+        "Products with a rating > 4",
+        "Average rating of products priced 30",
+    ],
+)
+def test_unmatched_questions_fall_through(frame, question):
+    assert analytics_templates.match(question, frame) is None
+
+
+def test_top_products_without_product_id(frame):
+    result = analytics_templates.match(
+        "Top 2 products by revenue", frame.drop(columns=["product_id"])
+    )
+
+    assert result.columns == ["name", "category", "revenue"]
+    assert result.answer == "Highest revenue: Drill (320), Rake (60)."
+
+    result = analytics_templates.match(
+        "Top 1 products by revenue",
+        frame.drop(columns=["product_id", "name"]),
+    )
+    assert result.answer == "Highest revenue: 3 (320)."
+
+
+def test_agent_run_uses_template_and_skips_llm(frame, monkeypatch):
+    monkeypatch.setattr(analytics_agent, "get_data", lambda: frame)
+
+    def fail(question, seller_id=None):
+        raise AssertionError("LLM agent should not be called")
+
+    monkeypatch.setattr(analytics_agent, "ask_agent", fail)
+
+    response = analytics_agent.AnalyticsAgent().run("Revenue per category")
+
+    assert response["intent"] == "analytics"
+    assert response["template"] == "by_category"
+    assert response["table"]["rows"][0][0] == "Tools"
+
+
+def test_agent_run_falls_back_to_llm(frame, monkeypatch):
+    monkeypatch.setattr(analytics_agent, "get_data", lambda: frame)
+    monkeypatch.setattr(
+        analytics_agent, "ask_agent", lambda q, s=None: "llm answer"
+    )
+
+    response = analytics_agent.AnalyticsAgent().run("Summarize our catalog")
+
+    assert response["answer"] == "llm answer"
+    assert "table" not in response
+
+
+def test_query_agent_mode_uses_template(frame, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    monkeypatch.setattr(analytics_agent, "check_data_freshness", lambda: None)
+    monkeypatch.setattr(
+        analytics_agent, "get_seller_data", lambda seller_id=None: frame
+    )
+
+    async def fail(question, seller_id=None):
+        raise AssertionError("LLM agent should not be called")
+
+    monkeypatch.setattr(analytics_agent, "aask_agent", fail)
+
+    response = TestClient(app).post(
+        "/query", json={"question": "Revenue per category", "mode": "agent"}
+    )
+
+    assert response.status_code == 200
+    answer = response.json()["answer"]
+    assert answer["template"] == "by_category"
+    assert answer["table"]["rows"][0][0] == "Tools"
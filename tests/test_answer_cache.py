@@ -0,0 +1,167 @@
+"""
+Tests: answer_cache.py (semantic answer cache)
+"""
+
+from unittest.mock import patch
+
+from app.answer_cache import SemanticCache, normalize_question
+
+
+def fake_embed(text):
+    """Bag-of-letters embedding: near-identical wording stays close."""
+    vec = [0.0] * 26
+    for ch in text:
+        if "a" <= ch <= "z":
+            vec[ord(ch) - ord("a")] += 1.0
+    return vec
+
+
+def make_cache(**kwargs):
+    params = {
+        "max_entries": 10,
+        "ttl_seconds": 60,
+        "similarity_threshold": 0.95,
+        "embed_fn": fake_embed,
+    }
+    params.update(kwargs)
+    return SemanticCache(**params)
+
+
+def test_normalize_question():
+    assert (
+        normalize_question("  Are KNIVES   allowed?! ") == "are knives allowed"
+    )
+
+
+def test_normalize_keeps_operators_and_decimals():
+    assert normalize_question("Return rate > 20%?") != normalize_question(
+        "Return rate < 20%?"
+    )
+    assert normalize_question("3.5 star products") == "3.5 star products"
+    assert normalize_question("3 5 star products") == "3 5 star products"
+
+
+def test_questions_with_numbers_only_match_exactly():
+    cache = make_cache(similarity_threshold=0.5)
+    cache.store("Chairs under 40 euros", "cheap", namespace="rag")
+
+    assert cache.lookup("chairs under 40 euros?", namespace="rag") == "cheap"
+    assert cache.lookup("Chairs under 400 euros", namespace="rag") is None
+    assert cache.lookup_many(["Chairs under 400 euros"], namespace="rag") == [
+        None
+    ]
+    assert cache.lookup("Chairs under forty euros", namespace="rag") is None
+
+
+def test_exact_and_semantic_hits():
+    cache = make_cache()
+    answer = {
+        "answer": "No.",
+        "citations": ["[prohibited_items > Weapons > 1]"],
+    }
+    cache.store("Are knives allowed?", answer, namespace="policy")
+
+    assert cache.lookup("are knives ALLOWED", namespace="policy") == answer
+    assert cache.lookup("Are the knives allowed?", namespace="policy") == answer
+    assert cache.lookup("Are knives allowed?", namespace="analytics") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["semantic_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_dissimilar_question_misses():
+    cache = make_cache()
+    cache.store("Are knives allowed?", {"answer": "No."})
+    assert cache.lookup("How can I improve my conversion rate?") is None
+
+
+def test_lru_size_bound():
+    cache = make_cache(max_entries=2, similarity_threshold=1.01)
+    cache.store("q one", 1)
+    cache.store("q two", 2)
+    cache.lookup("q one")
+    cache.store("q three", 3)
+
+    assert cache.lookup("q one") == 1
+    assert cache.lookup("q two") is None
+    assert cache.stats()["size"] == 2
+
+
+def test_ttl_expiry():
+    cache = make_cache(ttl_seconds=10)
+    with patch("app.answer_cache.time.monotonic", return_value=100.0):
+        cache.store("Are knives allowed?", "No.")
+    with patch("app.answer_cache.time.monotonic", return_value=105.0):
+        assert cache.lookup("Are knives allowed?") == "No."
+    with patch("app.answer_cache.time.monotonic", return_value=111.0):
+        assert cache.lookup("Are knives allowed?") is None
+
+
+def test_returned_answer_is_a_copy():
+    cache = make_cache()
+    cache.store("q", {"citations": ["a"]})
+    cache.lookup("q")["citations"].append("b")
+    assert cache.lookup("q") == {"citations": ["a"]}
+
+
+def test_batch_store_and_lookup():
+    cache = make_cache()
+    cache.store_many(
+        [("Are knives allowed?", "No."), ("What is the return window?", "30d")],
+        namespace="policy",
+    )
+
+    answers = cache.lookup_many(
+        [
+            "are knives allowed",
+            "Are the knives allowed?",
+            "How can I improve my conversion rate?",
+        ],
+        namespace="policy",
+    )
+
+    assert answers == ["No.", "No.", None]
+    assert cache.stats() == {
+        "hits": 2,
+        "semantic_hits": 1,
+        "misses": 1,
+        "size": 2,
+    }
+
+
+class QueryOnlyEmbeddings:
+    """Model whose document path must not be used for questions."""
+
+    def embed_query(self, text):
+        return fake_embed(text)
+
+    def embed_documents(self, texts):
+        raise AssertionError("questions must be embedded as queries")
+
+
+def test_batch_embeds_questions_on_the_query_path(monkeypatch):
+    monkeypatch.setattr(
+        "app.registry.get_embeddings", lambda: QueryOnlyEmbeddings()
+    )
+    cache = make_cache(embed_fn=None)
+    cache.store_many([("Are knives allowed?", "No.")])
+
+    assert cache.lookup_many(["Are the knives allowed?"]) == ["No."]
+    assert cache.lookup("Are the knives allowed") == "No."
+
+
+@patch("app.agents.router.PolicyAgent.run")
+@patch("app.agents.router.classify_intent", return_value="policy")
+def test_route_serves_repeat_from_cache(mock_intent, mock_run):
+    from app.agents.router import route
+
+    mock_run.return_value = {"intent": "policy", "answer": "ok"}
+
+    first = route("Are knives allowed?")
+    second = route("are knives allowed")
+
+    assert first == second
+    mock_run.assert_called_once()
+    mock_intent.assert_called_once()
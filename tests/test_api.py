@@ -44,7 +44,7 @@ def test_query_rag(monkeypatch, client):
 
     logger = logging.getLogger(__name__)
 
-    def mock_query(question: str):
+    async def mock_query(question: str, filters=None):
         logger.info("⚠️ MOCK RAG USED ⚠️")
         return {
             "result": "Mocked RAG answer",
@@ -52,7 +52,7 @@ def test_query_rag(monkeypatch, client):
             "source_documents": ["Mocked RAG document"],
         }
 
-    monkeypatch.setattr("app.rag_pipeline.query", mock_query)
+    monkeypatch.setattr("app.rag_pipeline.aquery", mock_query)
 
     response = client.post(
         "/query",
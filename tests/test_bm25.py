@@ -0,0 +1,75 @@
+"""
+Tests: rag/bm25.py (lexical index + reciprocal-rank fusion)
+"""
+
+from langchain.schema import Document
+
+from app.rag.bm25 import BM25Index, reciprocal_rank_fusion
+
+
+def _doc(chunk_id, text):
+    return Document(page_content=text, metadata={"chunk_id": chunk_id})
+
+
+DOCS = [
+    _doc("a", "Knives and bladed weapons are prohibited items."),
+    _doc(
+        "b", "Late shipment penalty: a strike is added to the seller account."
+    ),
+    _doc("c", "Improve listing titles with brand, model and key attributes."),
+]
+
+
+def test_search_ranks_exact_terms():
+    index = BM25Index.from_documents(DOCS)
+
+    results = index.search("late shipment penalty", k=2)
+
+    assert results[0][0].metadata["chunk_id"] == "b"
+    assert len(results) == 1  # other chunks share no query term
+
+
+def test_streamed_batches_compute_stats_once(monkeypatch):
+    index = BM25Index()
+    calls = []
+    compute = index._compute_stats
+    monkeypatch.setattr(
+        index, "_compute_stats", lambda: calls.append(1) or compute()
+    )
+
+    for doc in DOCS:
+        index.add_documents([doc])
+    results = index.search("listing titles")
+    index.search("knives")
+
+    assert calls == [1]
+    assert results == BM25Index.from_documents(DOCS).search("listing titles")
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = BM25Index.from_documents(DOCS)
+    path = tmp_path / "bm25.json"
+    index.save(str(path))
+
+    loaded = BM25Index.load(str(path))
+
+    assert [d.metadata for d, _ in loaded.search("knives", k=3)] == [
+        {"chunk_id": "a"}
+    ]
+    assert (
+        loaded.search("listing titles")[0][1]
+        == index.search("listing titles")[0][1]
+    )
+
+
+def test_reciprocal_rank_fusion_weights():
+    dense = [DOCS[0], DOCS[1]]
+    lexical = [DOCS[2], DOCS[1]]
+
+    fused = reciprocal_rank_fusion([dense, lexical], weights=[1.0, 1.0], k=3)
+    assert fused[0].metadata["chunk_id"] == "b"
+
+    lexical_only = reciprocal_rank_fusion(
+        [dense, lexical], weights=[0.0, 1.0], k=2
+    )
+    assert [d.metadata["chunk_id"] for d in lexical_only] == ["c", "b"]
@@ -0,0 +1,129 @@
+"""
+Tests: Async request path with bounded LLM concurrency
+
+- LLMLimiter bounds in-flight calls and sheds load when the queue is full
+- router.aroute dispatches to agents' async `arun`
+- /query returns 503 when the LLM backend is overloaded
+- The /query RAG path only holds a limiter slot while generating
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app import concurrency, rag_pipeline
+from app.agents.router import aroute
+from app.concurrency import LLMLimiter, OverloadedError
+
+
+def test_limiter_bounds_concurrency_and_sheds():
+    limiter = LLMLimiter("test", max_concurrency=2, max_queue=1)
+    peak = {"in_flight": 0}
+
+    async def call():
+        async with limiter.slot():
+            peak["in_flight"] = max(
+                peak["in_flight"], limiter.stats()["in_flight"]
+            )
+            await asyncio.sleep(0.01)
+            return "ok"
+
+    async def scenario():
+        return await asyncio.gather(
+            *(call() for _ in range(5)), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+
+    rejected = [r for r in results if isinstance(r, OverloadedError)]
+    stats = limiter.stats()
+    assert peak["in_flight"] == 2
+    assert len(rejected) == 2
+    assert stats["completed"] == 3
+    assert stats["rejected"] == 2
+    assert stats["max_waiting"] == 1
+    assert stats["waiting"] == 0 and stats["in_flight"] == 0
+
+
+@patch("app.agents.router.PolicyAgent.arun", new_callable=AsyncMock)
+@patch("app.agents.router.classify_intent_llm")
+def test_aroute_dispatches_async(mock_llm_intent, mock_arun):
+    mock_arun.return_value = {"intent": "policy", "answer": "ok"}
+
+    out = asyncio.run(aroute("Is selling knives allowed?"))
+
+    assert out["intent"] == "policy"
+    mock_arun.assert_awaited_once()
+    mock_llm_intent.assert_not_called()
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def test_query_router_mode(client):
+    with patch(
+        "app.main.router.aroute",
+        new=AsyncMock(return_value={"intent": "refusal", "answer": "no"}),
+    ):
+        response = client.post(
+            "/query", json={"question": "GDP of France?", "mode": "router"}
+        )
+
+    assert response.status_code == 200
+    assert response.json()["answer"]["intent"] == "refusal"
+
+
+def test_query_returns_503_when_overloaded(client):
+    with patch(
+        "app.main.router.aroute",
+        new=AsyncMock(
+            side_effect=OverloadedError("ollama backend is overloaded")
+        ),
+    ):
+        response = client.post(
+            "/query", json={"question": "anything", "mode": "router"}
+        )
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_status_endpoint(client):
+    response = client.get("/status")
+
+    assert response.status_code == 200
+    assert {"llm", "answer_cache", "analytics_cache", "routing"} <= set(
+        response.json()
+    )
+
+
+def test_rag_aquery_holds_slot_for_generation_only(monkeypatch):
+    limiter = concurrency.get_limiter()
+    in_flight = {}
+
+    def retrieve(question):
+        in_flight["retrieve"] = limiter.stats()["in_flight"]
+        return []
+
+    async def generate(input_documents, question):
+        in_flight["generate"] = limiter.stats()["in_flight"]
+        return "answer"
+
+    chain = MagicMock()
+    chain.retriever.get_relevant_documents = retrieve
+    chain.combine_documents_chain.arun = generate
+    monkeypatch.setattr(rag_pipeline, "_get_chain", lambda filters: chain)
+
+    out = asyncio.run(rag_pipeline.aquery("Best garden chairs?"))
+
+    assert out == {
+        "query": "Best garden chairs?",
+        "result": "answer",
+        "source_documents": [],
+    }
+    assert in_flight == {"retrieve": 0, "generate": 1}
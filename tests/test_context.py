@@ -0,0 +1,127 @@
+"""
+Tests: rag/context.py (chunk merging and token-budgeted packing)
+"""
+
+from unittest.mock import MagicMock, patch
+
+from langchain.schema import Document
+
+from app.rag import chains
+from app.rag.context import (
+    PRODUCT_GROUP_KEYS,
+    PackedRetriever,
+    estimate_tokens,
+    format_context,
+    merge_chunks,
+    pack_context,
+)
+
+
+TEXT = (
+    "Late shipments add a strike to the seller account. "
+    "Three strikes within thirty days suspend the account for one week. "
+    "Sellers can appeal a strike within seven days of notification."
+)
+
+
+def _chunk(chunk_id, text, section="Delivery"):
+    return Document(
+        page_content=text,
+        metadata={
+            "doc_id": "delivery",
+            "section": section,
+            "subsection": None,
+            "chunk_id": chunk_id,
+        },
+    )
+
+
+def test_overlapping_chunks_are_merged_once():
+    first = _chunk("delivery_001", TEXT[:120])
+    second = _chunk("delivery_002", TEXT[80:])
+
+    spans = merge_chunks([second, first])
+
+    assert len(spans) == 1
+    assert spans[0].text == TEXT
+    assert [d.metadata["chunk_id"] for d in spans[0].sources] == [
+        "delivery_001",
+        "delivery_002",
+    ]
+
+
+def test_adjacent_chunks_join_and_duplicates_collapse():
+    a = _chunk("delivery_004", "Strikes expire after ninety days.")
+    b = _chunk("delivery_005", "Appeals are reviewed within two days.")
+    dup = _chunk("faq_001", "Strikes expire after ninety days.", "FAQ")
+
+    spans = merge_chunks([a, dup, b])
+
+    assert len(spans) == 1
+    assert spans[0].text.count("Strikes expire") == 1
+    assert len(spans[0].sources) == 3
+
+
+def test_pack_context_respects_budget_and_keeps_rank_order():
+    best = _chunk("returns_001", "Returns are accepted for thirty days.", "A")
+    filler = _chunk("returns_009", "x " * 400, "B")
+    small = _chunk("returns_020", "Refunds take five days.", "C")
+
+    spans = pack_context([best, filler, small], max_tokens=30)
+
+    assert [s.sources[0].metadata["chunk_id"] for s in spans] == [
+        "returns_001",
+        "returns_020",
+    ]
+    assert estimate_tokens(format_context(spans)) <= 30
+
+
+def test_pack_context_truncates_oversized_best_span():
+    spans = pack_context([_chunk("delivery_001", "y" * 1000)], max_tokens=10)
+
+    assert len(spans) == 1
+    assert estimate_tokens(spans[0].text) <= 10
+
+
+@patch("app.rag.chains.get_policy_chain")
+@patch("app.rag.chains._retrieve")
+def test_policy_rag_sends_merged_context_with_citations(
+    mock_retrieve, mock_chain
+):
+    docs = [
+        _chunk("delivery_002", TEXT[80:]),
+        _chunk("delivery_001", TEXT[:120]),
+    ]
+    mock_retrieve.return_value = (docs, 0.9)
+    mock_chain.return_value.invoke.return_value = "answer"
+
+    out = chains.run_policy_rag("What happens after three strikes?")
+
+    context = mock_chain.return_value.invoke.call_args.args[0]["context"]
+    assert context.count("Three strikes") == 1
+    assert context.startswith(
+        "[delivery > Delivery > delivery_001] [delivery > Delivery > delivery_002]"
+    )
+    assert len(out["citations"]) == 2
+
+
+def test_packed_retriever_groups_by_product():
+    inner = MagicMock()
+    inner.get_relevant_documents.return_value = [
+        Document(page_content=TEXT[:120], metadata={"product_id": "P1"}),
+        Document(page_content=TEXT[80:], metadata={"product_id": "P1"}),
+        Document(page_content=TEXT[80:], metadata={"product_id": "P2"}),
+    ]
+    retriever = PackedRetriever.construct(
+        retriever=inner, max_tokens=200, group_keys=PRODUCT_GROUP_KEYS
+    )
+
+    docs = retriever.get_relevant_documents("strikes")
+
+    assert len(docs) == 1
+    assert docs[0].page_content == TEXT
+    assert [s["product_id"] for s in docs[0].metadata["sources"]] == [
+        "P1",
+        "P1",
+        "P2",
+    ]
@@ -31,3 +31,125 @@ def test_get_retriever(mock_chroma, tmp_path, monkeypatch):
 
     assert retriever is not None
     mock_chroma.assert_called_once()
+
+
+def _chunk(chunk_id, text, doc_id="overview"):
+    return {
+        "doc_id": doc_id,
+        "chunk_id": chunk_id,
+        "text": text,
+        "section": "S",
+        "subsection": None,
+        "metadata": {"path": f"{doc_id}.md", "start_line": 1, "end_line": 2},
+    }
+
+
+@patch("app.rag.docs_index.ingest.add_documents")
+@patch("app.rag.docs_index.registry.get_embeddings")
+@patch("app.rag.docs_index.Chroma")
+def test_incremental_rebuild_only_embeds_changes(
+    mock_chroma, mock_embed, mock_add, tmp_path, monkeypatch
+):
+    from app import constants
+
+    index_dir = tmp_path / "docs_idx"
+    monkeypatch.setattr(constants, "CHROMA_DOCS_DIR", str(index_dir))
+
+    store = MagicMock()
+    mock_chroma.return_value = store
+
+    chunks = [
+        _chunk("a_001", "one"),
+        _chunk("a_002", "two"),
+        _chunk("a_003", "x"),
+    ]
+    docs_index.build_doc_index(chunks)
+    assert mock_add.call_args.kwargs["ids"] == ["a_001", "a_002", "a_003"]
+    assert (tmp_path / "docs_idx_manifest.json").exists()
+    assert (tmp_path / "docs_idx_bm25.json").exists()
+
+    # Unchanged corpus: nothing is embedded.
+    mock_add.reset_mock()
+    docs_index.build_doc_index(chunks)
+    mock_add.assert_not_called()
+    store.delete.assert_not_called()
+
+    # One edited chunk, one new chunk, one removed chunk.
+    updated = [
+        _chunk("a_001", "one"),
+        _chunk("a_002", "TWO"),
+        _chunk("a_004", "y"),
+    ]
+    docs_index.build_doc_index(updated)
+
+    assert mock_add.call_args.kwargs["ids"] == ["a_002", "a_004"]
+    store.delete.assert_called_once_with(ids=["a_003"])
+
+
+@patch("app.rag.docs_index.ingest.add_documents")
+@patch("app.rag.docs_index.registry.get_embeddings")
+@patch("app.rag.docs_index.Chroma")
+def test_force_rebuild_reembeds_everything(
+    mock_chroma, mock_embed, mock_add, tmp_path, monkeypatch
+):
+    from app import constants
+
+    index_dir = tmp_path / "docs_idx"
+    monkeypatch.setattr(constants, "CHROMA_DOCS_DIR", str(index_dir))
+
+    docs_index.build_doc_index([_chunk("a_001", "one")], force=True)
+    docs_index.build_doc_index([_chunk("a_001", "one")], force=True)
+
+    assert mock_add.call_count == 2
+    assert mock_add.call_args.kwargs["ids"] == ["a_001"]
+
+
+@patch("app.rag.docs_index.ingest.add_documents")
+@patch("app.rag.docs_index.registry.get_embeddings")
+@patch("app.rag.docs_index.Chroma")
+def test_build_consumes_chunk_stream_in_batches(
+    mock_chroma, mock_embed, mock_add, tmp_path, monkeypatch
+):
+    from app import constants
+
+    monkeypatch.setattr(constants, "CHROMA_DOCS_DIR", str(tmp_path / "idx"))
+    chunks = (_chunk(f"a_{i:03d}", f"text {i}") for i in range(5))
+
+    docs_index.build_doc_index(chunks, force=True, batch_size=2)
+
+    assert [len(c.kwargs["ids"]) for c in mock_add.call_args_list] == [
+        2,
+        2,
+        1,
+    ]
+    assert len(docs_index.load_bm25_index().docs) == 5
+
+
+class HashEmbeddings:
+    """Deterministic 8-dim embeddings, so Chroma can run without a model."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        return [float((hash(text) >> i) % 7) + 1.0 for i in range(8)]
+
+
+def test_force_rebuild_of_an_open_store(tmp_path, monkeypatch):
+    from app import constants
+
+    monkeypatch.setattr(constants, "CHROMA_DOCS_DIR", str(tmp_path / "idx"))
+    monkeypatch.setattr(
+        docs_index.registry, "get_embeddings", lambda: HashEmbeddings()
+    )
+
+    docs_index.build_doc_index([_chunk("a_001", "one"), _chunk("a_002", "x")])
+    assert len(docs_index.load_doc_index().get()["ids"]) == 2
+
+    store = docs_index.build_doc_index([_chunk("a_003", "two")], force=True)
+    assert store.get()["ids"] == ["a_003"]
+
+    # A model change also rebuilds from scratch.
+    monkeypatch.setattr(docs_index.embeddings, "model_id", lambda: "other")
+    docs_index.build_doc_index([_chunk("a_004", "three")])
+    assert docs_index.load_doc_index().get()["ids"] == ["a_004"]
@@ -38,3 +38,58 @@ def test_load_all_docs(tmp_path, monkeypatch):
 
     assert len(docs) == 2
     assert any(doc["title"] == "A" for doc in docs)
+
+
+def _write_tree(root):
+    (root / "guides").mkdir(parents=True)
+    (root / "01_overview.md").write_text(
+        "# Overview\n## Intro\nWelcome sellers.\n"
+    )
+    (root / "guides" / "02_returns.md").write_text(
+        "# Returns\n## Window\nReturns are accepted for 30 days.\n"
+        "## Refunds\nRefunds take five days.\n"
+    )
+    (root / "guides" / "notes.txt").write_text("not markdown")
+
+
+def test_iter_doc_paths_walks_recursively(tmp_path):
+    _write_tree(tmp_path)
+
+    paths = list(docs_loader.iter_doc_paths(tmp_path))
+
+    assert [p.name for p in paths] == ["01_overview.md", "02_returns.md"]
+
+
+def test_iter_chunks_matches_eager_pipeline(tmp_path, monkeypatch):
+    from app import constants
+
+    _write_tree(tmp_path)
+    monkeypatch.setattr(constants, "SELLER_DOCS_DIR", str(tmp_path))
+
+    eager = docs_loader.load_and_chunk_docs()
+    streamed = list(docs_loader.iter_chunks(num_workers=1))
+    pooled = list(docs_loader.iter_chunks(num_workers=2))
+
+    assert eager == streamed == pooled
+    assert [c["chunk_id"] for c in streamed] == [
+        "overview_001",
+        "guides/returns_001",
+        "guides/returns_002",
+    ]
+
+
+def test_chunks_carry_exact_char_and_line_offsets():
+    body = " ".join(f"Rule {i} applies to every listing." for i in range(40))
+    text = f"# Title\n\n## Listings\n\n{body}\n\n### Photos\nUse white backgrounds.\n"
+    raw = {"doc_id": "listing", "path": "listing.md", "content": text}
+
+    chunks = docs_loader.chunk_raw_doc(raw)
+
+    assert len(chunks) > 2
+    for chunk in chunks:
+        meta = chunk["metadata"]
+        assert text[meta["start_char"] : meta["end_char"]] == chunk["text"]
+    assert chunks[0]["metadata"]["start_line"] == 5
+    assert chunks[-1]["subsection"] == "Photos"
+    assert chunks[-1]["metadata"]["start_line"] == 8
+    assert chunks[-1]["metadata"]["end_line"] == 8
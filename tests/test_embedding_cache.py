@@ -0,0 +1,122 @@
+"""
+Tests: embedding_cache.py (LRU query-embedding cache)
+"""
+
+import numpy as np
+
+from app import embedding_cache, registry
+from app.embedding_cache import CachedEmbeddings, QueryEmbeddingCache
+
+
+class CountingEmbeddings:
+    """Fake model returning a distinct vector per text, counting calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_query(self, text):
+        self.calls.append(text)
+        return [float(len(text)), 1.0, 0.5]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+
+def make_cached(max_entries=10, path=None, model_id="m"):
+    cache = QueryEmbeddingCache(max_entries=max_entries, path=path)
+    cache.bind(model_id)
+    model = CountingEmbeddings()
+    return CachedEmbeddings(model, cache), model, cache
+
+
+def test_normalized_repeats_hit_the_cache():
+    cached, model, cache = make_cached()
+
+    first = cached.embed_query("Are knives allowed?")
+    assert cached.embed_query("  are KNIVES allowed ") == first
+    cached.embed_documents(["Are knives allowed?"])  # not cached
+
+    assert model.calls == ["Are knives allowed?", "Are knives allowed?"]
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 1,
+        "hit_rate": 0.5,
+        "size": 1,
+        "max_entries": 10,
+    }
+
+
+def test_embed_queries_uses_the_query_path_and_cache():
+    cached, model, cache = make_cached()
+    cached.embed_query("Are knives allowed?")
+    model.embed_documents = None  # batches must not use the document path
+
+    vectors = cached.embed_queries(
+        ["are knives allowed", "Late fees?", "late fees"]
+    )
+
+    assert vectors[0] == cached.embed_query("Are knives allowed?")
+    assert vectors[1] == vectors[2] == model.embed_query("Late fees?")
+    assert model.calls[:2] == ["Are knives allowed?", "Late fees?"]
+    assert cache.get("late fees") is not None
+
+
+def test_vectors_are_float32_and_lru_bounded():
+    cached, model, cache = make_cached(max_entries=2)
+    cached.embed_query("q one")
+    cached.embed_query("q two")
+    cached.embed_query("q one")
+    cached.embed_query("q three")
+
+    assert cache.get("q one").dtype == np.float32
+    assert cache.get("q two") is None
+    assert cache.stats()["size"] == 2
+
+
+def test_cache_persists_across_restarts(tmp_path):
+    path = str(tmp_path / "query_embeddings.npz")
+    cached, _, cache = make_cached(path=path)
+    cached.embed_query("How do I avoid late shipment penalties?")
+    assert cache.save()
+
+    restarted, model, _ = make_cached(path=path)
+    restarted.embed_query("how do i avoid late shipment penalties")
+    assert model.calls == []
+
+    other_model, model, _ = make_cached(path=path, model_id="other")
+    other_model.embed_query("How do I avoid late shipment penalties?")
+    assert len(model.calls) == 1
+
+
+def test_rebinding_to_another_model_drops_vectors():
+    cached, _, cache = make_cached()
+    cached.embed_query("q")
+    cache.bind("m")
+    assert cache.stats()["size"] == 1
+    cache.bind("other")
+    assert cache.stats()["size"] == 0
+
+
+def test_shared_embeddings_use_the_query_cache(monkeypatch):
+    model = CountingEmbeddings()
+    monkeypatch.setattr("app.embeddings.build_embeddings", lambda: model)
+
+    shared = registry.get_embeddings()
+    shared.embed_query("Which items are prohibited?")
+    shared.embed_query("which items are prohibited")
+
+    assert len(model.calls) == 1
+    assert embedding_cache.query_cache.stats()["hits"] == 1
+
+
+def test_cache_can_be_disabled(monkeypatch):
+    model = CountingEmbeddings()
+    monkeypatch.setattr("app.embeddings.build_embeddings", lambda: model)
+    monkeypatch.setattr("app.constants.QUERY_EMBEDDING_CACHE_ENABLED", False)
+
+    shared = registry.get_embeddings()
+    shared.embed_query("q")
+    shared.embed_query("q")
+
+    assert shared.model is model
+    assert len(model.calls) == 2
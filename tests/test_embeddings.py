@@ -0,0 +1,155 @@
+"""
+Tests: embeddings.py (pluggable embedding backends)
+
+The ONNX backend runs on a tiny exported model (word-level tokenizer,
+embedding lookup + projection) written to a temp dir; the sentence-transformer
+backend is not loaded.
+"""
+
+import numpy as np
+import pytest
+
+from app import embeddings, registry
+
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+
+VOCAB = ["[PAD]", "[UNK]", "late", "shipment", "penalty", "seo", "titles"]
+DIM = 8
+
+
+def write_tiny_model(out_dir):
+    """Export a toy encoder: hidden = Embedding[input_ids] @ W."""
+    from onnx import TensorProto, helper, numpy_helper
+    from tokenizers import Tokenizer
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+
+    tokenizer = Tokenizer(
+        WordLevel({w: i for i, w in enumerate(VOCAB)}, unk_token="[UNK]")
+    )
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(str(out_dir / embeddings.TOKENIZER_FILE))
+
+    rng = np.random.default_rng(0)
+    table = rng.normal(size=(len(VOCAB), 16)).astype(np.float32)
+    weight = rng.normal(size=(16, DIM)).astype(np.float32)
+    graph = helper.make_graph(
+        [
+            helper.make_node("Gather", ["table", "input_ids"], ["tokens"]),
+            helper.make_node(
+                "MatMul", ["tokens", "weight"], ["last_hidden_state"]
+            ),
+        ],
+        "tiny_encoder",
+        [
+            helper.make_tensor_value_info(
+                "input_ids", TensorProto.INT64, ["batch", "sequence"]
+            ),
+            helper.make_tensor_value_info(
+                "attention_mask", TensorProto.INT64, ["batch", "sequence"]
+            ),
+        ],
+        [
+            helper.make_tensor_value_info(
+                "last_hidden_state",
+                TensorProto.FLOAT,
+                ["batch", "sequence", DIM],
+            )
+        ],
+        initializer=[
+            numpy_helper.from_array(table, "table"),
+            numpy_helper.from_array(weight, "weight"),
+        ],
+    )
+    model = helper.make_model(
+        graph, opset_imports=[helper.make_opsetid("", 14)]
+    )
+    model.ir_version = 8
+    onnx.save(model, str(out_dir / embeddings.ONNX_MODEL_FILE))
+    embeddings.quantize_onnx(
+        out_dir / embeddings.ONNX_MODEL_FILE,
+        out_dir / embeddings.ONNX_INT8_MODEL_FILE,
+    )
+    return out_dir
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    return write_tiny_model(tmp_path)
+
+
+def test_onnx_embeddings_are_normalized_and_ignore_padding(model_dir):
+    model = embeddings.OnnxEmbeddings(str(model_dir), quantized=False)
+
+    alone = np.array(model.embed_query("late shipment"))
+    batch = np.array(
+        model.embed_documents(
+            ["seo titles seo titles seo", "late shipment", "penalty"]
+        )
+    )
+
+    assert batch.shape == (3, DIM)
+    np.testing.assert_allclose(np.linalg.norm(batch, axis=1), 1.0, rtol=1e-5)
+    # Padded to the longest text, the short one still pools its own tokens.
+    np.testing.assert_allclose(batch[1], alone, rtol=1e-5, atol=1e-6)
+
+
+def test_int8_model_stays_close_to_fp32(model_dir):
+    texts = ["late shipment penalty", "seo titles", "shipment"]
+    fp32 = np.array(
+        embeddings.OnnxEmbeddings(
+            str(model_dir), quantized=False
+        ).embed_documents(texts)
+    )
+    int8 = np.array(
+        embeddings.OnnxEmbeddings(
+            str(model_dir), quantized=True
+        ).embed_documents(texts)
+    )
+
+    assert (fp32 * int8).sum(axis=1).min() > 0.98
+
+
+def test_missing_export_raises(tmp_path):
+    with pytest.raises(FileNotFoundError, match="app.embeddings export"):
+        embeddings.OnnxEmbeddings(str(tmp_path))
+
+
+def test_registry_uses_configured_backend(model_dir, monkeypatch):
+    monkeypatch.setattr("app.constants.EMBEDDING_BACKEND", embeddings.ONNX)
+    monkeypatch.setattr("app.constants.EMBEDDING_ONNX_DIR", str(model_dir))
+
+    shared = registry.get_embeddings()
+
+    # Tracing wrapper -> query-embedding cache -> backend model.
+    assert isinstance(shared.model.model, embeddings.OnnxEmbeddings)
+    assert len(shared.embed_query("late shipment")) == DIM
+
+
+def test_model_id_tracks_backend_and_precision(monkeypatch, tmp_path):
+    monkeypatch.setattr("app.constants.EMBEDDING_MODEL", "m")
+    monkeypatch.setattr("app.constants.EMBEDDING_ONNX_DIR", str(tmp_path))
+    assert embeddings.model_id(embeddings.SENTENCE_TRANSFORMERS) == "m"
+    assert embeddings.model_id(embeddings.ONNX) == "m:onnx-int8"
+    monkeypatch.setattr("app.constants.EMBEDDING_ONNX_QUANTIZED", False)
+    assert embeddings.model_id(embeddings.ONNX) == "m:onnx-fp32"
+
+
+def test_onnx_model_id_names_the_exported_model(monkeypatch, tmp_path):
+    monkeypatch.setattr("app.constants.EMBEDDING_MODEL", "m")
+    monkeypatch.setattr("app.constants.EMBEDDING_ONNX_DIR", str(tmp_path))
+    (tmp_path / embeddings.EXPORT_INFO_FILE).write_text('{"model": "other"}')
+
+    assert embeddings.model_id(embeddings.ONNX) == "other:onnx-int8"
+    assert embeddings.model_id(embeddings.SENTENCE_TRANSFORMERS) == "m"
+
+
+def test_torch_backend_refused_when_torch_disabled(monkeypatch):
+    monkeypatch.setattr("app.constants.TORCH_ENABLED", False)
+    with pytest.raises(ValueError, match="TORCH_ENABLED"):
+        embeddings.build_embeddings(embeddings.SENTENCE_TRANSFORMERS)
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        embeddings.build_embeddings("tensorflow")
@@ -0,0 +1,99 @@
+"""
+Tests: rag/filters.py (metadata filters for retrieval)
+"""
+
+from unittest.mock import MagicMock, patch
+
+from langchain.schema import Document
+
+from app.rag import chains, filters
+
+
+def test_to_chroma_where_translates_each_form():
+    assert filters.to_chroma_where(None) is None
+    assert filters.to_chroma_where({"category": "Garden"}) == {
+        "category": {"$eq": "Garden"}
+    }
+    assert filters.to_chroma_where(
+        {"doc_id": ["penalties", "logistics"], "price": {"min": 10, "max": 50}}
+    ) == {
+        "$and": [
+            {"doc_id": {"$in": ["penalties", "logistics"]}},
+            {"price": {"$gte": 10}},
+            {"price": {"$lte": 50}},
+        ]
+    }
+
+
+def test_matches_mirrors_where_semantics():
+    flt = {"category": ["Garden", "Tools"], "price": {"max": 30}}
+
+    assert filters.matches({"category": "Garden", "price": 20.0}, flt)
+    assert not filters.matches({"category": "Garden", "price": 45.0}, flt)
+    assert not filters.matches({"category": "Sports", "price": 5.0}, flt)
+    assert not filters.matches({"category": "Tools"}, flt)
+
+    excluded = {"doc_id": {"not_in": ["penalties"]}}
+    assert filters.to_chroma_where(excluded) == {
+        "doc_id": {"$nin": ["penalties"]}
+    }
+    assert filters.matches({"doc_id": "guides/returns"}, excluded)
+    assert not filters.matches({"doc_id": "penalties"}, excluded)
+
+
+def test_extract_product_filters():
+    assert filters.extract_product_filters(
+        "Electronics priced between 100 and 50 euros"
+    ) == {"category": "Electronics", "price": {"min": 50.0, "max": 100.0}}
+    assert filters.extract_product_filters("Cheap furniture under €25,5") == {
+        "category": "Furniture",
+        "price": {"max": 25.5},
+    }
+    # Without price context, numbers are not read as prices.
+    assert filters.extract_product_filters("Products rated above 4") == {}
+    # "eur" inside "europe" is not a currency; "from" needs a price nearby.
+    assert filters.extract_product_filters("Returns from 2023 in Europe") == {}
+    assert filters.extract_product_filters(
+        "Shipping from 3 warehouses, cost under 40 euros"
+    ) == {"price": {"max": 40.0}}
+    assert filters.extract_product_filters("Garden chairs from 20 euros") == {
+        "category": "Garden",
+        "price": {"min": 20.0},
+    }
+
+
+@patch("app.rag.chains.rerank", side_effect=lambda q, d, top_n, **kw: d[:top_n])
+@patch("app.rag.chains.load_bm25_index")
+@patch("app.rag.chains.load_doc_index")
+def test_retrieve_scopes_both_retrievers(mock_index, mock_bm25, mock_rerank):
+    mock_index.return_value.similarity_search_with_relevance_scores.return_value = []
+    penalties = Document(
+        page_content="late shipment strike",
+        metadata={"doc_id": "penalties", "chunk_id": "penalties_001"},
+    )
+    growth = Document(
+        page_content="late shipment hurts conversion",
+        metadata={"doc_id": "conversion_growth", "chunk_id": "growth_001"},
+    )
+    nested = Document(
+        page_content="late shipment exceptions for marketplaces",
+        metadata={"doc_id": "guides/shipping", "chunk_id": "shipping_001"},
+    )
+    bm25 = MagicMock()
+    bm25.search.side_effect = lambda q, k, predicate: [
+        (d, 1.0) for d in (penalties, growth, nested) if predicate(d)
+    ]
+    mock_bm25.return_value = bm25
+
+    docs, _ = chains._retrieve("late shipment", "policy")
+    where = mock_index.return_value.similarity_search_with_relevance_scores.call_args.kwargs[
+        "filter"
+    ]
+    assert where == {"doc_id": {"$nin": ["conversion_growth"]}}
+    # Docs added later (or nested ones) are in scope by default.
+    assert docs == [penalties, nested]
+
+    docs, _ = chains._retrieve(
+        "late shipment", "recommendation", {"doc_id": "conversion_growth"}
+    )
+    assert docs == [growth]
@@ -0,0 +1,119 @@
+"""
+Tests: rag/ingest.py (batched embedding + bulk Chroma upserts)
+"""
+
+from unittest.mock import MagicMock
+
+import numpy as np
+from langchain.schema import Document
+
+from app.rag import ingest
+
+
+class FakeEmbeddings:
+    """Records batches and embeds each text as [len(text)]."""
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+def test_embed_texts_sorts_batches_and_preserves_order():
+    emb = FakeEmbeddings()
+    texts = ["ccc", "a", "bbbbb", "dd"]
+
+    vectors = ingest.embed_texts(texts, embeddings=emb, batch_size=2)
+
+    assert vectors == [[3.0], [1.0], [5.0], [2.0]]
+    assert emb.batches == [["a", "dd"], ["ccc", "bbbbb"]]
+
+
+def test_embed_texts_falls_back_without_process_pool():
+    emb = FakeEmbeddings()
+    vectors = ingest.embed_texts(["x", "yy"], embeddings=emb, num_workers=4)
+    assert vectors == [[1.0], [2.0]]
+
+
+def test_add_documents_upserts_in_sized_batches():
+    store = MagicMock()
+    docs = [
+        Document(page_content=f"doc {i}", metadata={"doc_id": "d", "sub": None})
+        for i in range(5)
+    ]
+    ids = [f"id_{i}" for i in range(5)]
+
+    stats = ingest.add_documents(
+        store, docs, ids, embeddings=FakeEmbeddings(), add_batch_size=2
+    )
+
+    calls = store._collection.upsert.call_args_list
+    assert [c.kwargs["ids"] for c in calls] == [
+        ["id_0", "id_1"],
+        ["id_2", "id_3"],
+        ["id_4"],
+    ]
+    assert calls[0].kwargs["metadatas"] == [{"doc_id": "d"}, {"doc_id": "d"}]
+    assert stats["docs"] == 5
+    assert stats["docs_per_sec"] > 0
+
+
+def test_add_documents_without_metadata():
+    store = MagicMock()
+    docs = [Document(page_content="plain")]
+
+    ingest.add_documents(store, docs, ["p1"], embeddings=FakeEmbeddings())
+
+    assert store._collection.upsert.call_args.kwargs["metadatas"] is None
+
+
+class FakeProcessClient:
+    """sentence-transformers-like client counting pool starts and stops."""
+
+    def __init__(self):
+        self.started = 0
+        self.stopped = 0
+
+    def start_multi_process_pool(self, target_devices):
+        self.started += 1
+        return object()
+
+    def encode_multi_process(self, texts, pool, batch_size, **kwargs):
+        return [np.array([float(len(t))]) for t in texts]
+
+    def stop_multi_process_pool(self, pool):
+        self.stopped += 1
+
+
+def test_encoder_pool_is_started_once_per_build():
+    emb = FakeEmbeddings()
+    emb.client = FakeProcessClient()
+    store = MagicMock()
+
+    with ingest.encoder_pool(emb, num_workers=4) as pool:
+        for batch in range(3):
+            ingest.add_documents(
+                store,
+                [Document(page_content="x" * (batch + 1))],
+                [f"id_{batch}"],
+                embeddings=emb,
+                pool=pool,
+            )
+        assert emb.client.started == 1
+
+    assert emb.client.stopped == 1
+    assert emb.batches == []
+    vectors = store._collection.upsert.call_args.kwargs["embeddings"]
+    assert vectors == [[3.0]]
+
+
+def test_encoder_pool_not_started_when_unused():
+    emb = FakeEmbeddings()
+    emb.client = FakeProcessClient()
+
+    with ingest.encoder_pool(emb, num_workers=4) as pool:
+        assert pool is not None
+
+    assert emb.client.started == emb.client.stopped == 0
@@ -43,3 +43,89 @@ def test_run_recommendation_rag(mock_llm, mock_retriever):
         out = chains.run_recommendation_rag("How to improve listing?")
         assert out["answer"] == "Reco answer"
         assert "docX" in out["citations"][0]
+
+
+def _scored(doc_id, score):
+    doc = MagicMock()
+    doc.page_content = f"content of {doc_id}"
+    doc.metadata = {
+        "doc_id": doc_id,
+        "section": "S",
+        "chunk_id": f"{doc_id}_001",
+    }
+    return doc, score
+
+
+@patch("app.rag.chains.load_bm25_index", return_value=None)
+@patch("app.rag.chains.get_policy_chain")
+@patch("app.rag.chains.load_doc_index")
+def test_policy_rag_uses_single_scored_retrieval(
+    mock_index, mock_chain, mock_bm25
+):
+    store = mock_index.return_value
+    store.similarity_search_with_relevance_scores.return_value = [
+        _scored("penalties", 0.72),
+        _scored("logistics", 0.41),
+    ]
+    mock_chain.return_value.invoke.return_value = (
+        "Late shipments are penalized."
+    )
+
+    out = chains.run_policy_rag("What are the penalties for late shipments?")
+
+    store.similarity_search_with_relevance_scores.assert_called_once()
+    inputs = mock_chain.return_value.invoke.call_args.args[0]
+    assert "content of penalties" in inputs["context"]
+    assert "content of logistics" in inputs["context"]
+    assert out["confidence"] == 0.72
+    assert out["citations"] == [
+        "[penalties > S > penalties_001]",
+        "[logistics > S > logistics_001]",
+    ]
+
+
+@patch("app.rag.chains.load_bm25_index", return_value=None)
+@patch("app.rag.chains.get_recommendation_chain")
+@patch("app.rag.chains.load_doc_index")
+def test_low_relevance_refuses_before_llm(mock_index, mock_chain, mock_bm25):
+    mock_index.return_value.similarity_search_with_relevance_scores.return_value = [
+        _scored("overview", 0.05)
+    ]
+
+    out = chains.run_recommendation_rag("What is the GDP of France?")
+
+    assert out["answer"] == chains.RECOMMENDATION_REFUSAL
+    assert out["citations"] == []
+    assert out["confidence"] == 0.05
+    mock_chain.assert_not_called()
+
+
+@patch("app.rag.chains.load_bm25_index")
+@patch("app.rag.chains.get_policy_chain")
+@patch("app.rag.chains.load_doc_index")
+def test_hybrid_retrieval_fuses_lexical_hits(mock_index, mock_chain, mock_bm25):
+    from app.rag.bm25 import BM25Index
+
+    dense = [_scored(f"dense{i}", 0.6 - i * 0.05) for i in range(10)]
+    mock_index.return_value.similarity_search_with_relevance_scores.return_value = dense
+
+    lexical_doc = MagicMock()
+    lexical_doc.page_content = "SKU-42 listings must include a GTIN."
+    lexical_doc.metadata = {
+        "doc_id": "listing_quality",
+        "section": "Identifiers",
+        "chunk_id": "listing_quality_007",
+    }
+    bm25 = MagicMock(spec=BM25Index)
+    bm25.search.return_value = [(lexical_doc, 7.5)]
+    mock_bm25.return_value = bm25
+    mock_chain.return_value.invoke.return_value = "answer"
+
+    out = chains.run_policy_rag("What is rule SKU-42?")
+
+    assert (
+        "[listing_quality > Identifiers > listing_quality_007]"
+        in out["citations"]
+    )
+    assert len(out["citations"]) == 4
+    assert out["confidence"] == 0.6
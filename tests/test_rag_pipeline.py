@@ -40,3 +40,130 @@ def test_load_documents_returns_strings():
     assert isinstance(docs, list), "Expected a list of documents."
     assert all(isinstance(d, str) for d in docs), "All documents should be strings."
     assert len(docs) > 0, "Documents list should not be empty."
+
+
+@pytest.fixture
+def products_csv(tmp_path, monkeypatch):
+    path = tmp_path / "products.csv"
+    path.write_text(
+        "product_id,name,category,price,avg_rating,return_rate,"
+        "delivery_estimate_days,description\n"
+        "1,Mug,Kitchen,9.5,4.2,0.05,3,Ceramic mug\n"
+        "2,Lamp,Home,25.0,3.9,0.12,5,Desk lamp\n"
+        "3,Knife,Kitchen,14.0,,0.02,2,Chef knife\n"
+    )
+    monkeypatch.setattr(constants, "PRODUCTS_PATH", str(path))
+    return path
+
+
+def test_load_documents_matches_row_format(products_csv):
+    docs = rag_pipeline.load_documents()
+
+    assert len(docs) == 3
+    assert docs[0] == (
+        "Product ID: 1\n"
+        "Name: Mug\n"
+        "Category: Kitchen\n"
+        "Price: 9.5 euros\n"
+        "Average rating: 4.2\n"
+        "Return rate: 0.05\n"
+        "Delivery estimate: 3 days\n"
+        "Description: Ceramic mug"
+    )
+
+
+def test_iter_product_batches_streams_with_metadata(products_csv):
+    batches = list(rag_pipeline.iter_product_batches(batch_size=2))
+
+    assert [len(b) for b in batches] == [2, 1]
+    product_id, text, metadata = batches[0][1]
+    assert product_id == "2"
+    assert "Name: Lamp" in text
+    assert metadata == {
+        "product_id": "2",
+        "category": "Home",
+        "price": 25.0,
+        "avg_rating": 3.9,
+        "return_rate": 0.12,
+        "delivery_estimate_days": 5,
+    }
+    # Missing values are dropped rather than stored as NaN.
+    assert "avg_rating" not in batches[1][0][2]
+
+
+def test_query_extracts_product_filters(monkeypatch):
+    from unittest.mock import MagicMock
+
+    built = []
+
+    def fake_build(filters=None):
+        built.append(filters)
+        chain = MagicMock(return_value={"result": "ok"})
+        return chain
+
+    monkeypatch.setattr(rag_pipeline, "_build_rag_chain", fake_build)
+    monkeypatch.setattr(rag_pipeline, "get_rag_chain", lambda: fake_build())
+
+    rag_pipeline.query("Garden chairs under 40 euros?")
+    rag_pipeline.query("Which products have a high return rate?")
+
+    assert built == [
+        {"category": "Garden", "price": {"max": 40.0}},
+        None,
+    ]
+
+
+class HashEmbeddings:
+    """Deterministic 8-dim embeddings, so Chroma can run without a model."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        return [float((hash(text) >> i) % 7) + 1.0 for i in range(8)]
+
+
+def test_force_rebuild_drops_removed_products(
+    products_csv, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(constants, "CHROMA_DIR", str(tmp_path / "chroma"))
+    monkeypatch.setattr(
+        rag_pipeline.registry, "get_embeddings", lambda: HashEmbeddings()
+    )
+
+    store = rag_pipeline.build_vectorstore(force_rebuild=True)
+    assert sorted(store.get()["ids"]) == ["1_1", "2_1", "3_1"]
+
+    products_csv.write_text(
+        "product_id,name,category,price,avg_rating,return_rate,"
+        "delivery_estimate_days,description\n"
+        "1,Mug,Kitchen,9.5,4.2,0.05,3,Ceramic mug\n"
+    )
+    store = rag_pipeline.build_vectorstore(force_rebuild=True)
+    assert store.get()["ids"] == ["1_1"]
+
+
+def test_store_rebuilt_when_embedding_model_changes(
+    products_csv, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(constants, "CHROMA_DIR", str(tmp_path / "chroma"))
+    monkeypatch.setattr(
+        rag_pipeline.registry, "get_embeddings", lambda: HashEmbeddings()
+    )
+    monkeypatch.setattr(rag_pipeline.embeddings, "model_id", lambda: "old")
+    rag_pipeline.build_vectorstore(force_rebuild=True)
+    assert rag_pipeline._stored_model_id() == "old"
+
+    products_csv.write_text(
+        "product_id,name,category,price,avg_rating,return_rate,"
+        "delivery_estimate_days,description\n"
+        "1,Mug,Kitchen,9.5,4.2,0.05,3,Ceramic mug\n"
+    )
+    # Same model: the existing store is reused as is.
+    assert len(rag_pipeline.build_vectorstore().get()["ids"]) == 3
+
+    monkeypatch.setattr(rag_pipeline.embeddings, "model_id", lambda: "new")
+    store = rag_pipeline.build_vectorstore()
+
+    assert store.get()["ids"] == ["1_1"]
+    assert rag_pipeline._stored_model_id() == "new"
@@ -0,0 +1,89 @@
+"""
+Tests: registry.py (process-wide shared resources)
+"""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+from app import constants, registry
+
+
+def test_get_or_create_builds_once():
+    factory = MagicMock(return_value=object())
+
+    first = registry.get_or_create("thing", factory)
+    second = registry.get_or_create("thing", factory)
+
+    assert first is second
+    factory.assert_called_once()
+
+
+def test_get_or_create_is_thread_safe():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(
+                registry.get_or_create("shared", factory)
+            )
+        )
+        for _ in range(16)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_invalidate_by_prefix():
+    registry.register("chain:policy", object())
+    registry.register("chain:recommendation", object())
+    registry.register("vectorstore:docs", object())
+
+    removed = registry.invalidate(registry.CHAIN_PREFIX)
+
+    assert sorted(removed) == ["chain:policy", "chain:recommendation"]
+    assert registry.cached_keys() == ["vectorstore:docs"]
+
+
+def test_get_llm_shared_per_model_and_temperature():
+    llm_cls = MagicMock(side_effect=lambda **kw: MagicMock())
+
+    a = registry.get_llm("mistral", 0.2, llm_cls=llm_cls)
+    b = registry.get_llm("mistral", 0.2, llm_cls=llm_cls)
+    c = registry.get_llm("mistral", 0.0, llm_cls=llm_cls)
+
+    assert a is b
+    assert a is not c
+    assert llm_cls.call_count == 2
+
+
+def test_get_llm_uses_configured_base_url(monkeypatch):
+    monkeypatch.setattr(constants, "OLLAMA_BASE_URL", "http://stub:1234")
+    llm_cls = MagicMock()
+
+    registry.get_llm("stub-model", 0.1, llm_cls=llm_cls)
+
+    assert llm_cls.call_args.kwargs["base_url"] == "http://stub:1234"
+
+
+@patch("app.rag.docs_index.Chroma")
+def test_doc_index_loaded_once(mock_chroma, tmp_path, monkeypatch):
+    from app import constants
+    from app.rag import docs_index
+
+    monkeypatch.setattr(constants, "CHROMA_DOCS_DIR", str(tmp_path))
+    monkeypatch.setattr(registry, "get_embeddings", MagicMock())
+
+    docs_index.get_doc_retriever(k=2)
+    docs_index.get_doc_retriever(k=4)
+
+    mock_chroma.assert_called_once()
@@ -0,0 +1,174 @@
+"""
+Tests: rag/rerank.py (cross-encoder reranking with a latency budget)
+"""
+
+import sys
+import time
+from unittest.mock import patch
+
+from langchain.schema import Document
+
+from app.rag import rerank
+
+
+def _docs(n):
+    return [
+        Document(page_content=f"chunk {i}", metadata={"chunk_id": str(i)})
+        for i in range(n)
+    ]
+
+
+@patch("app.rag.rerank.get_cross_encoder")
+def test_rerank_orders_by_cross_encoder_score(mock_encoder):
+    mock_encoder.return_value.predict.return_value = [0.1, 0.9, 0.5, 0.7]
+
+    out = rerank.rerank("q", _docs(4), top_n=2)
+
+    assert [d.metadata["chunk_id"] for d in out] == ["1", "3"]
+    pairs = mock_encoder.return_value.predict.call_args.args[0]
+    assert pairs[0] == ("q", "chunk 0")
+
+
+@patch("app.rag.rerank.get_cross_encoder")
+def test_rerank_skipped_when_budget_spent(mock_encoder):
+    started_at = time.perf_counter() - 1.0
+
+    out = rerank.rerank(
+        "q", _docs(5), top_n=3, started_at=started_at, budget_ms=100
+    )
+
+    assert [d.metadata["chunk_id"] for d in out] == ["0", "1", "2"]
+    mock_encoder.assert_not_called()
+
+
+@patch("app.rag.rerank.get_cross_encoder", side_effect=ImportError("missing"))
+def test_rerank_falls_back_without_model(mock_encoder):
+    out = rerank.rerank("q", _docs(5), top_n=2)
+
+    assert [d.metadata["chunk_id"] for d in out] == ["0", "1"]
+
+
+@patch("app.rag.rerank.get_cross_encoder")
+def test_rerank_scores_only_what_the_budget_covers(mock_encoder, monkeypatch):
+    monkeypatch.setitem(rerank._pair_ms, "estimate", 10.0)
+    mock_encoder.return_value.predict.side_effect = lambda pairs, **_: [
+        float(i) for i in range(len(pairs))
+    ]
+
+    out = rerank.rerank(
+        "q", _docs(20), top_n=6, started_at=time.perf_counter(), budget_ms=45
+    )
+
+    assert len(mock_encoder.return_value.predict.call_args.args[0]) == 4
+    assert [d.metadata["chunk_id"] for d in out] == [
+        "3",
+        "2",
+        "1",
+        "0",
+        "4",
+        "5",
+    ]
+
+
+@patch("app.rag.rerank.get_cross_encoder")
+def test_rerank_skipped_when_model_load_spends_the_budget(mock_encoder):
+    def slow_load():
+        time.sleep(0.15)
+        return mock_encoder.model
+
+    mock_encoder.side_effect = slow_load
+
+    out = rerank.rerank(
+        "q", _docs(5), top_n=3, started_at=time.perf_counter(), budget_ms=100
+    )
+
+    assert [d.metadata["chunk_id"] for d in out] == ["0", "1", "2"]
+    mock_encoder.model.predict.assert_not_called()
+
+
+def test_warm_up_preloads_cross_encoder(monkeypatch):
+    from app import registry
+    from app.rag import docs_index
+
+    def missing_index():
+        raise FileNotFoundError("no index")
+
+    loaded = []
+    monkeypatch.setattr(registry, "get_embeddings", lambda: None)
+    monkeypatch.setattr(docs_index, "load_doc_index", missing_index)
+    monkeypatch.setattr(
+        rerank, "get_cross_encoder", lambda: loaded.append(True)
+    )
+
+    registry.warm_up()
+
+    assert loaded == [True]
+
+
+def test_failed_cross_encoder_load_is_cached(monkeypatch):
+    from unittest.mock import MagicMock
+
+    from app import constants
+
+    monkeypatch.setattr(constants, "TORCH_ENABLED", True)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+    out = rerank.rerank("q", _docs(3), top_n=2)
+    assert [d.metadata["chunk_id"] for d in out] == ["0", "1"]
+
+    # Later requests do not retry the import (or the model download).
+    installed = MagicMock()
+    monkeypatch.setitem(sys.modules, "sentence_transformers", installed)
+    out = rerank.rerank("q", _docs(3), top_n=2)
+
+    assert [d.metadata["chunk_id"] for d in out] == ["0", "1"]
+    installed.CrossEncoder.assert_not_called()
+
+
+@patch("app.rag.chains.rerank")
+@patch("app.rag.chains.load_bm25_index", return_value=None)
+@patch("app.rag.chains.load_doc_index")
+def test_retrieve_widens_candidates_for_rerank(
+    mock_index, mock_bm25, mock_rerank
+):
+    from app import constants
+    from app.rag import chains
+
+    docs = _docs(25)
+    mock_index.return_value.similarity_search_with_relevance_scores.return_value = [
+        (d, 0.5) for d in docs
+    ]
+    mock_rerank.side_effect = lambda q, candidates, top_n, started_at: (
+        candidates[::-1][:top_n]
+    )
+
+    out, confidence = chains._retrieve("q", "policy")
+
+    config = constants.RETRIEVAL_CONFIG["policy"]
+    candidates = mock_rerank.call_args.args[1]
+    assert len(candidates) == config["rerank_candidates"]
+    assert len(out) == config["k"]
+    assert out[0] is candidates[-1]
+    assert confidence == 0.5
+
+
+@patch("app.rag.chains._vector_search_many")
+@patch("app.rag.chains.load_bm25_index", return_value=None)
+def test_retrieve_many_gives_each_question_its_own_budget(
+    mock_bm25, mock_search, monkeypatch
+):
+    from app.rag import chains
+
+    mock_search.return_value = [[(d, 0.5) for d in _docs(5)]] * 3
+    spent_ms = []
+
+    def slow_rerank(question, candidates, top_n, started_at):
+        spent_ms.append((time.perf_counter() - started_at) * 1000)
+        time.sleep(0.2)
+        return candidates[:top_n]
+
+    monkeypatch.setattr(chains, "rerank", slow_rerank)
+
+    chains.retrieve_many(["a", "b", "c"], "policy", [[0.0]] * 3)
+
+    assert len(spent_ms) == 3
+    assert max(spent_ms) < 100
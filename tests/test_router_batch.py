@@ -0,0 +1,158 @@
+"""
+Tests: batch routing (`router.aroute_batch` and `/query/batch`)
+
+We mock:
+- the fast-path classifier (`intent_classifier.predict_many`)
+- the embedding model, batched retrieval and RAG generation
+- the analytics agent
+"""
+
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from app import concurrency
+from app.agents import router
+
+
+INTENTS = {
+    "penalty rules": "policy",
+    "seo tips": "recommendation",
+    "late rate": "analytics",
+}
+
+
+@pytest.fixture
+def batch_mocks(monkeypatch):
+    """Route by the INTENTS table and record batched calls."""
+    calls = {"embed": [], "retrieve": [], "generate": []}
+
+    monkeypatch.setattr(
+        "app.agents.intent_classifier.predict_many",
+        lambda qs: [(INTENTS.get(q.lower(), "refusal"), 0.9) for q in qs],
+    )
+
+    # One-hot vector per distinct text, so only identical texts match.
+    ids = {}
+
+    def embed(texts):
+        calls["embed"].append(list(texts))
+        vectors = []
+        for text in texts:
+            vector = [0.0] * 32
+            vector[ids.setdefault(text, len(ids))] = 1.0
+            vectors.append(vector)
+        return vectors
+
+    embeddings = MagicMock()
+    embeddings.embed_queries.side_effect = embed
+    monkeypatch.setattr("app.registry.get_embeddings", lambda: embeddings)
+
+    def fake_retrieve_many(questions, pipeline, vectors, filters=None):
+        calls["retrieve"].append((pipeline, list(questions)))
+        return [([], 0.9) for _ in questions]
+
+    async def fake_generate(question, pipeline, docs, confidence):
+        calls["generate"].append(question)
+        return {"answer": f"{pipeline}: {question}", "confidence": confidence}
+
+    async def fake_analytics(question, seller_id=None, filters=None):
+        return {"intent": "analytics", "answer": f"kpi for {seller_id}"}
+
+    monkeypatch.setattr("app.rag.chains.retrieve_many", fake_retrieve_many)
+    monkeypatch.setattr("app.rag.chains.agenerate_rag", fake_generate)
+    monkeypatch.setattr(router.AGENTS["analytics"], "arun", fake_analytics)
+    return calls
+
+
+def test_batch_returns_answers_in_input_order(batch_mocks):
+    questions = ["penalty rules", "late rate", "seo tips", "Penalty rules?"]
+
+    results = asyncio.run(router.aroute_batch(questions, seller_id="S001"))
+
+    assert [r["intent"] for r in results] == [
+        "policy",
+        "analytics",
+        "recommendation",
+        "policy",
+    ]
+    assert results[1]["answer"] == "kpi for S001"
+    # Duplicates (after normalization) are generated once.
+    assert batch_mocks["generate"] == ["penalty rules", "seo tips"] or (
+        batch_mocks["generate"] == ["seo tips", "penalty rules"]
+    )
+    assert results[3] == results[0] and results[3] is not results[0]
+
+
+def test_batch_embeds_once_and_searches_once_per_pipeline(batch_mocks):
+    router.route_batch(["penalty rules", "seo tips", "late rate"])
+
+    # One call for retrieval, one for storing the answers in the cache.
+    retrieval, cache_store = batch_mocks["embed"]
+    assert retrieval == ["penalty rules", "seo tips"]
+    assert sorted(cache_store) == ["late rate", "penalty rules", "seo tips"]
+    assert sorted(batch_mocks["retrieve"]) == [
+        ("policy", ["penalty rules"]),
+        ("recommendation", ["seo tips"]),
+    ]
+
+
+def test_batch_serves_repeat_questions_from_cache(batch_mocks):
+    router.route_batch(["penalty rules"])
+    results = router.route_batch(["penalty rules"])
+
+    assert results[0]["intent"] == "policy"
+    assert batch_mocks["generate"] == ["penalty rules"]
+
+
+def test_batch_reports_failures_per_question(batch_mocks, monkeypatch):
+    async def overloaded(question, pipeline, docs, confidence):
+        raise concurrency.OverloadedError("ollama backend is overloaded")
+
+    monkeypatch.setattr("app.rag.chains.agenerate_rag", overloaded)
+
+    results = router.route_batch(["penalty rules", "late rate"])
+
+    assert results[0] == {
+        "intent": "policy",
+        "error": "ollama backend is overloaded",
+    }
+    assert results[1]["intent"] == "analytics"
+    # Failed answers are not cached.
+    assert router.route_batch(["penalty rules"])[0]["error"]
+
+
+def test_batch_endpoint_json_and_ndjson(batch_mocks):
+    from fastapi.testclient import TestClient
+
+    import app.main as main
+
+    client = TestClient(main.app)
+    questions = ["late rate", "penalty rules"]
+
+    response = client.post("/query/batch", json={"questions": questions})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["question"] for r in results] == questions
+    assert results[1]["answer"]["intent"] == "policy"
+
+    streamed = client.post(
+        "/query/batch", json={"questions": questions, "stream": True}
+    )
+    assert streamed.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in streamed.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1]
+
+
+def test_batch_endpoint_rejects_oversized_batches(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import app.main as main
+
+    monkeypatch.setattr("app.constants.BATCH_MAX_QUESTIONS", 2)
+    response = TestClient(main.app).post(
+        "/query/batch", json={"questions": ["a", "b", "c"]}
+    )
+    assert response.status_code == 400
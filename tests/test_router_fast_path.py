@@ -0,0 +1,44 @@
+"""
+Tests: Fast-path intent classifier in front of the LLM router
+
+- Confident local predictions skip the LLM entirely
+- Low-confidence questions fall back to the LLM and are counted
+"""
+
+from unittest.mock import MagicMock, patch
+
+from app.agents import intent_classifier
+from app.agents.router import classify_intent
+
+
+def test_predict_returns_label_and_confidence():
+    label, confidence = intent_classifier.predict("Can I sell swords?")
+    assert label == "policy"
+    assert 0.0 <= confidence <= 1.0
+
+
+@patch("app.agents.router.Ollama")
+def test_confident_question_skips_llm(mock_llm):
+    before = intent_classifier.routing_stats()
+
+    intent = classify_intent("What is the average return rate by category?")
+
+    assert intent == "analytics"
+    mock_llm.assert_not_called()
+    after = intent_classifier.routing_stats()
+    assert after["fast_path"] == before["fast_path"] + 1
+
+
+@patch("app.agents.router.Ollama")
+def test_low_confidence_falls_back_to_llm(mock_llm):
+    llm = MagicMock(return_value="recommendation")
+    mock_llm.return_value = llm
+    before = intent_classifier.routing_stats()
+
+    intent = classify_intent("zzz qqq")
+
+    assert intent == "recommendation"
+    llm.assert_called_once()
+    after = intent_classifier.routing_stats()
+    assert after["llm_fallback"] == before["llm_fallback"] + 1
+    assert 0.0 < after["fallback_rate"] <= 1.0
@@ -0,0 +1,124 @@
+"""
+Tests: sandbox.py (long-lived, time- and memory-limited code execution)
+"""
+
+import threading
+import time
+
+import numpy as np
+import os
+import pandas as pd
+import pytest
+
+from app import sandbox
+
+
+@pytest.fixture
+def pool():
+    frame = pd.DataFrame(
+        {"seller_id": ["S1", "S2", "S1"], "price": [1.0, 2.0, 3.0]}
+    )
+    index = {"S1": np.array([0, 2]), "S2": np.array([1])}
+    pool = sandbox.SandboxPool(frame, index, workers=1, timeout_s=1.0)
+    yield pool
+    pool.close()
+
+
+def test_execute_returns_last_expression_and_cpu_time(pool):
+    result = pool.execute(
+        "```python\ntotal = df['price'].sum()\ntotal * 2\n```"
+    )
+
+    assert result.ok
+    assert result.output == "12.0"
+    assert result.cpu_seconds is not None
+
+
+def test_execute_scopes_df_to_seller(pool):
+    assert pool.execute("len(df)", seller_id="S1").output == "2"
+    assert pool.execute("len(df)", seller_id="unknown").output == "0"
+
+
+def test_errors_and_prints_are_returned_as_output(pool):
+    assert pool.execute("print('hi')").output == "hi\n"
+    assert pool.execute("df['missing']").output.startswith("KeyError")
+
+
+def test_df_changes_do_not_leak_into_later_calls(pool):
+    pool.execute("df['leak'] = 1\ndf.loc[0, 'price'] = 100.0")
+    pool.execute("df.drop(columns=['price'], inplace=True)", seller_id="S1")
+
+    assert pool.execute("list(df.columns)").output == "['seller_id', 'price']"
+    assert pool.execute("df['price'].sum()").output == "6.0"
+    assert pool.execute("df['price'].sum()", seller_id="S1").output == "4.0"
+
+
+def test_timeout_kills_and_respawns_worker(pool):
+    result = pool.execute("while True:\n    pass")
+
+    assert result.status == "timeout"
+    assert "TimeoutError" in result.output
+    assert pool.stats()["respawns"] == 1
+    assert pool.execute("1 + 1").output == "2"
+
+
+def test_close_wakes_callers_waiting_for_a_worker(pool):
+    busy = threading.Thread(
+        target=pool.execute, args=("import time\ntime.sleep(0.5)",)
+    )
+    busy.start()
+    time.sleep(0.1)
+    errors = []
+
+    def wait_for_worker():
+        try:
+            pool.execute("1 + 1")
+        except sandbox.SandboxClosedError as e:
+            errors.append(e)
+
+    waiting = threading.Thread(target=wait_for_worker)
+    waiting.start()
+    time.sleep(0.1)
+    pool.close()
+
+    waiting.join(timeout=2)
+    busy.join(timeout=2)
+    assert not waiting.is_alive()
+    assert len(errors) == 1
+
+
+needs_proc = pytest.mark.skipif(
+    not os.path.exists("/proc/self/statm"), reason="needs /proc"
+)
+
+
+@needs_proc
+def test_rss_cap_kills_worker():
+    pool = sandbox.SandboxPool(
+        pd.DataFrame(), workers=1, timeout_s=20.0, max_rss_mb=100
+    )
+    try:
+        result = pool.execute(
+            "import time\nblocks = []\nfor _ in range(40):\n"
+            "    blocks.append(np.ones(5 * 10**6))\n    time.sleep(0.05)"
+        )
+
+        assert result.status == "memory"
+        assert pool.stats()["memory_kills"] == 1
+        assert pool.execute("'alive'").output == "alive"
+    finally:
+        pool.close()
+
+
+@needs_proc
+def test_rss_cap_ignores_frame_loaded_at_start():
+    # ~80 MB frame, well over the cap: only growth while running counts.
+    frame = pd.DataFrame({"x": np.ones(10**7)})
+    pool = sandbox.SandboxPool(frame, workers=1, timeout_s=20.0, max_rss_mb=20)
+    try:
+        result = pool.execute("import time\ntime.sleep(0.3)\ndf['x'].sum()")
+
+        assert result.status == "ok"
+        assert result.output == "10000000.0"
+    finally:
+        pool.close()
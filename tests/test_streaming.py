@@ -0,0 +1,96 @@
+"""
+Tests: SSE streaming (`/query/stream`, router.stream_route, chains streaming)
+"""
+
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from langchain.schema import Document
+
+import app.main as main
+from app.agents import router
+from app.rag import chains
+
+
+def _doc(chunk_id):
+    return Document(
+        page_content="Knives and bladed weapons are prohibited on Marketplace X.",
+        metadata={
+            "doc_id": "prohibited_items",
+            "section": "Weapons",
+            "chunk_id": chunk_id,
+        },
+    )
+
+
+@patch("app.rag.chains.get_policy_chain")
+@patch("app.rag.chains._retrieve")
+def test_stream_policy_rag_orders_events(mock_retrieve, mock_chain):
+    mock_retrieve.return_value = ([_doc("prohibited_items_001")], 0.8)
+    mock_chain.return_value.stream.return_value = iter(
+        ["No", ", knives", " are banned."]
+    )
+
+    events = list(chains.stream_policy_rag("Are knives allowed?"))
+
+    assert events[0] == {
+        "event": "citations",
+        "data": ["[prohibited_items > Weapons > prohibited_items_001]"],
+    }
+    assert [e["data"] for e in events[1:-1]] == [
+        "No",
+        ", knives",
+        " are banned.",
+    ]
+    assert events[-1]["event"] == "done"
+    assert events[-1]["data"]["confidence"] == 0.8
+
+
+@patch("app.rag.chains.get_policy_chain")
+@patch("app.rag.chains._retrieve", return_value=([], 0.0))
+def test_stream_refuses_without_llm_when_no_docs(mock_retrieve, mock_chain):
+    events = list(chains.stream_policy_rag("?"))
+
+    assert events[1]["data"] == chains.POLICY_REFUSAL
+    mock_chain.assert_not_called()
+
+
+@patch("app.agents.router.classify_intent", return_value="policy")
+def test_stream_route_caches_assembled_answer(mock_intent):
+    streamer = MagicMock(
+        return_value=iter(
+            [
+                {"event": "citations", "data": ["[a > b > c]"]},
+                {"event": "token", "data": "Hello"},
+                {"event": "token", "data": " world"},
+                {"event": "done", "data": {"confidence": 1.0, "sources": []}},
+            ]
+        )
+    )
+    with patch.dict(router.STREAMERS, {"policy": streamer}):
+        events = list(router.stream_route("Are knives allowed?"))
+        replay = list(router.stream_route("Are knives allowed?"))
+
+    assert events[-1]["data"]["intent"] == "policy"
+    assert replay[1] == {"event": "token", "data": "Hello world"}
+    assert replay[0]["data"] == ["[a > b > c]"]
+    streamer.assert_called_once()
+
+
+def test_query_stream_endpoint_sends_sse_frames():
+    events = [
+        {"event": "citations", "data": ["[a > b > c]"]},
+        {"event": "token", "data": "Hi"},
+        {"event": "done", "data": {"intent": "policy", "confidence": 1.0}},
+    ]
+    with patch("app.main.router.stream_route", return_value=iter(events)):
+        response = TestClient(main.app).post(
+            "/query/stream", json={"question": "Are knives allowed?"}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = response.text.strip().split("\n\n")
+    assert frames[0] == 'event: citations\ndata: ["[a > b > c]"]'
+    assert frames[1] == 'event: token\ndata: "Hi"'
+    assert frames[2].startswith("event: done")
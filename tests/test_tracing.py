@@ -0,0 +1,126 @@
+"""
+Unit tests for `app.tracing` and the `/query` debug timings and `/metrics`.
+
+Covers:
+1. Nested spans record their parent and land in the active trace
+2. Spans in `asyncio.to_thread` workers join the request's trace
+3. Trace exit feeds the stage/request histograms labelled by intent
+4. `/query` with `debug=true` returns timings; `/metrics` exposes them
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app import tracing
+
+
+@pytest.fixture(autouse=True)
+def _clean_metrics():
+    tracing.reset_metrics()
+    yield
+    tracing.reset_metrics()
+
+
+def test_nested_spans_record_parent():
+    with tracing.trace("test") as current:
+        with tracing.span("outer"):
+            with tracing.span("inner", k=3):
+                time.sleep(0.001)
+
+    spans = {s["name"]: s for s in current.to_dict()["spans"]}
+    assert spans["outer"]["parent"] is None
+    assert spans["inner"]["parent"] == "outer"
+    assert spans["inner"]["k"] == 3
+    assert spans["outer"]["duration_ms"] >= spans["inner"]["duration_ms"] > 0
+
+
+def test_spans_in_threads_join_the_trace():
+    @tracing.traced("work")
+    def work():
+        return 42
+
+    async def handler():
+        with tracing.trace("test") as current:
+            assert await asyncio.to_thread(work) == 42
+        return current
+
+    current = asyncio.run(handler())
+    assert [s.name for s in current.spans] == ["work"]
+
+
+def test_trace_feeds_histograms_with_intent():
+    with tracing.trace("query"):
+        tracing.set_intent("policy")
+        with tracing.span("retrieve"):
+            pass
+
+    metrics = tracing.render_metrics()
+    assert "# TYPE marketplace_stage_duration_seconds histogram" in metrics
+    assert (
+        'marketplace_stage_duration_seconds_count{stage="retrieve",'
+        'intent="policy"} 1' in metrics
+    )
+    assert (
+        'marketplace_request_duration_seconds_bucket{endpoint="query",'
+        'intent="policy",le="+Inf"} 1' in metrics
+    )
+
+
+def test_span_outside_trace_is_counted_without_intent():
+    with tracing.span("embed_query"):
+        pass
+
+    assert (
+        'marketplace_stage_duration_seconds_count{stage="embed_query",'
+        'intent="none"} 1' in tracing.render_metrics()
+    )
+
+
+def test_disabled_tracing_records_nothing(monkeypatch):
+    monkeypatch.setattr("app.constants.TRACING_ENABLED", False)
+
+    with tracing.trace("query") as current:
+        with tracing.span("retrieve") as s:
+            assert s is None
+
+    assert current.spans == []
+    assert "_count" not in tracing.render_metrics()
+
+
+def test_query_debug_timings_and_metrics(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import app.main as main
+
+    async def fake_aroute(question, seller_id=None, filters=None):
+        tracing.set_intent("policy")
+        with tracing.span("retrieve"):
+            pass
+        return {"intent": "policy", "answer": "ok"}
+
+    monkeypatch.setattr("app.agents.router.aroute", fake_aroute)
+    client = TestClient(main.app)
+
+    response = client.post(
+        "/query",
+        json={"question": "Shipping rules?", "mode": "router", "debug": True},
+    )
+    assert response.status_code == 200
+    timings = response.json()["timings"]
+    assert timings["intent"] == "policy"
+    assert [s["name"] for s in timings["spans"]] == ["retrieve"]
+
+    plain = client.post(
+        "/query", json={"question": "Shipping rules?", "mode": "router"}
+    )
+    assert "timings" not in plain.json()
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert (
+        'marketplace_request_duration_seconds_count{endpoint="query",'
+        'intent="policy"} 2' in metrics.text
+    )
@@ -1,23 +1,66 @@
+import json
+
 import requests
 import streamlit as st
 
 
+API_URL = "http://127.0.0.1:8000"
+
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a Server-Sent Events response."""
+    event = "message"
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            continue
+        if line.startswith("event: "):
+            event = line[len("event: ") :]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: ") :])
+
+
 st.title("🧠 Mistral E-Commerce Agent")
 
 question = st.text_input("Ask a question about the products:")
 mode = st.selectbox("Mode", ("Auto", "RAG", "Agent"), index=0)
+stream = st.checkbox("Stream answer", value=True)
 
 mode_param = None if mode == "Auto" else mode.lower()
 
 if st.button("Ask"):
-    with st.spinner("Thinking..."):
-        st.write("if and with")
-        response = requests.post(
-            "http://127.0.0.1:8000/query",
-            json={"question": question, "mode": mode_param},
-        ).json()
-
-st.write(
-    f"**Answer :** {response.get('answer') if response.get('mode') == 'agent' else response.get('answer').get('result')}"
-)
-st.write(f"**Used mode :** {response.get('mode')}")
+    if stream:
+        citations_box = st.empty()
+        answer_box = st.empty()
+        meta_box = st.empty()
+        answer = ""
+
+        with requests.post(
+            f"{API_URL}/query/stream",
+            json={"question": question},
+            stream=True,
+        ) as response:
+            for event, data in iter_sse(response):
+                if event == "citations" and data:
+                    citations_box.write(f"**Sources :** {', '.join(data)}")
+                elif event == "token":
+                    answer += data
+                    answer_box.markdown(f"**Answer :** {answer}▌")
+                elif event == "done":
+                    answer_box.markdown(f"**Answer :** {answer}")
+                    meta_box.write(
+                        f"**Intent :** {data.get('intent')} · "
+                        f"**Confidence :** {data.get('confidence')}"
+                    )
+                elif event == "error":
+                    st.error(data.get("detail"))
+    else:
+        with st.spinner("Thinking..."):
+            response = requests.post(
+                f"{API_URL}/query",
+                json={"question": question, "mode": mode_param},
+            ).json()
+
+        st.write(
+            f"**Answer :** {response.get('answer') if response.get('mode') == 'agent' else response.get('answer').get('result')}"
+        )
+        st.write(f"**Used mode :** {response.get('mode')}")